@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Sequence
+import numpy as np
+
+class Answer(NamedTuple):
+    answer: str
+    citations: List[str]
+
+class AnswerCache:
+    """Cache jawaban /ask berbasis kemiripan kosinus embedding pertanyaan.
+
+    Entri hanya dipakai bila k sama dan `version` (naik setiap isi koleksi berubah) belum bergeser
+    sejak jawaban dibuat. Eviksi berdasarkan TTL lalu LRU; semua akses terjadi di event loop.
+    """
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600, max_items: int = 2000):
+        self.threshold, self.ttl, self.max_items = threshold, ttl, max_items
+        self.version = 0
+        self.hits = self.misses = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (vec, k, Answer, created)
+        self._seq = 0
+        self._mat = None; self._ids: List[int] = []; self._ks = None
+
+    def bump(self):
+        """Isi koleksi berubah: semua jawaban lama tidak berlaku lagi."""
+        self.version += 1; self._entries.clear(); self._mat = None
+
+    def _purge(self, now: float):
+        expired = [i for i, e in self._entries.items() if now - e[3] > self.ttl]
+        for i in expired: del self._entries[i]
+        if expired: self._mat = None
+
+    def _index(self):
+        if self._mat is None and self._entries:
+            self._ids = list(self._entries)
+            self._mat = np.stack([self._entries[i][0] for i in self._ids])
+            self._ks = np.array([self._entries[i][1] for i in self._ids])
+        return self._mat
+
+    def get(self, vec: Sequence[float], k: int) -> Optional[Answer]:
+        if self.max_items <= 0: return None
+        self._purge(time.time())
+        mat = self._index()
+        if mat is not None:
+            q = np.asarray(vec, dtype=np.float32); q /= (np.linalg.norm(q) or 1.0)
+            sims = np.where(self._ks == k, mat @ q, -1.0); i = int(sims.argmax())
+            if sims[i] >= self.threshold:
+                eid = self._ids[i]; self._entries.move_to_end(eid); self.hits += 1
+                return self._entries[eid][2]
+        self.misses += 1
+        return None
+
+    def put(self, vec: Sequence[float], k: int, answer: Answer, version: int):
+        if self.max_items <= 0 or version != self.version: return  # koleksi berubah selama generate
+        q = np.asarray(vec, dtype=np.float32); q /= (np.linalg.norm(q) or 1.0)
+        self._seq += 1; self._entries[self._seq] = (q, k, answer, time.time())
+        while len(self._entries) > self.max_items: self._entries.popitem(last=False)
+        self._mat = None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"size": len(self._entries), "max": self.max_items, "threshold": self.threshold, "ttl_s": self.ttl,
+                "version": self.version, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
@@ -0,0 +1,98 @@
+"""Load test /ask terhadap stub lokal (Ollama + Presidio) dan Qdrant in-memory.
+
+Contoh:
+    python ai/bench_ask.py --concurrency 64 --requests 1000
+    python ai/bench_ask.py --app-dir /path/ke/versi/lama/ai   # bandingkan sebelum/sesudah
+
+Stub menambahkan latensi tetap (--embed-ms, --gen-ms, --presidio-ms) supaya yang terukur
+adalah cara service menunggu I/O, bukan kecepatan model.
+"""
+import argparse, asyncio, hashlib, json, os, socket, statistics, subprocess, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+# 256 vektor palsu yang sudah di-serialisasi; teks dipetakan lewat byte pertama sha256-nya.
+FAKE_VECS = [json.dumps([((b * 31 + i) % 97) / 97 - 0.5 for i in range(768)]) for b in range(256)]
+def fake_vec(t: str) -> str: return FAKE_VECS[hashlib.sha256(t.encode()).digest()[0]]
+
+def start_stub(embed_ms: float, gen_ms: float, presidio_ms: float) -> str:
+    class Stub(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def log_message(self, *a): pass
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+            if self.path == "/api/embed":
+                time.sleep(embed_ms / 1000); inp = body["input"]
+                vecs = ",".join(fake_vec(t) for t in ([inp] if isinstance(inp, str) else inp))
+                data = f'{{"embeddings":[{vecs}]}}'.encode()
+            elif self.path == "/api/generate":
+                time.sleep(gen_ms / 1000); data = b'{"response":"Sesuai kebijakan [1].","done":true}'
+            elif self.path == "/analyze":
+                time.sleep(presidio_ms / 1000); data = b"[]"
+            else:
+                data = b"{}"
+            self.send_response(200); self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data))); self.end_headers(); self.wfile.write(data)
+    ThreadingHTTPServer.daemon_threads = True
+    srv = ThreadingHTTPServer(("127.0.0.1", free_port()), Stub); srv.request_queue_size = 1024
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{srv.server_address[1]}"
+
+def start_service(app_dir: str, port: int, env: dict) -> subprocess.Popen:
+    """Jalankan service di proses terpisah (uvicorn, 1 worker) supaya tidak berbagi GIL dengan load generator."""
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "--app-dir", app_dir, "hrcopilot_service:app",
+                             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--backlog", "2048"],
+                            env={**os.environ, **env})
+    for _ in range(200):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1): return proc
+        except OSError: time.sleep(0.1)
+    proc.kill(); raise SystemExit("service tidak bisa start")
+
+async def run_load(base: str, docs: int, total: int, concurrency: int):
+    import httpx
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=300, limits=limits) as c:
+        seed = [{"id": f"doc{i}", "text": f"Pasal {i}: karyawan berhak atas cuti {i % 20} hari kerja.", "source": "bench"}
+                for i in range(docs)]
+        (await c.post("/ingest", json={"docs": seed})).raise_for_status()
+        lat = []; errors = 0; queue = iter(range(total))
+        async def worker():
+            nonlocal errors
+            for i in queue:
+                t0 = time.perf_counter()
+                r = await c.post("/ask", json={"q": f"berapa hari cuti pasal {i}?", "k": 5})  # query unik → tanpa cache
+                lat.append((time.perf_counter() - t0) * 1000)
+                if r.status_code != 200: errors += 1
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+    lat.sort()
+    q = statistics.quantiles(lat, n=100)
+    return {"requests": total, "concurrency": concurrency, "errors": errors,
+            "p50_ms": round(q[49], 1), "p99_ms": round(q[98], 1), "rps": round(total / wall, 1)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--app-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--concurrency", type=int, default=64)
+    ap.add_argument("--docs", type=int, default=200)
+    ap.add_argument("--embed-ms", type=float, default=20)
+    ap.add_argument("--gen-ms", type=float, default=250)
+    ap.add_argument("--presidio-ms", type=float, default=15)
+    a = ap.parse_args()
+    stub = start_stub(a.embed_ms, a.gen_ms, a.presidio_ms)
+    env = {"OLLAMA_URL": stub, "PRESIDIO_URL": stub, "QDRANT_URL": ":memory:", "EMBED_CACHE_PATH": ":memory:",
+           "LEXICAL_PATH": ":memory:"}
+    port = free_port(); proc = start_service(a.app_dir, port, env)
+    try:
+        print(json.dumps(asyncio.run(run_load(f"http://127.0.0.1:{port}", a.docs, a.requests, a.concurrency))))
+    finally:
+        proc.terminate(); proc.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark recall top-k retrieval pada set pertanyaan berlabel.
+
+Membandingkan mode retrieval (vector, BM25, hybrid RRF dengan grid RRF_K/kandidat) dan chunker
+(`chars` = potongan karakter MAX_CHUNK/CHUNK_OVERLAP, `structure` = chunker.py). Butuh Ollama dengan
+EMBED_MODEL yang sama dengan produksi; Qdrant dan indeks BM25 dibuat in-memory.
+Contoh:
+    python ai/bench_recall.py                       # bench_data/recall_set.json, k=5
+    python ai/bench_recall.py --k 3 --rrf-k 10 30 60 --candidates 10 20 50
+    python ai/bench_recall.py --handbook --chunker chars structure --modes hybrid
+Format set: {"docs": [{"id", "text"}], "questions": [{"q", "relevant": [doc id, ...]}]}.
+Dengan --handbook semua doc digabung jadi satu dokumen (satu judul per doc), dan chunk dianggap memuat
+doc yang rentang teksnya beririsan dengan chunk tersebut.
+"""
+import argparse, asyncio, json, os, sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def score(ranked_docs, relevant, k):
+    top = list(dict.fromkeys(ranked_docs))[:k]
+    recall = len(set(top) & relevant) / len(relevant)
+    rr = next((1 / i for i, d in enumerate(top, 1) if d in relevant), 0.0)
+    return recall, rr
+
+def as_handbook(docs):
+    """Gabung semua doc jadi satu teks; kembalikan (teks, [(start, end, doc_id)])."""
+    parts, spans, pos = [], [], 0
+    for d in docs:
+        block = f"{d['id'].replace('-', ' ').upper()}\n{d['text']}\n\n"
+        start = pos + len(block) - len(d["text"]) - 2
+        spans.append((start, start + len(d["text"]), d["id"])); parts.append(block); pos += len(block)
+    return "".join(parts), spans
+
+def labels_for(chunk, text, spans, cursor):
+    """Doc id yang rentangnya beririsan dengan posisi chunk di `text` (dicari mulai `cursor`)."""
+    head = chunk.split("\n", 1)[0][:60]
+    start = text.find(head, cursor)
+    if start < 0: return set(), cursor
+    end = start + len(chunk)
+    return {d for a, b, d in spans if a < end and b > start}, start + 1
+
+async def ingest(s, data, chunker, handbook):
+    """Reset koleksi + indeks BM25, ingest dengan chunker tertentu; kembalikan (pid -> label, jumlah token)."""
+    from lexical import LexicalIndex
+    await s.qdrant.delete_collection(s.COLL); s.lex = LexicalIndex(":memory:")
+    await s.ensure_collection()
+    pid_docs, tokens = {}, 0
+    sources = [("handbook", *as_handbook(data["docs"]))] if handbook else \
+              [(d["id"], d["text"], [(0, len(d["text"]), d["id"])]) for d in data["docs"]]
+    def items():
+        nonlocal tokens
+        for doc, text, spans in sources:
+            cursor = 0
+            for i, (ch, sec) in enumerate(s.chunk_doc([text], chunker)):
+                labels, cursor = labels_for(ch, text, spans, cursor)
+                pid_docs[s.point_id(doc, s.content_hash(ch))] = labels; tokens += s.count_tokens(ch)
+                yield doc, ch, {"id": f"{doc}#{i}", "text": ch, "source": doc, "section": sec}
+    await s.sync_items(items(), s.new_timings(), [doc for doc, _, _ in sources])
+    return pid_docs, tokens
+
+async def run(a):
+    os.environ.update({"QDRANT_URL": ":memory:", "LEXICAL_PATH": ":memory:", "ANSWER_CACHE_MAX": "0"})
+    os.environ.setdefault("EMBED_CACHE_PATH", ":memory:")
+    sys.path.insert(0, HERE)
+    import hrcopilot_service as s
+    data = json.load(open(a.set))
+    qs = [(q["q"], set(q["relevant"])) for q in data["questions"]]
+    qvs = await s.embed_many([q for q, _ in qs])
+    configs = [(m, None, None) for m in a.modes if m != "hybrid"]
+    if "hybrid" in a.modes: configs += [("hybrid", rk, c) for rk in a.rrf_k for c in a.candidates]
+
+    print(f"{len(data['docs'])} dokumen, {len(qs)} pertanyaan, k={a.k}, handbook={a.handbook}")
+    print(f"{'chunker':9} {'chunks':>6} {'tokens':>7} {'mode':8} {'rrf_k':>5} {'cand':>5} {'recall@k':>9} {'mrr':>6} {'irrelevant':>10}")
+    for chunker in a.chunker:
+        pid_docs, tokens = await ingest(s, data, chunker, a.handbook)
+        for mode, rk, cand in configs:
+            if rk is not None: s.RRF_K, s.HYBRID_CANDIDATES = rk, cand
+            rec = mrr = gated = 0.0
+            for (q, rel), qv in zip(qs, qvs):
+                hits, relevant = await s.retrieve(q, qv, a.k, mode)
+                ranked = [d for h in hits for d in sorted(pid_docs.get(h.id, ()))]
+                r, rr = score(ranked, rel, a.k)
+                rec += r; mrr += rr; gated += not relevant
+            n = len(qs)
+            print(f"{chunker:9} {len(pid_docs):>6} {tokens:>7} {mode:8} {rk or '-':>5} {cand or '-':>5} "
+                  f"{rec / n:9.3f} {mrr / n:6.3f} {int(gated):>10}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--set", default=os.path.join(HERE, "bench_data", "recall_set.json"))
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--rrf-k", type=int, nargs="+", default=[60])
+    ap.add_argument("--candidates", type=int, nargs="+", default=[20])
+    ap.add_argument("--modes", nargs="+", default=["vector", "bm25", "hybrid"], choices=["vector", "bm25", "hybrid"])
+    ap.add_argument("--chunker", nargs="+", default=["structure"], choices=["chars", "structure"])
+    ap.add_argument("--handbook", action="store_true", help="gabung semua doc jadi satu dokumen panjang")
+    asyncio.run(run(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
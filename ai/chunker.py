@@ -0,0 +1,106 @@
+"""Chunker berbasis struktur dokumen kebijakan (BAB / Pasal / judul bernomor → paragraf → kalimat).
+
+Bagian-bagian dokumen dikemas berurutan sampai `budget` token (dihitung dengan tokenizer model
+embedding bila tersedia), tanpa overlap. Setiap chunk membawa jalur bagian, mis. "BAB III > Pasal 7 Cuti
+Melahirkan". Input berupa iterable potongan teks (mis. per halaman PDF) dan output berupa generator,
+jadi dokumen tidak pernah perlu utuh di memori.
+"""
+import os, re
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+class Chunk(NamedTuple):
+    text: str
+    section: str
+    tokens: int
+
+# ==== Token counter ====
+_PIECE = re.compile(r"\w+|[^\w\s]", re.U)
+def approx_tokens(text: str) -> int:
+    """Perkiraan WordPiece: kata panjang dipecah jadi beberapa subword (~1 token per 6 karakter)."""
+    return sum(1 + (len(p) - 1) // 6 for p in _PIECE.findall(text))
+
+def load_token_counter(path: Optional[str] = None) -> Callable[[str], int]:
+    """Pakai tokenizer.json model embedding (EMBED_TOKENIZER) lewat paket `tokenizers` bila ada."""
+    path = path or os.getenv("EMBED_TOKENIZER")
+    if path:
+        try:
+            from tokenizers import Tokenizer
+            tok = Tokenizer.from_file(path)
+            return lambda t: len(tok.encode(t, add_special_tokens=False).ids)
+        except Exception:
+            pass
+    return approx_tokens
+
+# ==== Struktur ====
+HEADINGS = [
+    (1, re.compile(r"^BAB\s+[IVXLC\d]+\b.{0,80}$", re.I)),
+    (2, re.compile(r"^Pasal\s+\d+[A-Za-z]?\b.{0,80}$")),
+    (3, re.compile(r"^\d+(?:\.\d+)+\.?\s+[A-Z][^.!?]{0,80}$")),   # 1.2 Judul Sub-bagian
+    (1, re.compile(r"^[A-Z][A-Z0-9 ,/&()'-]{3,80}$")),              # JUDUL HURUF KAPITAL
+]
+def heading_level(line: str) -> int:
+    for level, rx in HEADINGS:
+        if rx.match(line): return level
+    return 0
+
+SENT = re.compile(r"(?<=[.!?;])\s+(?=[\"'(A-Z0-9])")
+
+def iter_lines(pieces: Iterable[str]) -> Iterator[str]:
+    rest = ""
+    for piece in pieces:
+        lines = (rest + piece).split("\n"); rest = lines.pop()
+        yield from lines
+    if rest: yield rest
+
+def iter_blocks(pieces: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """(level_judul, teks): level > 0 untuk baris judul, 0 untuk paragraf (dipisah baris kosong)."""
+    para: List[str] = []
+    for raw in iter_lines(pieces):
+        line = raw.strip()
+        level = heading_level(line) if line and len(line) <= 100 else 0
+        if not line or level:
+            if para: yield 0, "\n".join(para); para = []
+            if level: yield level, line
+        else:
+            para.append(line)
+    if para: yield 0, "\n".join(para)
+
+def split_long(text: str, budget: int, count: Callable[[str], int]) -> Iterator[str]:
+    """Pecah paragraf yang melebihi budget per kalimat; kalimat yang masih terlalu panjang per kata."""
+    for sent in SENT.split(text):
+        if count(sent) <= budget: yield sent; continue
+        words = sent.split(" "); cur: List[str] = []
+        for w in words:
+            if cur and count(" ".join(cur + [w])) > budget: yield " ".join(cur); cur = []
+            cur.append(w)
+        if cur: yield " ".join(cur)
+
+def chunk_structured(pieces: Iterable[str], budget: int = 350,
+                     count: Callable[[str], int] = approx_tokens) -> Iterator[Chunk]:
+    path: List[Tuple[int, str]] = []
+    buf: List[str] = []; buf_tokens = 0; buf_section = ""
+    def flush():
+        nonlocal buf, buf_tokens
+        if buf: yield Chunk("\n".join(buf), buf_section, buf_tokens)
+        buf, buf_tokens = [], 0
+    def section() -> str: return " > ".join(t for _, t in path)
+
+    pending: List[str] = []  # judul ditahan supaya selalu satu chunk dengan isi pertamanya
+    for level, text in iter_blocks(pieces):
+        if level:
+            top_changed = level == 1 or not path
+            while path and path[-1][0] >= level: path.pop()
+            path.append((level, text))
+            if top_changed: yield from flush()   # jangan campur isi dua BAB/judul utama
+            pending.append(text); continue
+        parts = [text] if count(text) <= budget else list(split_long(text, budget, count))
+        for part in parts:
+            unit = pending + [part]; pending = []
+            n = sum(map(count, unit))
+            if buf and buf_tokens + n > budget: yield from flush()
+            if not buf: buf_section = section()
+            buf.extend(unit); buf_tokens += n
+    if pending:
+        if not buf: buf_section = section()
+        buf.extend(pending); buf_tokens += sum(map(count, pending))
+    yield from flush()
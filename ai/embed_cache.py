@@ -0,0 +1,62 @@
+import hashlib, re, sqlite3, threading, time, unicodedata
+from array import array
+from typing import List, Optional, Sequence
+
+_WS = re.compile(r"\s+")
+def normalize(text: str) -> str:
+    return _WS.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+class EmbedCache:
+    """Cache embedding persisten (SQLite) dengan kunci sha256(model, teks ternormalisasi) dan eviksi LRU.
+
+    Vektor disimpan sebagai float32. Jika model berbeda dari yang tercatat di tabel meta,
+    seluruh isi cache dibuang saat start.
+    """
+    def __init__(self, path: str, model: str, max_items: int = 200_000):
+        self.model, self.max_items = model, max_items
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL"); self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS emb (key TEXT PRIMARY KEY, vec BLOB NOT NULL, used REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS emb_used ON emb(used)")
+        row = self._db.execute("SELECT v FROM meta WHERE k='model'").fetchone()
+        if not row or row[0] != model:
+            self._db.execute("DELETE FROM emb")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('model', ?)", (model,))
+        self._size = self._db.execute("SELECT COUNT(*) FROM emb").fetchone()[0]
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{normalize(text)}".encode()).hexdigest()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        keys = [self.key(t) for t in texts]; found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):  # batas variabel SQLite
+                part = list(set(keys[i:i+500])); qs = ",".join("?"*len(part))
+                found.update(self._db.execute(f"SELECT key, vec FROM emb WHERE key IN ({qs})", part).fetchall())
+            if found:
+                now = time.time()
+                self._db.executemany("UPDATE emb SET used=? WHERE key=?", [(now, k) for k in found])
+            out = [array("f", found[k]).tolist() if k in found else None for k in keys]
+            hit = sum(v is not None for v in out); self.hits += hit; self.misses += len(out) - hit
+        return out
+
+    def put_many(self, texts: Sequence[str], vecs: Sequence[List[float]]):
+        now = time.time()
+        rows = [(self.key(t), array("f", v).tobytes(), now) for t, v in zip(texts, vecs)]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany("INSERT OR IGNORE INTO emb VALUES (?,?,?)", rows)
+            self._size += self._db.total_changes - before
+            if self._size > self.max_items:
+                n = self._size - self.max_items
+                self._db.execute("DELETE FROM emb WHERE key IN (SELECT key FROM emb ORDER BY used LIMIT ?)", (n,))
+                self._size -= n; self.evictions += n
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"model": self.model, "size": self._size, "max": self.max_items, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
@@ -1,11 +1,20 @@
-import os, uuid, re, io, requests
-from typing import List
+import os, uuid, re, json, time, asyncio, hashlib, threading, httpx
+from contextlib import asynccontextmanager, contextmanager
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 from fastapi import FastAPI, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
-from pypdf import PdfReader
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (VectorParams, Distance, PointStruct, PayloadSchemaType, Filter, FieldCondition,
+                                  MatchValue, HasIdCondition, FilterSelector, SetPayload, SetPayloadOperation)
+from embed_cache import EmbedCache
+from answer_cache import Answer, AnswerCache
+import pii
+from lexical import LexicalIndex, coverage, rrf
+from chunker import chunk_structured, load_token_counter
+from pdf_pages import PDF_WINDOW, iter_pdf_pages
 
 # ==== Konfigurasi ====
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
@@ -14,70 +23,255 @@ EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
 GEN_MODEL = os.getenv("GEN_MODEL", "llama3.2:3b-instruct")  # SLM default
 PRESIDIO_URL = os.getenv("PRESIDIO_URL", "http://localhost:3000")
 MASK_FOR_RETRIEVAL = os.getenv("MASK_FOR_RETRIEVAL", "true").lower() == "true"
+PRESIDIO_PERSON = os.getenv("PRESIDIO_PERSON", "true").lower() == "true"  # tahap 2: nama orang via Presidio
 MIN_SIM = float(os.getenv("MIN_SIM", "0.28"))
 MAX_CHUNK = int(os.getenv("MAX_CHUNK", "900"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
+CHUNKER = os.getenv("CHUNKER", "structure")                     # structure | chars (MAX_CHUNK/CHUNK_OVERLAP)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "350"))            # budget token per chunk (chunker structure)
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+EMBED_BATCH = int(os.getenv("EMBED_BATCH", "32"))              # teks per request /api/embed
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))   # batch embed paralel (global)
+MASK_CONCURRENCY = int(os.getenv("MASK_CONCURRENCY", "8"))     # panggilan Presidio paralel saat /ingest
+UPSERT_BATCH = int(os.getenv("UPSERT_BATCH", "256"))           # point per upsert Qdrant
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "embed_cache.sqlite3"))
+EMBED_CACHE_MAX = int(os.getenv("EMBED_CACHE_MAX", "200000"))  # jumlah vektor maksimum (LRU)
+ANSWER_CACHE_SIM = float(os.getenv("ANSWER_CACHE_SIM", "0.95"))  # kosinus minimum pertanyaan "sama"
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # detik
+ANSWER_CACHE_MAX = int(os.getenv("ANSWER_CACHE_MAX", "2000"))    # 0 = nonaktif
+LEXICAL_PATH = os.getenv("LEXICAL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexical_index.sqlite3"))
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")            # hybrid | vector | bm25
+RRF_K = int(os.getenv("RRF_K", "60"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))     # kandidat per retriever sebelum fusi
+LEX_MIN_COVERAGE = float(os.getenv("LEX_MIN_COVERAGE", "0.6"))    # ambang relevansi hasil BM25 teratas
 
 HORILLA_BASE_URL = os.getenv("HORILLA_BASE_URL", "http://localhost:8000")
 HORILLA_API_TOKEN = os.getenv("HORILLA_API_TOKEN", "")
 
 TOPIC_DENYLIST = re.compile(r"(password|kata\s?sandi|otp|nik|npwp|rekening|gaji\s*perorangan|slip gaji pribadi)", re.I)
 
-# ==== App & Qdrant ====
-app = FastAPI(title="HR Copilot (RAG + PII + Guardrails + Horilla Bridge)")
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
-qdrant = QdrantClient(url=QDRANT_URL)
-def ensure_collection():
-    names = [c.name for c in qdrant.get_collections().collections]
+# ==== Clients (async, pool koneksi dipakai bersama) ====
+# Semua I/O lewat client async sehingga satu worker melayani banyak request tanpa threadpool.
+qdrant = AsyncQdrantClient(location=QDRANT_URL)  # location juga menerima ":memory:" (tes/benchmark)
+aio = httpx.AsyncClient(base_url=OLLAMA_URL, timeout=httpx.Timeout(120, connect=10),
+                        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+presidio = httpx.AsyncClient(base_url=PRESIDIO_URL.rstrip("/"), timeout=10,
+                             limits=httpx.Limits(max_connections=50, max_keepalive_connections=20))
+horilla = httpx.AsyncClient(base_url=HORILLA_BASE_URL.rstrip("/"), timeout=15)
+embed_cache = EmbedCache(EMBED_CACHE_PATH, EMBED_MODEL, EMBED_CACHE_MAX)
+embed_slots = asyncio.Semaphore(EMBED_CONCURRENCY)
+answer_cache = AnswerCache(ANSWER_CACHE_SIM, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX)
+lex = LexicalIndex(LEXICAL_PATH)
+
+async def ensure_collection():
+    names = [c.name for c in (await qdrant.get_collections()).collections]
     if COLL not in names:
-        qdrant.recreate_collection(COLL, vectors_config=VectorParams(size=768, distance=Distance.COSINE))
-ensure_collection()
+        await qdrant.recreate_collection(COLL, vectors_config=VectorParams(size=768, distance=Distance.COSINE))
+    await qdrant.create_payload_index(COLL, "doc", field_schema=PayloadSchemaType.KEYWORD)  # filter delta per dokumen
+
+async def ensure_lexical():
+    """Indeks BM25 kosong tapi koleksi berisi (indeks baru / file dihapus) → isi ulang dari payload Qdrant."""
+    if lex.count(): return
+    off=None
+    while True:
+        pts,off=await qdrant.scroll(COLL, limit=1000, offset=off, with_payload=["doc","source","text"], with_vectors=False)
+        await asyncio.to_thread(lex.add, [(str(p.id), p.payload.get("doc",""), p.payload.get("source",""), p.payload.get("text",""))
+                                          for p in pts])
+        if off is None: break
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    await ensure_collection(); await ensure_lexical()
+    yield
+    await asyncio.gather(aio.aclose(), presidio.aclose(), horilla.aclose())
+    await qdrant.close()
+
+# ==== App ====
+app = FastAPI(title="HR Copilot (RAG + PII + Guardrails + Horilla Bridge)", lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
 # ==== Ollama ====
-def embed(text: str) -> List[float]:
-    r = requests.post("http://localhost:11434/api/embeddings",
-                      json={"model": EMBED_MODEL, "input": text}, timeout=60)
+async def embed_batch(texts: List[str]) -> List[List[float]]:
+    async with embed_slots:
+        r = await aio.post("/api/embed", json={"model": EMBED_MODEL, "input": texts})
     r.raise_for_status()
-    return r.json()["embedding"]
+    return r.json()["embeddings"]
+
+async def embed_uncached(texts: List[str]) -> List[List[float]]:
+    """Embed banyak teks: dipecah per EMBED_BATCH, maksimal EMBED_CONCURRENCY batch berjalan bersamaan."""
+    batches = [texts[i:i+EMBED_BATCH] for i in range(0, len(texts), EMBED_BATCH)]
+    return [v for vs in await asyncio.gather(*map(embed_batch, batches)) for v in vs]
+
+async def embed_many(texts: List[str]) -> List[List[float]]:
+    """Seperti embed_uncached, tapi teks yang sudah ada di embed_cache tidak dikirim ulang ke Ollama."""
+    out = embed_cache.get_many(texts)
+    todo = list(dict.fromkeys(t for t, v in zip(texts, out) if v is None))
+    if todo:
+        vecs = await embed_uncached(todo); embed_cache.put_many(todo, vecs)
+        fresh = dict(zip(todo, vecs)); out = [v if v is not None else fresh[t] for t, v in zip(texts, out)]
+    return out
 
-def generate(prompt: str) -> str:
-    r = requests.post("http://localhost:11434/api/generate",
-                      json={"model": GEN_MODEL, "prompt": prompt, "stream": False}, timeout=120)
+async def embed(text: str) -> List[float]:
+    return (await embed_many([text]))[0]
+
+async def generate(prompt: str) -> str:
+    r = await aio.post("/api/generate", json={"model": GEN_MODEL, "prompt": prompt, "stream": False})
     r.raise_for_status()
     return r.json()["response"]
 
-# ==== PII masking ====
-# Gunakan format string list (sesuai API Presidio)
-DEFAULT_ENTITIES = ["EMAIL_ADDRESS","PHONE_NUMBER","PERSON","CREDIT_CARD","IBAN_CODE"]
+async def generate_stream(prompt: str) -> AsyncIterator[str]:
+    async with aio.stream("POST", "/api/generate", json={"model": GEN_MODEL, "prompt": prompt, "stream": True}) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line: continue
+            d = json.loads(line)
+            if d.get("response"): yield d["response"]
+            if d.get("done"): break
 
-def mask_with_spans(text, spans, fmt="[REDACTED:{t}]"):
+# ==== PII masking ====
+# Tahap 1 lokal (pii.mask_text: email, telepon, NIK, NPWP, rekening, IBAN, kartu kredit ber-Luhn) dalam satu pass;
+# tahap 2 opsional Presidio hanya untuk PERSON, yang tidak bisa ditangani regex.
+def mask_with_spans(text, spans, fmt=pii.FMT):
     spans_sorted = sorted(spans, key=lambda s: s["start"], reverse=True)
     for s in spans_sorted:
         text = text[:s["start"]] + fmt.format(t=s.get("entity_type","PII")) + text[s["end"]:]
     return text
 
-def presidio_mask(text: str):
+async def presidio_mask(text: str, entities=("PERSON",)):
     try:
-        r = requests.post(f"{PRESIDIO_URL.rstrip('/')}/analyze",
-                          json={"text": text, "language": "en", "entities": DEFAULT_ENTITIES}, timeout=10)
-        if r.ok:
+        r = await presidio.post("/analyze", json={"text": text, "language": "en", "entities": list(entities)})
+        if r.is_success:
             return mask_with_spans(text, r.json())
     except Exception:
         pass
     return None
 
-EMAIL_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
-PHONE_RE = re.compile(r"(?:\+62|62|0)8[1-9][0-9]{6,11}")
-def regex_mask(t: str)->str: return PHONE_RE.sub("[REDACTED:PHONE]", EMAIL_RE.sub("[REDACTED:EMAIL]", t))
-def mask_pii(t: str)->str: return t if not t else (presidio_mask(t) or regex_mask(t))
+async def mask_person(t: str)->str:
+    return (await presidio_mask(t) or t) if PRESIDIO_PERSON and t else t
+async def mask_pii(t: str)->str:
+    return await mask_person(pii.mask_text(t)) if t else t
+async def mask_all(texts: List[str], fn=mask_pii) -> List[str]:
+    slots=asyncio.Semaphore(MASK_CONCURRENCY)
+    async def one(t):
+        async with slots: return await fn(t)
+    return await asyncio.gather(*map(one, texts))
 
 # ==== Util ====
 def chunk_text(s: str, n=900, overlap=150):
     i=0; L=len(s)
     while i<L:
-        j=min(i+n,L); yield s[i:j]; i=j-overlap
-def pdf_to_text(b: bytes)->str:
-    r=PdfReader(io.BytesIO(b)); return "\n".join((p.extract_text() or "") for p in r.pages)
+        j=min(i+n,L); yield s[i:j]
+        if j==L: break
+        i=j-overlap
+count_tokens = load_token_counter()  # tokenizer model embedding bila EMBED_TOKENIZER di-set
+def chunk_doc(pieces: Iterable[str], chunker: str=CHUNKER) -> Iterator[Tuple[str, str]]:
+    """(teks, jalur_bagian) per chunk; mode chars mempertahankan potongan karakter lama."""
+    if chunker == "chars":
+        for ch in chunk_text("".join(pieces), MAX_CHUNK, CHUNK_OVERLAP): yield ch, ""
+    else:
+        for c in chunk_structured(pieces, CHUNK_TOKENS, count_tokens): yield c.text, c.section
+def batched(it: Iterable, n: int) -> Iterator[list]:
+    it=iter(it)
+    while (b:=list(islice(it,n))): yield b
+async def abatched(it, n: int) -> AsyncIterator[list]:
+    """batched() untuk iterable biasa maupun async."""
+    if not hasattr(it,"__aiter__"):
+        for b in batched(it,n): yield b
+        return
+    b=[]
+    async for x in it:
+        b.append(x)
+        if len(b)==n: yield b; b=[]
+    if b: yield b
+
+_END=object()
+async def iter_in_thread(gen: Iterator, maxsize: int=PDF_WINDOW) -> AsyncIterator:
+    """Jalankan generator blocking (parse PDF, masking, chunking) di thread; antrean dibatasi maxsize
+    sehingga produsen berhenti sejenak bila konsumen (embed/upsert) tertinggal."""
+    loop=asyncio.get_running_loop(); q=asyncio.Queue(maxsize); stop=threading.Event()
+    def put(x): asyncio.run_coroutine_threadsafe(q.put(x), loop).result()
+    def run():
+        try:
+            for x in gen:
+                if stop.is_set(): return
+                put((x,None))
+            put((_END,None))
+        except Exception as e:
+            if not stop.is_set(): put((_END,e))
+        finally: getattr(gen,"close",lambda: None)()
+    loop.run_in_executor(None, run)
+    try:
+        while True:
+            x,err=await q.get()
+            if x is _END:
+                if err: raise err
+                return
+            yield x
+    finally:
+        stop.set()
+        while not q.empty(): q.get_nowait()  # lepaskan produsen yang menunggu slot
+
+# ==== Pipeline ingest ====
+STAGES = ("extract","mask","embed","upsert")
+def new_timings(): return dict.fromkeys(STAGES, 0.0)
+
+@contextmanager
+def timed(tm: dict, stage: str):
+    t0=time.perf_counter()
+    try: yield
+    finally: tm[stage]+=(time.perf_counter()-t0)*1000
+def timed_iter(it: Iterable, tm: dict, stage: str) -> Iterator:
+    it=iter(it)
+    while True:
+        with timed(tm,stage): x=next(it,_END)
+        if x is _END: return
+        yield x
+
+# ID point = uuid5(dokumen, sha256(teks)) → ingest ulang idempoten; hanya chunk baru yang di-embed.
+POINT_NS = uuid.UUID("8d4f2c1e-5b7a-4e0f-9c3d-2a6b1e8f7c90")
+MOVABLE = ("id","source","section")  # payload yang ikut berubah bila posisi chunk bergeser
+def content_hash(t: str) -> str: return hashlib.sha256(t.encode()).hexdigest()
+def point_id(doc: str, h: str) -> str: return str(uuid.uuid5(POINT_NS, f"{doc}\0{h}"))
+def doc_filter(doc: str) -> Filter: return Filter(must=[FieldCondition(key="doc", match=MatchValue(value=doc))])
+
+async def sync_items(items, tm: dict, docs: Iterable[str]=()) -> dict:
+    """Sinkronkan (doc, teks, payload) ke Qdrant secara streaming per UPSERT_BATCH.
+
+    Chunk yang sudah ada hanya diperbarui payload-nya bila bergeser, chunk baru di-embed + upsert,
+    dan chunk lama milik dokumen yang sama yang tidak muncul lagi dihapus di akhir.
+    `items` boleh iterable biasa atau async (upload: halaman PDF masih diparse saat batch awal di-embed).
+    """
+    st=dict.fromkeys(("added","unchanged","deleted"),0); seen: Dict[str,Set[str]]={d:set() for d in docs}
+    async for batch in abatched(items, UPSERT_BATCH):
+        rows={}
+        for doc,t,p in batch:
+            h=content_hash(t); pid=point_id(doc,h); ids=seen.setdefault(doc,set())
+            if pid in ids: continue  # chunk identik dalam dokumen yang sama
+            ids.add(pid); rows[pid]=(t, {**p,"doc":doc,"hash":h})
+        with timed(tm,"upsert"):
+            old={str(r.id): r.payload for r in await qdrant.retrieve(COLL, ids=list(rows), with_payload=list(MOVABLE), with_vectors=False)}
+        new=[pid for pid in rows if pid not in old]
+        moved=[pid for pid in old if any(old[pid].get(k)!=rows[pid][1].get(k) for k in MOVABLE)]
+        if new:
+            with timed(tm,"embed"): vecs=await embed_many([rows[pid][0] for pid in new])
+            with timed(tm,"upsert"):
+                await qdrant.upsert(collection_name=COLL, points=[PointStruct(id=pid, vector=v, payload=rows[pid][1]) for pid,v in zip(new,vecs)])
+                await asyncio.to_thread(lex.add, [(pid, rows[pid][1]["doc"], rows[pid][1]["source"], rows[pid][0]) for pid in new])
+        if moved:
+            with timed(tm,"upsert"):
+                await qdrant.batch_update_points(COLL, [SetPayloadOperation(set_payload=SetPayload(
+                    payload={k: rows[pid][1].get(k) for k in MOVABLE}, points=[pid])) for pid in moved])
+                await asyncio.to_thread(lex.set_source, [(pid, rows[pid][1]["source"]) for pid in moved])
+        st["added"]+=len(new); st["unchanged"]+=len(old)
+        if new or moved: answer_cache.bump()
+    with timed(tm,"upsert"):
+        for doc,ids in seen.items():
+            stale=Filter(must=doc_filter(doc).must, must_not=[HasIdCondition(has_id=list(ids))])
+            n=(await qdrant.count(COLL, count_filter=stale, exact=True)).count
+            if n: await qdrant.delete(COLL, points_selector=FilterSelector(filter=stale)); st["deleted"]+=n; answer_cache.bump()
+            await asyncio.to_thread(lex.prune_doc, doc, ids)
+    return st
+def report(tm: dict) -> dict: return {k: round(v,1) for k,v in tm.items()}
 
 # ==== Schemas ====
 class IngestDoc(BaseModel): id:str; text:str; source:str
@@ -87,62 +281,148 @@ class LeaveBalanceReq(BaseModel): employee_id:str
 
 # ==== Endpoints: ingest ====
 @app.post("/ingest")
-def ingest(req: IngestReq):
-    pts=[]
-    for d in req.docs:
-        t=mask_pii(d.text); v=embed(t)
-        pts.append(PointStruct(id=str(uuid.uuid4()), vector=v, payload={"id":d.id,"text":t,"source":d.source}))
-    if pts: qdrant.upsert(collection_name=COLL, points=pts)
-    return {"ok":True,"count":len(pts)}
+async def ingest(req: IngestReq):
+    tm=new_timings()
+    with timed(tm,"mask"): masked=await mask_all([d.text for d in req.docs])
+    items=((d.id, t, {"id":d.id,"text":t,"source":d.source}) for d,t in zip(req.docs, masked))
+    st=await sync_items(items, tm, docs=[d.id for d in req.docs])
+    return {"ok":True,"count":len(req.docs),**st,"timings_ms":report(tm)}
 
 @app.post("/ingest/upload")
 async def ingest_upload(file: UploadFile=File(...), source: str=Form(None)):
-    raw = (pdf_to_text(await file.read()) if file.filename.lower().endswith(".pdf")
-           else (await file.read()).decode("utf-8","ignore") if file.filename.lower().endswith(".txt")
-           else None)
-    if raw is None: return {"ok":False,"error":"Gunakan PDF atau TXT."}
-    safe=mask_pii(raw); pts=[]; src=source or file.filename
-    for i,ch in enumerate(chunk_text(safe)):
-        v=embed(ch)
-        pts.append(PointStruct(id=str(uuid.uuid4()), vector=v, payload={"id":f"{file.filename}#{i}","text":ch,"source":f"{src}#{i}"}))
-    if pts: qdrant.upsert(collection_name=COLL, points=pts)
-    return {"ok":True,"file":file.filename,"chunks":len(pts)}
+    """Pipeline streaming: halaman PDF (process pool) → masking lokal → chunk → Presidio → embed/upsert.
+    Timing per tahap dijumlahkan; karena tahap berjalan tumpang tindih, totalnya bisa melebihi durasi request."""
+    tm=new_timings(); name=file.filename.lower()
+    if name.endswith(".pdf"): pages=iter_pdf_pages(await file.read())
+    elif name.endswith(".txt"): pages=iter([(await file.read()).decode("utf-8","ignore")])
+    else: return {"ok":False,"error":"Gunakan PDF atau TXT."}
+    src=source or file.filename; n=0
+    # timer "mask" membungkus iterator halaman; waktu extract dikurangkan di akhir
+    chunks=chunk_doc(timed_iter(pii.mask_stream(timed_iter(pages, tm, "extract")), tm, "mask"))
+    async def items():
+        nonlocal n
+        async for batch in abatched(iter_in_thread(chunks), EMBED_BATCH):
+            with timed(tm,"mask"): texts=await mask_all([ch for ch,_ in batch], mask_person)
+            for (_,sec),ch in zip(batch,texts):
+                i=n; n+=1; yield src, ch, {"id":f"{file.filename}#{i}","text":ch,"source":f"{src}#{i}","section":sec}
+    st=await sync_items(items(), tm, [src])
+    tm["mask"]-=tm["extract"]
+    return {"ok":True,"file":file.filename,"chunks":n,**st,"timings_ms":report(tm)}
+
+@app.get("/ingest/manifest")
+async def ingest_manifest(source: str):
+    """Daftar chunk yang tersimpan untuk satu dokumen (source upload atau id /ingest)."""
+    out=[]; off=None
+    while True:
+        pts,off=await qdrant.scroll(COLL, scroll_filter=doc_filter(source), limit=1000, offset=off,
+                              with_payload=["id","hash"], with_vectors=False)
+        out+=[{"point_id":str(p.id),"id":p.payload.get("id"),"hash":p.payload.get("hash")} for p in pts]
+        if off is None: break
+    return {"source":source,"chunks":len(out),"manifest":out}
 
 # ==== Endpoints: ask (guardrails) ====
-@app.post("/ask")
-def ask(req: AskReq):
+class Hit(NamedTuple):
+    id: str
+    score: float
+    payload: dict
+
+async def vector_search(qv: List[float], limit: int) -> List[Hit]:
+    return [Hit(str(h.id), h.score, h.payload) for h in await qdrant.search(collection_name=COLL, query_vector=qv, limit=limit)]
+
+async def lexical_search(q: str, limit: int) -> List[Hit]:
+    return [Hit(*r) for r in await asyncio.to_thread(lex.search, q, limit)]
+
+async def retrieve(q: str, qv: List[float], k: int, mode: str=RETRIEVAL_MODE) -> Tuple[List[Hit], bool]:
+    """Top-k chunk + apakah cukup relevan (kosinus terbaik >= MIN_SIM, atau hasil BM25 teratas memuat
+    >= LEX_MIN_COVERAGE term pertanyaan). Mode hybrid menjalankan kedua retriever bersamaan lalu fusi RRF."""
+    n = max(k, HYBRID_CANDIDATES)
+    if mode == "vector": vec, lexh = await vector_search(qv, k), []
+    elif mode == "bm25": vec, lexh = [], await lexical_search(q, k)
+    else: vec, lexh = await asyncio.gather(vector_search(qv, n), lexical_search(q, n))
+    relevant = bool(vec and vec[0].score >= MIN_SIM) or bool(lexh and coverage(q, lexh[0].payload["text"]) >= LEX_MIN_COVERAGE)
+    if mode != "hybrid": return (vec or lexh)[:k], relevant
+    by_id = {h.id: h for h in lexh}; by_id.update({h.id: h for h in vec})
+    fused = rrf([[h.id for h in vec], [h.id for h in lexh]], RRF_K)[:k]
+    return [by_id[pid]._replace(score=sc) for pid, sc in fused], relevant
+
+class AskPlan(NamedTuple):
+    answer: Optional[str]       # terisi = jawaban final (penolakan / cache), LLM tidak dipanggil
+    citations: List[str]
+    prompt: str = ""
+    qv: Optional[List[float]] = None
+    version: int = 0            # versi koleksi saat retrieval, untuk answer_cache.put
+
+async def prepare_ask(req: AskReq) -> AskPlan:
+    """Guardrail + cache jawaban + retrieval."""
     if TOPIC_DENYLIST.search(req.q or ""):
-        return {"answer":"Maaf, topik sensitif tersebut tidak bisa dibantu. Hubungi HR.","citations":[]}
-    q = mask_pii(req.q) if MASK_FOR_RETRIEVAL else req.q
-    hits = qdrant.search(collection_name=COLL, query_vector=embed(q), limit=req.k)
-    if not hits: return {"answer":"Maaf, belum ada dasar kebijakan untuk pertanyaan itu.","citations":[]}
-    best=max(hits,key=lambda h:h.score)
-    if best.score < MIN_SIM:
-        return {"answer":"Maaf, referensi kebijakan belum cukup relevan. Mohon perjelas/cek HR.","citations":[]}
+        return AskPlan("Maaf, topik sensitif tersebut tidak bisa dibantu. Hubungi HR.", [])
+    if MASK_FOR_RETRIEVAL:  # retrieval memakai teks termask → embed harus menunggu masking
+        masked = await mask_pii(req.q); q = masked; qv = await embed(q)
+    else:
+        q = req.q; masked, qv = await asyncio.gather(mask_pii(q), embed(q))
+    version = answer_cache.version
+    if (hit := answer_cache.get(qv, req.k)): return AskPlan(hit.answer, hit.citations)
+    hits, relevant = await retrieve(q, qv, req.k)
+    if not hits: return AskPlan("Maaf, belum ada dasar kebijakan untuk pertanyaan itu.", [])
+    if not relevant:
+        return AskPlan("Maaf, referensi kebijakan belum cukup relevan. Mohon perjelas/cek HR.", [])
     ctx=[]; 
     for i,h in enumerate(hits,1):
-        p=h.payload; ctx.append(f"[{i}] ({p.get('source','')}) {p['text']}")
+        p=h.payload; sec=f" · {p['section']}" if p.get("section") else ""
+        ctx.append(f"[{i}] ({p.get('source','')}{sec}) {p['text']}")
     prompt=("Anda asisten kebijakan HR. Jawab hanya dari Konteks. "
             "Jika tidak cukup bukti, katakan tidak cukup. Sertakan sitasi [1],[2].\n\n"
-            f"Pertanyaan: {mask_pii(req.q)}\n\nKonteks:\n" + "\n\n".join(ctx))
-    return {"answer": generate(prompt), "citations": [h.payload.get("source","") for h in hits]}
+            f"Pertanyaan: {masked}\n\nKonteks:\n" + "\n\n".join(ctx))
+    return AskPlan(None, citations(hits), prompt, qv, version)
+
+def citations(hits) -> List[str]: return [h.payload.get("source","") for h in hits]
+
+@app.post("/ask")
+async def ask(req: AskReq):
+    plan = await prepare_ask(req)
+    if plan.answer is not None: return {"answer":plan.answer,"citations":plan.citations}
+    answer = await generate(plan.prompt)
+    answer_cache.put(plan.qv, req.k, Answer(answer, plan.citations), plan.version)
+    return {"answer": answer, "citations": plan.citations}
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskReq):
+    """SSE: event `citations` dulu, lalu `token` per potongan jawaban, ditutup `done` (atau `error`)."""
+    plan = await prepare_ask(req)
+    async def events():
+        yield sse("citations", {"citations": plan.citations})
+        if plan.answer is not None:
+            yield sse("token", {"t": plan.answer})
+        else:
+            parts=[]
+            try:
+                async for tok in generate_stream(plan.prompt): parts.append(tok); yield sse("token", {"t": tok})
+            except httpx.HTTPError as e:
+                yield sse("error", {"error": str(e)}); return
+            answer_cache.put(plan.qv, req.k, Answer("".join(parts), plan.citations), plan.version)
+        yield sse("done", {})
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # ==== Horilla bridge (opsional) ====
-def hget(path:str):
-    url=f"{HORILLA_BASE_URL.rstrip('/')}{path}"; hdrs={}
+async def hget(path:str):
+    hdrs={}
     if HORILLA_API_TOKEN: hdrs["Authorization"]=f"Bearer {HORILLA_API_TOKEN}"
-    r=requests.get(url,headers=hdrs,timeout=15); r.raise_for_status(); return r.json()
+    r=await horilla.get(path,headers=hdrs); r.raise_for_status(); return r.json()
 
 @app.post("/bridge/leave_balance")
-def bridge_leave_balance(req: LeaveBalanceReq):
+async def bridge_leave_balance(req: LeaveBalanceReq):
     last=""
     for path in (f"/api/leave/balance/{req.employee_id}", f"/api/v1/leave/balance/{req.employee_id}"):
         try:
-            data=hget(path); bal=data.get("balance") or data.get("remaining") or data
+            data=await hget(path); bal=data.get("balance") or data.get("remaining") or data
             return {"ok":True,"employee_id":req.employee_id,"balance":bal,"source":path}
         except Exception as e:
             last=str(e)
     return {"ok":False,"error":"Gagal panggil API Horilla. Cek token/endpoint.","details":last}
 
 @app.get("/healthz")
-def healthz(): return {"status":"ok","qdrant":QDRANT_URL,"model":GEN_MODEL,"min_sim":MIN_SIM}
+async def healthz(): return {"status":"ok","qdrant":QDRANT_URL,"model":GEN_MODEL,"min_sim":MIN_SIM,"embed_cache":embed_cache.stats(),"answer_cache":answer_cache.stats()}
@@ -0,0 +1,70 @@
+"""Indeks leksikal (SQLite FTS5, skor BM25) yang dijaga sinkron dengan point di Qdrant."""
+import re, sqlite3, threading
+from typing import Iterable, List, Sequence, Set, Tuple
+
+_TOKEN = re.compile(r"\w+", re.U)
+def tokens(text: str) -> List[str]: return _TOKEN.findall(text.lower())
+
+class LexicalIndex:
+    """Satu baris per chunk (pid = id point Qdrant). Tabel FTS5 memakai external content + trigger."""
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL"); self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunk (id INTEGER PRIMARY KEY, pid TEXT UNIQUE NOT NULL,
+                                              doc TEXT NOT NULL, source TEXT, text TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS chunk_doc ON chunk(doc);
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunk_fts USING fts5(
+                text, content='chunk', content_rowid='id', tokenize='unicode61 remove_diacritics 2');
+            CREATE TRIGGER IF NOT EXISTS chunk_ai AFTER INSERT ON chunk BEGIN
+                INSERT INTO chunk_fts(rowid, text) VALUES (new.id, new.text); END;
+            CREATE TRIGGER IF NOT EXISTS chunk_ad AFTER DELETE ON chunk BEGIN
+                INSERT INTO chunk_fts(chunk_fts, rowid, text) VALUES ('delete', old.id, old.text); END;
+        """)
+
+    def count(self) -> int:
+        with self._lock: return self._db.execute("SELECT COUNT(*) FROM chunk").fetchone()[0]
+
+    def add(self, rows: Iterable[Tuple[str, str, str, str]]):
+        """rows: (pid, doc, source, text); pid yang sudah ada diabaikan."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR IGNORE INTO chunk(pid, doc, source, text) VALUES (?,?,?,?)", rows)
+
+    def set_source(self, pairs: Iterable[Tuple[str, str]]):
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany("UPDATE chunk SET source=? WHERE pid=?", [(s, p) for p, s in pairs])
+
+    def prune_doc(self, doc: str, keep: Set[str]) -> int:
+        """Hapus chunk milik `doc` yang pid-nya tidak ada di `keep`."""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            stale = [(pid,) for (pid,) in self._db.execute("SELECT pid FROM chunk WHERE doc=?", (doc,)) if pid not in keep]
+            self._db.executemany("DELETE FROM chunk WHERE pid=?", stale)
+        return len(stale)
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, float, dict]]:
+        """Kembalikan (pid, skor, payload) terurut; skor = -bm25 (lebih besar lebih relevan)."""
+        terms = list(dict.fromkeys(tokens(query)))
+        if not terms: return []
+        match = " OR ".join('"%s"' % t for t in terms)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.pid, -bm25(chunk_fts), c.source, c.text FROM chunk_fts JOIN chunk c ON c.id = chunk_fts.rowid "
+                "WHERE chunk_fts MATCH ? ORDER BY bm25(chunk_fts) LIMIT ?", (match, limit)).fetchall()
+        return [(pid, score, {"source": src, "text": text}) for pid, score, src, text in rows]
+
+def coverage(query: str, text: str) -> float:
+    """Porsi term unik pertanyaan yang muncul di teks (dipakai sebagai ambang relevansi hasil leksikal)."""
+    q = set(tokens(query))
+    return len(q & set(tokens(text))) / len(q) if q else 0.0
+
+def rrf(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal rank fusion: skor(id) = Σ 1 / (k + peringkat)."""
+    scores = {}
+    for ranking in rankings:
+        for rank, pid in enumerate(ranking, 1):
+            scores[pid] = scores.get(pid, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
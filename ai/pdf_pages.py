@@ -0,0 +1,44 @@
+"""Ekstraksi teks PDF per halaman, paralel di process pool, hasil tetap berurutan.
+
+Setiap worker membuka PDF sekali (initializer) lalu mengekstrak halaman yang diminta. Paling banyak
+`window` halaman sedang dikerjakan / menunggu dikonsumsi, jadi memori teks dibatasi jendela itu,
+bukan seluruh dokumen, dan tahap berikutnya bisa mulai dari halaman 1 selagi sisanya diparse.
+"""
+import io, os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Optional
+from pypdf import PdfReader
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_WINDOW = int(os.getenv("PDF_WINDOW", "16"))            # halaman in-flight maksimum
+PDF_PARALLEL_MIN = int(os.getenv("PDF_PARALLEL_MIN", "8"))  # di bawah ini ekstraksi di proses sendiri
+
+_reader: Optional[PdfReader] = None
+
+def _open(data: bytes):
+    global _reader
+    _reader = PdfReader(io.BytesIO(data))
+
+def _text(page) -> str:
+    t = page.extract_text() or ""
+    return t if t.endswith("\n") else t + "\n"   # halaman berikutnya selalu mulai di baris baru
+
+def _page(i: int) -> str:
+    return _text(_reader.pages[i])
+
+def iter_pdf_pages(data: bytes, workers: int = PDF_WORKERS, window: int = PDF_WINDOW) -> Iterator[str]:
+    reader = PdfReader(io.BytesIO(data)); n = len(reader.pages)
+    if workers <= 1 or n < PDF_PARALLEL_MIN:
+        for p in reader.pages: yield _text(p)
+        return
+    del reader
+    with ProcessPoolExecutor(min(workers, n), initializer=_open, initargs=(data,)) as pool:
+        pending = deque(); nxt = 0
+        try:
+            while nxt < n or pending:
+                while nxt < n and len(pending) < window:
+                    pending.append(pool.submit(_page, nxt)); nxt += 1
+                yield pending.popleft().result()
+        finally:
+            for f in pending: f.cancel()
@@ -0,0 +1,69 @@
+"""Masking PII lokal: semua recognizer digabung dalam satu regex sehingga teks hanya dipindai sekali."""
+import re
+from typing import Iterable, Iterator
+
+FMT = "[REDACTED:{t}]"
+
+# Urutan alternatif menentukan prioritas bila dua pola bisa mulai di posisi yang sama.
+PII_RE = re.compile(r"""
+  (?P<EMAIL>[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,})
+| (?P<IBAN>\b[A-Z]{2}\d{2}(?:[ ]?[A-Z0-9]{4}){2,7}(?:[ ]?[A-Z0-9]{1,3})?\b)
+| (?P<NPWP>(?<![\d.])\d{2}\.\d{3}\.\d{3}\.\d-\d{3}\.\d{3}(?![\d.]))
+| (?P<BANK_ACCOUNT_CTX>(?i:\b(?:no(?:mor)?\.?\s*)?(?:rek(?:ening)?|account|acc)\.?\s*(?:no\.?|nomor)?\s*[:.]?\s*))
+  (?P<BANK_ACCOUNT>\d(?:[ -]?\d){5,17})(?!\d)
+| (?P<PHONE>(?<![\w+])(?:\+62|62|0)[ -]?8[1-9](?:[ -]?\d){6,11}(?!\d))
+| (?P<DIGITS>(?<![\w.])\d(?:[ -]?\d){12,18}(?![\w]))
+""", re.X)
+
+def luhn_ok(digits: str) -> bool:
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        d = ord(ch) - 48
+        if i % 2: d = d * 2 - 9 if d > 4 else d * 2
+        total += d
+    return total % 10 == 0
+
+def nik_ok(d: str) -> bool:
+    """NIK 16 digit: kode provinsi 11–94, tanggal lahir (perempuan +40), bulan 01–12."""
+    if len(d) != 16: return False
+    prov, day, month = int(d[:2]), int(d[6:8]), int(d[8:10])
+    return 11 <= prov <= 94 and (1 <= day <= 31 or 41 <= day <= 71) and 1 <= month <= 12
+
+def classify_digits(raw: str):
+    d = re.sub(r"[ -]", "", raw)
+    if len(d) == 16 and raw == d and nik_ok(d): return "NIK"
+    if 13 <= len(d) <= 19 and luhn_ok(d): return "CREDIT_CARD"
+    if len(d) == 15 and raw == d: return "NPWP"  # NPWP 15 digit tanpa tanda baca
+    return None
+
+def _replace(m: re.Match) -> str:
+    kind = m.lastgroup
+    if kind == "BANK_ACCOUNT":
+        return m.group("BANK_ACCOUNT_CTX") + FMT.format(t="BANK_ACCOUNT")
+    if kind == "DIGITS":
+        kind = classify_digits(m.group(0))
+        if kind is None: return m.group(0)
+    return FMT.format(t=kind)
+
+def mask_text(text: str) -> str:
+    return PII_RE.sub(_replace, text) if text else text
+
+def mask_stream(pieces: Iterable[str], tail: int = 256) -> Iterator[str]:
+    """Masking teks besar sepotong demi sepotong (mis. per halaman PDF).
+
+    `tail` karakter terakhir selalu ditahan sampai potongan berikutnya datang, dan pemotongan
+    dilakukan di whitespace, sehingga entitas yang terbelah antar potongan tetap dikenali.
+    """
+    buf = ""
+    for piece in pieces:
+        buf += piece
+        if len(buf) < 2 * tail: continue
+        out = []; pos = 0; limit = len(buf) - tail
+        for m in PII_RE.finditer(buf):
+            if m.start() >= limit: break
+            out.append(buf[pos:m.start()]); out.append(_replace(m)); pos = m.end()
+        ws = max(buf.rfind(" ", pos, limit), buf.rfind("\n", pos, limit))
+        cut = ws + 1 if ws >= 0 else max(pos, limit)
+        out.append(buf[pos:cut]); buf = buf[cut:]
+        yield "".join(out)
+    if buf: yield mask_text(buf)
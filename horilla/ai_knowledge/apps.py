@@ -6,3 +6,12 @@ class AiKnowledgeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_knowledge'
     verbose_name = _('AI Knowledge Management')
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import progress, vector_index  # noqa: F401  (connect the progress and embedding signals)
+        from .search import ensure_search_schema
+
+        # Full-text index columns/tables are not part of the (per-deployment) migrations
+        post_migrate.connect(ensure_search_schema, sender=self)
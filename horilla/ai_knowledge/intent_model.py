@@ -0,0 +1,224 @@
+"""
+Intent classifier trained from the approved AI Knowledge examples.
+
+``train_intent_model`` fits one TF-IDF (word and character n-grams) + logistic regression model
+over every approved example in a single vectorized batch: validated or previously trained
+TrainingData rows with an intent label, the rows being trained now, and the example phrases of
+active AIIntents. It reports hold-out accuracy and macro precision/recall/F1, and stores the
+model as a new active AIModelVersion (a joblib file under AI_KNOWLEDGE_MODEL_DIR). Classes with
+a single example are used for training but cannot be evaluated. ``get_intent_classifier()``
+keeps the active version in memory and reloads it when another version is activated.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AIIntent, AIModelVersion, TrainingData
+
+try:
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import FeatureUnion, Pipeline
+except ImportError:
+    joblib = None
+
+logger = logging.getLogger(__name__)
+
+# Models are pickles: keep them out of MEDIA_ROOT (publicly served), and only load them from here
+MODEL_DIR = getattr(settings, 'AI_KNOWLEDGE_MODEL_DIR', os.path.join(getattr(settings, 'BASE_DIR', '.'), 'ai_models'))
+TEST_SIZE = getattr(settings, 'AI_KNOWLEDGE_INTENT_TEST_SIZE', 0.2)
+# Confidence a prediction needs when its examples set no confidence_threshold (AIIntent phrases)
+DEFAULT_THRESHOLD = getattr(settings, 'AI_KNOWLEDGE_INTENT_THRESHOLD', 0.5)
+REFRESH_SECONDS = getattr(settings, 'AI_KNOWLEDGE_INTENT_MODEL_REFRESH', 60)
+
+# (text, label, response, confidence threshold)
+Example = Tuple[str, str, str, float]
+
+
+def build_pipeline() -> 'Pipeline':
+    """Word and character n-gram TF-IDF (robust to typos and mixed Indonesian/English) + logistic regression"""
+    features = FeatureUnion([
+        ('words', TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)),
+        ('chars', TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True)),
+    ])
+    return Pipeline([('features', features), ('classifier', LogisticRegression(C=10, max_iter=1000))])
+
+
+def approved_training_data(training_ids: Sequence[int] = ()):
+    """Labelled TrainingData that is validated, already trained, or being trained now"""
+    return TrainingData.objects.filter(
+        Q(is_validated=True) | Q(training_progress=100) | Q(id__in=list(training_ids))
+    ).exclude(intent_label='').exclude(input_text='')
+
+
+def collect_examples(training_ids: Sequence[int] = ()) -> List[Example]:
+    """Approved training examples, two queries in total"""
+    examples = list(approved_training_data(training_ids).values_list(
+        'input_text', 'intent_label', 'expected_output', 'confidence_threshold'
+    ))
+    for name, phrases, responses in AIIntent.objects.filter(is_active=True).values_list(
+            'name', 'examples', 'responses'):
+        response = responses[0] if responses else ''
+        examples.extend((phrase, name, response, DEFAULT_THRESHOLD) for phrase in phrases or [] if phrase)
+    return examples
+
+
+def _evaluate(texts: List[str], labels: List[str]) -> Dict[str, Optional[float]]:
+    counts = Counter(labels)
+    evaluable = [i for i, label in enumerate(labels) if counts[label] > 1]
+    if len(set(labels[i] for i in evaluable)) < 2:
+        return {'accuracy': None, 'precision': None, 'recall': None, 'f1': None, 'test_examples': 0}
+    train_idx, test_idx = train_test_split(
+        evaluable, test_size=max(TEST_SIZE, len(set(labels[i] for i in evaluable)) / len(evaluable)),
+        stratify=[labels[i] for i in evaluable], random_state=0
+    )
+    held_out = set(test_idx)
+    model = build_pipeline().fit([texts[i] for i in range(len(texts)) if i not in held_out],
+                                 [labels[i] for i in range(len(labels)) if i not in held_out])
+    expected = [labels[i] for i in test_idx]
+    predicted = model.predict([texts[i] for i in test_idx])
+    precision, recall, f1, _ = precision_recall_fscore_support(expected, predicted, average='macro', zero_division=0)
+    return {'accuracy': float(accuracy_score(expected, predicted)), 'precision': float(precision),
+            'recall': float(recall), 'f1': float(f1), 'test_examples': len(test_idx)}
+
+
+def train_intent_model(created_by: Optional[User] = None, training_ids: Sequence[int] = (),
+                       progress: Optional[Callable[[int, str], None]] = None) -> Dict[str, Any]:
+    """
+    Fit, evaluate and activate a new intent classifier version; returns its AIModelVersion with
+    the example counts, metrics and elapsed seconds. ``progress(percent, stage)`` is called as the
+    stages start. Raises ValueError when there is nothing to learn from.
+    """
+    if joblib is None:
+        raise ImportError("scikit-learn is required for intent training")
+    progress = progress or (lambda percent, stage: None)
+    started = time.perf_counter()
+
+    progress(10, 'preprocessing')
+    examples = collect_examples(training_ids)
+    texts = [' '.join(text.split()) for text, _, _, _ in examples]
+    labels = [label for _, label, _, _ in examples]
+    if len(set(labels)) < 2:
+        raise ValueError(f"Intent training needs examples of at least 2 intents, found {len(set(labels))}")
+
+    progress(25, 'evaluating')
+    metrics = _evaluate(texts, labels)
+
+    progress(50, 'training')
+    pipeline = build_pipeline().fit(texts, labels)
+
+    progress(75, 'saving')
+    responses, thresholds = {}, {}
+    for _, label, response, threshold in examples:
+        if response and label not in responses:
+            responses[label] = response
+        thresholds[label] = min(thresholds.get(label, 1.0), threshold or DEFAULT_THRESHOLD)
+    version = f"intent-{timezone.now():%Y%m%d%H%M%S%f}"
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    model_path = os.path.join(MODEL_DIR, f"{version}.joblib")
+    joblib.dump({'pipeline': pipeline, 'responses': responses, 'thresholds': thresholds}, model_path)
+
+    elapsed = time.perf_counter() - started
+    created_by = created_by or User.objects.filter(is_superuser=True).order_by('id').first() \
+        or User.objects.order_by('id').first()
+    model_version = AIModelVersion.objects.create(
+        version=version,
+        description=(f"TF-IDF + logistic regression over {len(examples)} examples of {len(set(labels))} intents "
+                     f"({metrics['test_examples']} held out), trained in {elapsed:.2f}s"),
+        model_path=model_path,
+        training_documents_count=approved_training_data(training_ids).exclude(
+            source_document=None
+        ).values('source_document').distinct().count(),
+        accuracy_score=metrics['accuracy'],
+        precision_score=metrics['precision'],
+        recall_score=metrics['recall'],
+        f1_score=metrics['f1'],
+        is_active=True,
+        created_by=created_by,
+    )
+    if _classifier is not None:
+        _classifier.mark_stale()
+    logger.info(f"Trained {model_version}: {model_version.description}, accuracy {metrics['accuracy']}")
+    return {'model_version': model_version, 'examples': len(examples), 'intents': len(set(labels)),
+            'elapsed_seconds': round(elapsed, 3), **metrics}
+
+
+class IntentClassifier:
+    """In-memory copy of the active intent model version"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model = None
+        self.version_id = None
+        self._next_check = 0.0
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + REFRESH_SECONDS
+            active = AIModelVersion.objects.filter(is_active=True, version__startswith='intent-').values_list(
+                'id', 'model_path').first()
+            if active is None:
+                self._model, self.version_id = None, None
+            elif active[0] != self.version_id:
+                if os.path.dirname(os.path.realpath(active[1])) != os.path.realpath(MODEL_DIR):
+                    logger.warning(f"Not loading intent model {active[1]}: outside {MODEL_DIR}")
+                    return
+                try:
+                    self._model = joblib.load(active[1])
+                    self.version_id = active[0]
+                except Exception as e:
+                    logger.warning(f"Could not load intent model {active[1]}: {e}")
+
+    def mark_stale(self):
+        self._next_check = 0.0
+
+    def predict(self, text: str) -> Optional[Dict[str, Any]]:
+        """Best intent as ``{intent, confidence, response, confident}``, or None without a trained model"""
+        if joblib is None:
+            return None
+        self._refresh()
+        model = self._model
+        if model is None or not text.strip():
+            return None
+        pipeline = model['pipeline']
+        probabilities = pipeline.predict_proba([' '.join(text.split())])[0]
+        best = int(probabilities.argmax())
+        intent = str(pipeline.classes_[best])
+        confidence = float(probabilities[best])
+        return {
+            'intent': intent,
+            'confidence': confidence,
+            'response': model['responses'].get(intent, ''),
+            'confident': confidence >= model['thresholds'].get(intent, DEFAULT_THRESHOLD),
+        }
+
+
+_classifier: Optional[IntentClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """Process-wide intent classifier (loaded on first prediction)"""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = IntentClassifier()
+    return _classifier
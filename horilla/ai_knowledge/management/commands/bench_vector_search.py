@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ai_knowledge.vector_index import VectorIndex
+
+
+class Command(BaseCommand):
+    help = "Benchmark exact nearest-neighbour latency of the in-memory AI Knowledge vector index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="10000,100000",
+            help="Comma separated index sizes (default: 10000,100000)",
+        )
+        parser.add_argument(
+            "--dimensions",
+            type=int,
+            default=768,
+            help="Vector dimensions (default: 768, nomic-embed-text)",
+        )
+        parser.add_argument("--queries", type=int, default=200, help="Queries per size (default: 200)")
+        parser.add_argument("--limit", type=int, default=10, help="Neighbours per query (default: 10)")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        dimensions, limit = options["dimensions"], options["limit"]
+        self.stdout.write(f"{'vectors':>8} {'load ms':>8} {'MB':>7} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7}")
+        for size in [int(s) for s in options["sizes"].split(",")]:
+            vectors = rng.standard_normal((size, dimensions), dtype=np.float32)
+            queries = rng.standard_normal((options["queries"], dimensions), dtype=np.float32)
+
+            index = VectorIndex()
+            started = time.perf_counter()
+            index.add(list(range(1, size + 1)), vectors)
+            load_ms = (time.perf_counter() - started) * 1000
+            # A few deletes, as after entries are removed (rows are compacted)
+            index.remove(range(1, size + 1, 1000))
+
+            latencies = []
+            for query in queries:
+                started = time.perf_counter()
+                index.nearest(query, limit)
+                latencies.append((time.perf_counter() - started) * 1000)
+            p50, p95 = np.percentile(latencies, [50, 95])
+            self.stdout.write(
+                f"{size:>8} {load_ms:>8.1f} {index.stats()['megabytes']:>7.1f} "
+                f"{p50:>7.2f} {p95:>7.2f} {max(latencies):>7.2f}"
+            )
+
+            # Exactness check against a full sort of the same scores
+            normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            scores = normalized @ (queries[0] / np.linalg.norm(queries[0]))
+            scores[::1000] = -np.inf
+            expected = [int(i) + 1 for i in np.argsort(-scores)[:limit]]
+            if [embedding_id for embedding_id, _ in index.nearest(queries[0], limit)] != expected:
+                self.stdout.write(self.style.ERROR("  top-k differs from a full sort"))
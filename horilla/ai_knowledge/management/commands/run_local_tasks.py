@@ -0,0 +1,42 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from ai_knowledge.task_queue import get_local_queue
+
+
+class Command(BaseCommand):
+    help = "Runs the local AI Knowledge task executor (the broker-less fallback for Celery) in the foreground"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Pool size (default: AI_KNOWLEDGE_LOCAL_WORKERS)")
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Print the queue depth and exit",
+        )
+
+    def handle(self, *args, **options):
+        queue = get_local_queue()
+        if options["stats"]:
+            self.stdout.write(json.dumps(queue.stats(), indent=2))
+            return
+
+        if options["workers"]:
+            queue.workers = options["workers"]
+        queue.start()
+        self.stdout.write(
+            self.style.SUCCESS(f"Local task executor running {queue.workers} {queue.executor} workers on {queue.path}")
+        )
+        try:
+            while True:
+                time.sleep(60)
+                stats = queue.stats()
+                self.stdout.write(
+                    f"queued={stats['queued']} running={stats['running']} failed={stats['failed']} "
+                    f"completed={stats['completed_here']}"
+                )
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping, waiting for running tasks...")
+            queue.stop()
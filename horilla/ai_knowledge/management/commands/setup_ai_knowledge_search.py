@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from ai_knowledge.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Creates (or rebuilds) the database full-text index used for AI Knowledge lookups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Re-index every knowledge entry and document",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if backend is None:
+            self.stdout.write(
+                self.style.WARNING(
+                    "No full-text backend for this database; AI Knowledge lookups use keyword matching."
+                )
+            )
+            return
+
+        if options["rebuild"]:
+            backend.rebuild()
+        else:
+            backend.ensure_schema()
+        self.stdout.write(
+            self.style.SUCCESS(f"AI Knowledge full-text search ready ({backend.vendor}).")
+        )
@@ -135,6 +135,40 @@ class KnowledgeBaseEntry(models.Model):
     def __str__(self):
         return self.title
 
+class KnowledgeEmbedding(models.Model):
+    """Embedding vector of a knowledge base entry or of one chunk of a document's extracted text"""
+    document = models.ForeignKey(
+        AIDocument,
+        on_delete=models.CASCADE,
+        related_name='embeddings',
+        verbose_name=_("Document")
+    )
+    entry = models.ForeignKey(
+        KnowledgeBaseEntry,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='embeddings',
+        verbose_name=_("Knowledge Base Entry")
+    )
+    chunk_index = models.IntegerField(default=0, verbose_name=_("Chunk Index"))
+    text = models.TextField(verbose_name=_("Embedded Text"))
+    content_hash = models.CharField(max_length=64, verbose_name=_("Content Hash"))
+    model = models.CharField(max_length=100, verbose_name=_("Embedding Model"))
+    dimensions = models.IntegerField(verbose_name=_("Dimensions"))
+    vector = models.BinaryField(verbose_name=_("Vector (float32)"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Knowledge Embedding")
+        verbose_name_plural = _("Knowledge Embeddings")
+        ordering = ['document', 'entry', 'chunk_index']
+        indexes = [models.Index(fields=['model', 'updated_at'])]
+
+    def __str__(self):
+        target = f"entry {self.entry_id}" if self.entry_id else f"chunk {self.chunk_index}"
+        return f"{self.document_id} - {target}"
+
 class TrainingData(models.Model):
     """Training data for AI model"""
     TRAINING_TYPES = [
@@ -277,3 +311,23 @@ class AIModelVersion(models.Model):
             # Deactivate other versions
             AIModelVersion.objects.filter(is_active=True).update(is_active=False)
         super().save(*args, **kwargs)
+
+class ProgressEvent(models.Model):
+    """Document/training progress change, read by the dashboards' progress broker (see progress.py)"""
+    KINDS = [
+        ('document', _('Document')),
+        ('training', _('Training Data')),
+        ('count', _('Counter')),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KINDS, verbose_name=_("Kind"))
+    data = models.JSONField(default=dict, verbose_name=_("Data"))
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = _("Progress Event")
+        verbose_name_plural = _("Progress Events")
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"{self.kind} {self.data}"
@@ -0,0 +1,541 @@
+"""
+Push-based progress for the AI Knowledge dashboards.
+
+Writers publish ProgressEvent rows. The model signals cover single saves and deletes, and the bulk
+paths (task progress updates, bulk_create, queryset updates) publish explicitly. Events published
+inside a transaction are merged and written with one INSERT when it commits.
+
+In each web process one ProgressBroker thread tails the event table and DocumentProcessingLog by
+id (re-reading ids skipped by transactions that committed late). It applies the events to an
+in-memory copy of document status and progress, training item progress and the dashboard
+counters, and keeps the recent deltas for the long-polled ``api_progress_updates``. The polling
+JSON endpoints read the same state. Dashboards therefore cost two indexed queries per poll
+interval per process, however many tabs are open. A full recount every
+AI_KNOWLEDGE_PROGRESS_RESYNC seconds corrects changes that bypassed the events. The thread stops
+when no dashboard has used it for AI_KNOWLEDGE_PROGRESS_IDLE seconds.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, deque
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import AIDocument, AIIntent, DocumentProcessingLog, KnowledgeBaseEntry, ProgressEvent, TrainingData
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = getattr(settings, 'AI_KNOWLEDGE_PROGRESS_POLL', 1.0)
+RESYNC_SECONDS = getattr(settings, 'AI_KNOWLEDGE_PROGRESS_RESYNC', 300)
+IDLE_SECONDS = getattr(settings, 'AI_KNOWLEDGE_PROGRESS_IDLE', 60)
+HISTORY_SIZE = getattr(settings, 'AI_KNOWLEDGE_PROGRESS_HISTORY', 300)  # deltas kept for long-poll cursors
+GAP_SECONDS = getattr(settings, 'AI_KNOWLEDGE_PROGRESS_GAP_SECONDS', 120)
+MAX_GAPS = 1000
+EVENT_RETENTION = timedelta(hours=getattr(settings, 'AI_KNOWLEDGE_PROGRESS_RETENTION_HOURS', 24))
+POLL_BATCH = 1000
+QUESTION_CHARS = 200
+
+Event = Tuple[str, Dict[str, Any]]
+
+_pending = threading.local()
+
+
+# Publishing
+
+def _merge(events: List[Event]) -> List[Event]:
+    """Collapse a transaction's events: one per document, one per counter, deletions combined"""
+    documents: Dict[int, Dict[str, Any]] = {}
+    counts: Counter = Counter()
+    deleted_training: List[int] = []
+    merged: List[Event] = []
+    for kind, data in events:
+        if kind == 'document':
+            documents.setdefault(data['id'], {}).update(data)
+        elif kind == 'count':
+            counts[data['model']] += data['delta']
+        elif kind == 'training' and data.get('deleted'):
+            deleted_training.extend(data['ids'])
+        else:
+            merged.append((kind, data))
+    merged.extend(('document', data) for data in documents.values())
+    merged.extend(('count', {'model': model, 'delta': delta}) for model, delta in counts.items() if delta)
+    if deleted_training:
+        merged.append(('training', {'ids': deleted_training, 'deleted': True}))
+    return merged
+
+
+def _write(events: List[Event]):
+    try:
+        ProgressEvent.objects.bulk_create([ProgressEvent(kind=kind, data=data) for kind, data in _merge(events)])
+    except Exception as e:
+        logger.warning(f"Could not publish {len(events)} progress events: {e}")
+
+
+class _Buffer(list):
+    def flush(self):
+        if _pending.__dict__.get('buffer') is self:
+            _pending.buffer = None
+        _write(self)
+
+
+def publish_many(events: Iterable[Event]):
+    """
+    Publish ``(kind, data)`` events. Inside a transaction they are written, merged, when it
+    commits (and dropped if it rolls back); otherwise right away.
+    """
+    events = list(events)
+    if not events:
+        return
+    if not connection.in_atomic_block:
+        _write(events)
+        return
+    buffer = getattr(_pending, 'buffer', None)
+    # A buffer whose commit hook is gone belongs to a transaction that rolled back
+    if buffer is None or not any(hook[1] == buffer.flush for hook in connection.run_on_commit):
+        buffer = _pending.buffer = _Buffer()
+        transaction.on_commit(buffer.flush)
+    buffer.extend(events)
+
+
+def publish(kind: str, **data):
+    publish_many([(kind, data)])
+
+
+def _document_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        publish('document', id=instance.id, title=instance.title, status=instance.status,
+                progress=instance.processing_progress, stage=instance.processing_stage)
+
+
+def _document_deleted(sender, instance, **kwargs):
+    publish('document', id=instance.id, deleted=True)
+
+
+def _training_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        publish('training', ids=[instance.id], progress=instance.training_progress, stage=instance.training_stage,
+                question=(instance.input_text or instance.name)[:QUESTION_CHARS], name=instance.name,
+                type=instance.training_type)
+
+
+def _training_deleted(sender, instance, **kwargs):
+    publish('training', ids=[instance.id], deleted=True)
+
+
+def _counted(model_name: str):
+    def saved(sender, instance, created=False, raw=False, **kwargs):
+        if created and not raw:
+            publish('count', model=model_name, delta=1)
+
+    def deleted(sender, instance, **kwargs):
+        publish('count', model=model_name, delta=-1)
+
+    return saved, deleted
+
+
+post_save.connect(_document_saved, sender=AIDocument, dispatch_uid='progress_document_saved')
+post_delete.connect(_document_deleted, sender=AIDocument, dispatch_uid='progress_document_deleted')
+post_save.connect(_training_saved, sender=TrainingData, dispatch_uid='progress_training_saved')
+post_delete.connect(_training_deleted, sender=TrainingData, dispatch_uid='progress_training_deleted')
+for _model, _name in ((KnowledgeBaseEntry, 'knowledge_entries'), (AIIntent, 'intents')):
+    _saved, _deleted = _counted(_name)
+    post_save.connect(_saved, sender=_model, weak=False, dispatch_uid=f'progress_{_name}_saved')
+    post_delete.connect(_deleted, sender=_model, weak=False, dispatch_uid=f'progress_{_name}_deleted')
+
+
+# Broker
+
+def training_bucket(progress: int) -> str:
+    if progress == 0:
+        return 'pending'
+    return 'completed' if progress == 100 else 'in_progress'
+
+
+class _Tail:
+    """
+    Reads a table's new rows by increasing id. On PostgreSQL a row can commit after rows with
+    higher ids (concurrent tasks, longer transactions), so the ids skipped over are re-read as
+    gaps for GAP_SECONDS; after that they are taken to be rolled back.
+    """
+
+    def __init__(self, queryset, fields: Tuple[str, ...]):
+        self.queryset = queryset
+        self.fields = fields
+        self.cursor = 0
+        self.gaps: Dict[int, float] = {}  # missing id -> monotonic time it was first skipped
+
+    def reset(self):
+        self.cursor = self.queryset.aggregate(last=Max('id'))['last'] or 0
+        self.gaps = {}
+
+    def read(self) -> List[tuple]:
+        """New rows, gaps that committed since included, in id order"""
+        now = time.monotonic()
+        self.gaps = {row_id: skipped for row_id, skipped in self.gaps.items() if now - skipped < GAP_SECONDS}
+        condition = Q(id__gt=self.cursor)
+        if self.gaps:
+            condition |= Q(id__in=list(self.gaps))
+        rows = list(self.queryset.filter(condition).order_by('id').values_list('id', *self.fields)[:POLL_BATCH])
+        for row in rows:
+            if self.gaps.pop(row[0], None) is None and row[0] > self.cursor:
+                if row[0] - self.cursor - 1 <= MAX_GAPS:
+                    self.gaps.update((row_id, now) for row_id in range(self.cursor + 1, row[0]))
+                self.cursor = row[0]
+        return rows
+
+
+class ProgressBroker:
+    """In-memory dashboard state kept current from the progress events"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._thread = None
+        self._last_used = 0.0
+        self._synced_at = None
+        self.events = _Tail(ProgressEvent.objects.all(), ('kind', 'data'))
+        self.logs = _Tail(DocumentProcessingLog.objects.all(), (
+            'document_id', 'document__title', 'processing_step', 'level', 'message', 'created_at'))
+        # Clients hold "<generation>:<version>" cursors; a resync starts a new generation
+        self.generation = 0
+        self.version = 0
+        self.history = deque(maxlen=HISTORY_SIZE)  # (version, delta)
+        self.documents: Dict[int, Dict[str, Any]] = {}
+        self.training: Dict[int, Dict[str, Any]] = {}
+        self.status_counts: Counter = Counter()
+        self.training_counts: Counter = Counter()
+        self.totals: Counter = Counter()
+        self.activities = deque(maxlen=10)
+        self.completed_recently = deque()  # (time, document id) of documents that became processed
+        self._sent_counters: Dict[str, Any] = {}
+
+    # Lifecycle
+
+    def _ensure(self):
+        with self._lock:
+            self._last_used = time.monotonic()
+            if self._thread is None:
+                if self._synced_at is None:
+                    self.resync()
+                self._thread = threading.Thread(target=self._run, name='ai-knowledge-progress', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        try:
+            while True:
+                time.sleep(POLL_SECONDS)
+                with self._lock:
+                    if time.monotonic() - self._last_used > IDLE_SECONDS:
+                        # Nobody is watching: stop, and resync when a dashboard comes back
+                        self._thread = None
+                        self._synced_at = None
+                        return
+                try:
+                    if time.monotonic() - (self._synced_at or 0) > RESYNC_SECONDS:
+                        self.resync()
+                    else:
+                        self.poll()
+                except Exception as e:
+                    logger.warning(f"Progress broker poll failed: {e}")
+        finally:
+            connection.close()
+
+    # State
+
+    def _set_document(self, document_id: int, data: Dict[str, Any], changed: Dict[int, Any]):
+        current = self.documents.get(document_id)
+        if data.get('deleted'):
+            if current is not None:
+                del self.documents[document_id]
+                self.status_counts[current['status']] -= 1
+                changed[document_id] = None
+            return
+        if current is None:
+            current = self.documents[document_id] = {'title': '', 'status': 'pending', 'progress': 0, 'stage': ''}
+            self.status_counts[current['status']] += 1
+        previous_status = current['status']
+        current.update({key: data[key] for key in ('title', 'status', 'progress', 'stage') if key in data})
+        if current['status'] != previous_status:
+            self.status_counts[previous_status] -= 1
+            self.status_counts[current['status']] += 1
+            if current['status'] == 'processed':
+                self.completed_recently.append((timezone.now(), document_id))
+        changed[document_id] = self._document_entry(document_id)
+
+    def _set_training(self, training_id: int, data: Dict[str, Any], changed: Dict[int, Any]):
+        current = self.training.get(training_id)
+        if data.get('deleted'):
+            if current is not None:
+                del self.training[training_id]
+                self.training_counts[training_bucket(current['progress'])] -= 1
+                changed[training_id] = None
+            return
+        if current is None:
+            current = self.training[training_id] = {'progress': 0, 'stage': ''}
+            self.training_counts['pending'] += 1
+        previous = training_bucket(current['progress'])
+        current.update({key: data[key] for key in ('progress', 'stage', 'question', 'name', 'type') if key in data})
+        if training_bucket(current['progress']) != previous:
+            self.training_counts[previous] -= 1
+            self.training_counts[training_bucket(current['progress'])] += 1
+        changed[training_id] = self._training_entry(training_id)
+
+    def _document_entry(self, document_id: int) -> Optional[Dict[str, Any]]:
+        document = self.documents[document_id]
+        if document['status'] != 'processing' or not document['progress']:
+            return None
+        return {'id': document_id, 'title': document['title'], 'processing_progress': document['progress'],
+                'processing_stage': document['stage'] or 'Processing'}
+
+    def _training_entry(self, training_id: int) -> Optional[Dict[str, Any]]:
+        item = self.training[training_id]
+        if training_bucket(item['progress']) != 'in_progress':
+            return None
+        return {'id': training_id, 'name': item.get('name', ''), 'question': item.get('question', ''),
+                'training_progress': item['progress'], 'training_stage': item['stage'] or 'Initializing',
+                'training_type': item.get('type', '')}
+
+    def _load_training_details(self, ids: List[int]):
+        # Bulk progress events carry only ids; fetch what the active list shows once per item
+        missing = [training_id for training_id in ids if 'question' not in self.training.get(training_id, {'question': ''})]
+        for training_id, name, input_text, training_type in TrainingData.objects.filter(id__in=missing).values_list(
+                'id', 'name', 'input_text', 'training_type'):
+            self.training[training_id].update(
+                {'name': name, 'question': (input_text or name)[:QUESTION_CHARS], 'type': training_type}
+            )
+
+    def _current_rows(self, document_ids: set, training_ids: set) -> List[Event]:
+        """
+        The current state of rows whose events committed late: an older event must not overwrite
+        what newer ones already applied
+        """
+        events: List[Event] = []
+        if document_ids:
+            found = {
+                document_id: {'id': document_id, 'title': title, 'status': status, 'progress': progress, 'stage': stage}
+                for document_id, title, status, progress, stage in AIDocument.objects.filter(
+                    id__in=document_ids).values_list('id', 'title', 'status', 'processing_progress', 'processing_stage')
+            }
+            events.extend(('document', found.get(document_id, {'id': document_id, 'deleted': True}))
+                          for document_id in document_ids)
+        if training_ids:
+            found = {
+                training_id: {'ids': [training_id], 'progress': progress, 'stage': stage}
+                for training_id, progress, stage in TrainingData.objects.filter(id__in=training_ids).values_list(
+                    'id', 'training_progress', 'training_stage')
+            }
+            events.extend(('training', found.get(training_id, {'ids': [training_id], 'deleted': True}))
+                          for training_id in training_ids)
+        return events
+
+    def resync(self):
+        """Rebuild the state from the tables (a handful of queries)"""
+        with self._lock:
+            self.events.reset()
+            self.logs.reset()
+            self.documents = {
+                document_id: {'title': title, 'status': status, 'progress': progress, 'stage': stage}
+                for document_id, title, status, progress, stage in AIDocument.objects.values_list(
+                    'id', 'title', 'status', 'processing_progress', 'processing_stage')
+            }
+            self.status_counts = Counter(document['status'] for document in self.documents.values())
+            self.training = {
+                training_id: {'progress': progress, 'stage': stage}
+                for training_id, progress, stage in TrainingData.objects.values_list(
+                    'id', 'training_progress', 'training_stage')
+            }
+            self.training_counts = Counter(training_bucket(item['progress']) for item in self.training.values())
+            self._load_training_details([training_id for training_id, item in self.training.items()
+                                         if training_bucket(item['progress']) == 'in_progress'])
+            self.totals = Counter({'knowledge_entries': KnowledgeBaseEntry.objects.count(),
+                                   'intents': AIIntent.objects.count()})
+
+            now = timezone.now()
+            recent_logs = DocumentProcessingLog.objects.filter(created_at__gte=now - timedelta(hours=24))
+            self.totals['recent_logs'] = recent_logs.count()
+            self.totals['error_logs'] = recent_logs.filter(level='error').count()
+            self.activities.clear()
+            self.activities.extend(reversed([
+                self._activity(*row) for row in DocumentProcessingLog.objects.filter(
+                    created_at__gte=now - timedelta(minutes=30)
+                ).order_by('-id').values_list(*self.logs.fields)[:self.activities.maxlen]
+            ]))
+            self.completed_recently = deque(
+                (updated, document_id) for document_id, updated in AIDocument.objects.filter(
+                    status='processed', updated_at__gte=now - timedelta(hours=1)
+                ).order_by('updated_at').values_list('id', 'updated_at')
+            )
+            self._synced_at = time.monotonic()
+            # Cursors of the previous generation get a fresh snapshot
+            self.generation += 1
+            self.history.clear()
+            self._sent_counters = self.counters()
+            self._changed.notify_all()
+
+    @staticmethod
+    def _activity(document_id, title, step, level, message, created_at) -> Dict[str, Any]:
+        return {'document_id': document_id, 'document_title': title, 'step': step, 'level': level,
+                'message': message, 'timestamp': created_at.isoformat()}
+
+    def poll(self) -> Dict[str, Any]:
+        """Apply new events and processing logs; returns (and publishes to waiting clients) the delta"""
+        cursor = self.events.cursor
+        events = self.events.read()
+        logs = self.logs.read()
+        late_documents, late_training = set(), set()
+        for event_id, kind, data in events:
+            if event_id < cursor and kind == 'document':
+                late_documents.add(data['id'])
+            elif event_id < cursor and kind == 'training':
+                late_training.update(data['ids'])
+        applied = [(kind, data) for event_id, kind, data in events if event_id > cursor or kind == 'count']
+        applied += self._current_rows(late_documents, late_training)
+        with self._lock:
+            documents, training, activities = {}, {}, []
+            for kind, data in applied:
+                if kind == 'document':
+                    self._set_document(data['id'], data, documents)
+                elif kind == 'training':
+                    for training_id in data['ids']:
+                        self._set_training(training_id, data, training)
+                elif kind == 'count':
+                    self.totals[data['model']] += data['delta']
+            if training:
+                self._load_training_details([training_id for training_id, entry in training.items() if entry])
+                training = {training_id: self._training_entry(training_id) if training_id in self.training else None
+                            for training_id in training}
+            for _, *row in logs:
+                activity = self._activity(*row)
+                self.activities.append(activity)
+                activities.append(activity)
+                self.totals['recent_logs'] += 1
+                self.totals['error_logs'] += activity['level'] == 'error'
+            delta = {}
+            if documents:
+                delta['documents'] = documents
+            if training:
+                delta['training'] = training
+            if activities:
+                delta['activities'] = activities
+            counters = self.counters()
+            changed = {key: value for key, value in counters.items() if self._sent_counters.get(key) != value}
+            self._sent_counters = counters
+            if changed:
+                delta['counters'] = changed
+            if delta:
+                self.version += 1
+                self.history.append((self.version, delta))
+                self._changed.notify_all()
+            return delta
+
+    def counters(self) -> Dict[str, Any]:
+        cutoff = timezone.now() - timedelta(hours=1)
+        while self.completed_recently and self.completed_recently[0][0] < cutoff:
+            self.completed_recently.popleft()
+        total_training = sum(self.training_counts.values())
+        return {
+            'total_documents': len(self.documents),
+            'processed_documents': self.status_counts['processed'],
+            'pending_documents': self.status_counts['pending'],
+            'processing_documents': self.status_counts['processing'],
+            'failed_documents': self.status_counts['failed'],
+            'error_documents': self.status_counts['error'],
+            'approved_documents': self.status_counts['approved'],
+            'recent_completed': len(self.completed_recently),
+            'total_training_data': total_training,
+            'completed_training': self.training_counts['completed'],
+            'in_progress_training': self.training_counts['in_progress'],
+            'pending_training': self.training_counts['pending'],
+            'training_completion_rate': (self.training_counts['completed'] / total_training * 100
+                                         if total_training else 0),
+            'total_intents': self.totals['intents'],
+            'total_knowledge_entries': self.totals['knowledge_entries'],
+            'recent_logs_count': self.totals['recent_logs'],
+            'error_logs_count': self.totals['error_logs'],
+        }
+
+    def _cursor(self) -> str:
+        return f"{self.generation}:{self.version}"
+
+    def _changes_since(self, cursor: str) -> Optional[Dict[str, Any]]:
+        """Merged deltas after ``cursor``; None when it is not from this generation or too old"""
+        generation, _, version = (cursor or '').partition(':')
+        if generation != str(self.generation) or not version.isdigit():
+            return None
+        version = int(version)
+        oldest = self.history[0][0] if self.history else self.version + 1
+        if version > self.version or version + 1 < oldest:
+            return None
+        merged: Dict[str, Any] = {}
+        for delta_version, delta in self.history:
+            if delta_version <= version:
+                continue
+            for key in ('documents', 'training', 'counters'):
+                if key in delta:
+                    merged.setdefault(key, {}).update(delta[key])
+            if 'activities' in delta:
+                merged['activities'] = (merged.get('activities', []) + delta['activities'])[-self.activities.maxlen:]
+        return merged
+
+    def changes(self, cursor: Optional[str], timeout: float = 0) -> Dict[str, Any]:
+        """
+        ``{'cursor', 'delta'}`` with what changed after ``cursor``, waiting up to ``timeout``
+        seconds for a change; ``{'cursor', 'snapshot'}`` for a missing or outdated cursor
+        """
+        deadline = time.monotonic() + timeout
+        self._ensure()
+        with self._changed:
+            while True:
+                delta = self._changes_since(cursor)
+                if delta is None:
+                    return {'cursor': self._cursor(), 'snapshot': self.snapshot()}
+                remaining = deadline - time.monotonic()
+                if delta or remaining <= 0:
+                    return {'cursor': self._cursor(), 'delta': delta}
+                self._last_used = time.monotonic()
+                self._changed.wait(remaining)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Full dashboard state, from memory"""
+        self._ensure()
+        with self._lock:
+            cutoff = (timezone.now() - timedelta(minutes=30)).isoformat()
+            return {
+                'counters': self.counters(),
+                'processing_documents': [entry for entry in map(self._document_entry, self.documents) if entry],
+                'active_training_processes': [entry for entry in map(self._training_entry, self.training) if entry],
+                'recent_activities': [activity for activity in reversed(self.activities)
+                                      if activity['timestamp'] >= cutoff],
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'cursor': self._cursor(), 'polling': self._thread is not None,
+                    'documents': len(self.documents), 'training_items': len(self.training),
+                    'event_gaps': len(self.events.gaps), 'log_gaps': len(self.logs.gaps)}
+
+
+def prune_events(older_than: timedelta = EVENT_RETENTION) -> int:
+    """Delete events every broker has long since read"""
+    return ProgressEvent.objects.filter(created_at__lt=timezone.now() - older_than).delete()[0]
+
+
+_broker: Optional[ProgressBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_progress_broker() -> ProgressBroker:
+    """Process-wide progress broker (state loaded on first use)"""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = ProgressBroker()
+    return _broker
@@ -0,0 +1,215 @@
+"""
+Full-text search backends for AI Knowledge lookups.
+
+PostgreSQL uses a stored generated ``tsvector`` column with a GIN index and ranks with
+``ts_rank_cd``; SQLite uses FTS5 external-content tables kept in sync by triggers and ranks with
+``bm25()``. Either way the index is maintained by the database on every save and relevance is
+computed in SQL. Other vendors get no backend and callers keep their ``icontains`` lookups.
+
+Migrations are generated per deployment in this project, so the search schema is created
+idempotently here: on ``post_migrate`` (tables may have been recreated) and by
+``manage.py setup_ai_knowledge_search``, never while serving queries.
+"""
+
+import logging
+import re
+import threading
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL text search configuration ('simple' = no stemming, works for Indonesian and English)
+FTS_CONFIG = getattr(settings, 'AI_KNOWLEDGE_FTS_CONFIG', 'simple')
+# Upper bound of extracted_text fed into a tsvector (PostgreSQL caps a tsvector at 1 MB)
+MAX_DOCUMENT_CHARS = getattr(settings, 'AI_KNOWLEDGE_FTS_MAX_DOCUMENT_CHARS', 200000)
+
+ENTRY_TABLE = 'ai_knowledge_knowledgebaseentry'
+DOCUMENT_TABLE = 'ai_knowledge_aidocument'
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(query: str) -> List[str]:
+    """Unique search terms (more than 2 characters, like the previous icontains lookup)"""
+    return list(dict.fromkeys(t for t in _TERM_RE.findall(query.lower()) if len(t) > 2))
+
+
+class FullTextBackend:
+    """Base class: ``search_*`` return ``[(pk, rank)]`` ordered by rank, best first"""
+    vendor = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def ensure_schema(self):
+        with self._lock:
+            with connection.cursor() as cursor:
+                self.create_schema(cursor)
+
+    def create_schema(self, cursor):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Re-index all rows (after bulk imports that bypassed the database triggers)"""
+        self.ensure_schema()
+
+    def search_entries(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        raise NotImplementedError
+
+    def search_documents(self, query: str, limit: int, statuses: List[str]) -> List[Tuple[int, float]]:
+        raise NotImplementedError
+
+    def _fetch(self, sql: str, params) -> List[Tuple[int, float]]:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(pk, float(rank)) for pk, rank in cursor.fetchall()]
+
+
+class PostgresFullTextBackend(FullTextBackend):
+    vendor = 'postgresql'
+
+    def create_schema(self, cursor):
+        cursor.execute(f"""
+            ALTER TABLE {ENTRY_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('{FTS_CONFIG}', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('{FTS_CONFIG}', coalesce(keywords, '')), 'B') ||
+                setweight(to_tsvector('{FTS_CONFIG}', coalesce(content, '')), 'C')
+            ) STORED
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {ENTRY_TABLE}_search_gin ON {ENTRY_TABLE} USING GIN (search_vector)")
+        cursor.execute(f"""
+            ALTER TABLE {DOCUMENT_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('{FTS_CONFIG}', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('{FTS_CONFIG}', coalesce(description, '')), 'B') ||
+                setweight(to_tsvector('{FTS_CONFIG}', left(coalesce(extracted_text, ''), {int(MAX_DOCUMENT_CHARS)})), 'C')
+            ) STORED
+        """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {DOCUMENT_TABLE}_search_gin ON {DOCUMENT_TABLE} USING GIN (search_vector)")
+
+    @staticmethod
+    def _tsquery(query: str) -> Optional[str]:
+        terms = query_terms(query)
+        return ' | '.join(terms) if terms else None
+
+    def search_entries(self, query, limit):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return []
+        return self._fetch(f"""
+            SELECT id, ts_rank_cd(search_vector, q) AS rank
+            FROM {ENTRY_TABLE}, to_tsquery('{FTS_CONFIG}', %s) q
+            WHERE is_active AND search_vector @@ q
+            ORDER BY rank DESC LIMIT %s
+        """, [tsquery, limit])
+
+    def search_documents(self, query, limit, statuses):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return []
+        return self._fetch(f"""
+            SELECT id, ts_rank_cd(search_vector, q) AS rank
+            FROM {DOCUMENT_TABLE}, to_tsquery('{FTS_CONFIG}', %s) q
+            WHERE status = ANY(%s) AND search_vector @@ q
+            ORDER BY rank DESC LIMIT %s
+        """, [tsquery, list(statuses), limit])
+
+
+class SQLiteFullTextBackend(FullTextBackend):
+    vendor = 'sqlite'
+
+    # fts table -> (content table, indexed columns, bm25 column weights)
+    TABLES = {
+        f'{ENTRY_TABLE}_fts': (ENTRY_TABLE, ('title', 'keywords', 'content'), (10.0, 5.0, 1.0)),
+        f'{DOCUMENT_TABLE}_fts': (DOCUMENT_TABLE, ('title', 'description', 'extracted_text'), (10.0, 5.0, 1.0)),
+    }
+
+    def create_schema(self, cursor):
+        for fts, (table, columns, _) in self.TABLES.items():
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts])
+            created = cursor.fetchone() is None
+            cols = ', '.join(columns)
+            new_cols = ', '.join(f'new.{c}' for c in columns)
+            old_cols = ', '.join(f'old.{c}' for c in columns)
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    {cols}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                    INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END
+            """)
+            if created:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    def rebuild(self):
+        super().rebuild()
+        with connection.cursor() as cursor:
+            for fts in self.TABLES:
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    @staticmethod
+    def _match(query: str) -> Optional[str]:
+        terms = query_terms(query)
+        return ' OR '.join(f'"{t}"' for t in terms) if terms else None
+
+    def _search(self, fts, where, query, limit, params=()):
+        match = self._match(query)
+        if not match:
+            return []
+        table, _, weights = self.TABLES[fts]
+        return self._fetch(f"""
+            SELECT t.id, -bm25({fts}, {', '.join(map(str, weights))}) AS rank
+            FROM {fts} JOIN {table} t ON t.id = {fts}.rowid
+            WHERE {fts} MATCH %s AND {where}
+            ORDER BY rank DESC LIMIT %s
+        """, [match, *params, limit])
+
+    def search_entries(self, query, limit):
+        return self._search(f'{ENTRY_TABLE}_fts', 't.is_active', query, limit)
+
+    def search_documents(self, query, limit, statuses):
+        placeholders = ', '.join(['%s'] * len(statuses))
+        return self._search(f'{DOCUMENT_TABLE}_fts', f't.status IN ({placeholders})', query, limit, statuses)
+
+
+BACKENDS = {backend.vendor: backend for backend in (PostgresFullTextBackend, SQLiteFullTextBackend)}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend() -> Optional[FullTextBackend]:
+    """Full-text backend for the default database, or None when the vendor has none"""
+    global _backend
+    if not getattr(settings, 'AI_KNOWLEDGE_FULL_TEXT_SEARCH', True):
+        return None
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_class = BACKENDS.get(connection.vendor)
+                _backend = backend_class() if backend_class else False
+    return _backend or None
+
+
+def ensure_search_schema(**kwargs):
+    """post_migrate hook"""
+    backend = get_search_backend()
+    if backend is None:
+        return
+    try:
+        backend.ensure_schema()
+    except Exception as e:
+        logger.warning(f"Could not create AI Knowledge full-text search schema: {e}")
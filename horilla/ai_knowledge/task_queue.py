@@ -0,0 +1,490 @@
+"""
+Pluggable backend for the AI Knowledge ``@shared_task`` functions.
+
+``delay()``, ``run_group()`` and ``run_chord()`` send work to Celery or to a local executor,
+depending on AI_KNOWLEDGE_TASK_BACKEND: 'celery' always uses the broker, 'local' never does, and
+'auto' (the default) uses Celery until publishing to CELERY_BROKER_URL fails. It then switches to
+the local executor for AI_KNOWLEDGE_BROKER_RETRY_SECONDS before trying the broker again.
+
+The local executor keeps its queue in a SQLite file, so queued work survives a restart. It runs
+the same task functions, unchanged, on a process pool with one worker per core. Tasks that raise
+are retried with exponential backoff, and ``self.retry()`` re-queues a task. Several processes
+(web workers, ``manage.py run_local_tasks``) can share one queue file; tasks are claimed with a
+write lock and a lease, and the tasks of a process that died are re-queued.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime
+from importlib import import_module
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+try:
+    from celery.exceptions import Retry
+except ImportError:
+    Retry = None
+
+logger = logging.getLogger(__name__)
+
+TASK_BACKEND = getattr(settings, 'AI_KNOWLEDGE_TASK_BACKEND', 'auto')  # 'auto', 'celery' or 'local'
+BROKER_RETRY_SECONDS = getattr(settings, 'AI_KNOWLEDGE_BROKER_RETRY_SECONDS', 60)
+LOCAL_QUEUE_PATH = getattr(settings, 'AI_KNOWLEDGE_LOCAL_QUEUE_PATH',
+                           os.path.join(getattr(settings, 'BASE_DIR', '.'), 'ai_knowledge_tasks.sqlite3'))
+LOCAL_EXECUTOR = getattr(settings, 'AI_KNOWLEDGE_LOCAL_EXECUTOR', 'process')  # 'process' or 'thread'
+LOCAL_WORKERS = getattr(settings, 'AI_KNOWLEDGE_LOCAL_WORKERS', os.cpu_count() or 1)
+LOCAL_MAX_RETRIES = getattr(settings, 'AI_KNOWLEDGE_LOCAL_MAX_RETRIES', 3)
+LOCAL_RETRY_DELAY = getattr(settings, 'AI_KNOWLEDGE_LOCAL_RETRY_DELAY', 15)
+LOCAL_LEASE_SECONDS = getattr(settings, 'AI_KNOWLEDGE_LOCAL_LEASE_SECONDS', 3600)
+LOCAL_POLL_INTERVAL = getattr(settings, 'AI_KNOWLEDGE_LOCAL_POLL_INTERVAL', 1.0)
+# Queued work is served by a dedicated ``manage.py run_local_tasks`` process. Enabling this
+# runs a dispatcher and a pool of LOCAL_WORKERS in every process that queues work instead
+# (every web worker), which only suits a single-process setup such as ``runserver``
+LOCAL_AUTOSTART = getattr(settings, 'AI_KNOWLEDGE_LOCAL_AUTOSTART', False)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    args TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL,
+    owner TEXT,
+    chord_id INTEGER,
+    chord_index INTEGER,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (status, run_after);
+CREATE INDEX IF NOT EXISTS tasks_chord ON tasks (chord_id);
+CREATE TABLE IF NOT EXISTS chords (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    callback TEXT NOT NULL,
+    remaining INTEGER NOT NULL
+);
+"""
+
+# (task name, args, kwargs)
+TaskCall = Tuple[str, List[Any], Dict[str, Any]]
+
+
+class LocalResult(NamedTuple):
+    """What ``delay()`` returns for locally queued work (Celery returns an AsyncResult)"""
+    id: int
+
+
+def task_name(task) -> str:
+    """Celery task name (``module.function``), which is also the import path the executor uses"""
+    return getattr(task, 'name', None) or f"{task.__module__}.{task.__name__}"
+
+
+def _call(signature) -> TaskCall:
+    return signature.task, list(signature.args), dict(signature.kwargs)
+
+
+def _init_worker():
+    # Workers started with spawn/forkserver import the project from scratch
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def retry_task(task, countdown: float) -> Exception:
+    """
+    ``task.retry(countdown=countdown, max_retries=None)`` that keeps the countdown when the local
+    queue runs the task: called directly (no Celery request), Celery's retry() raises a Retry
+    without it. Use as ``raise retry_task(self, countdown)``.
+    """
+    if task.request.called_directly:
+        return Retry(f'Retry in {countdown}s', when=countdown)
+    return task.retry(countdown=countdown, max_retries=None)
+
+
+def _run_task(name: str, args: List[Any], kwargs: Dict[str, Any]) -> Any:
+    from django.db import close_old_connections
+
+    module, attr = name.rsplit('.', 1)
+    close_old_connections()
+    try:
+        return getattr(import_module(module), attr)(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+class LocalTaskQueue:
+    """SQLite-backed task queue drained by a bounded thread or process pool"""
+
+    def __init__(self, path: str = LOCAL_QUEUE_PATH, workers: int = LOCAL_WORKERS, executor: str = LOCAL_EXECUTOR,
+                 max_retries: int = LOCAL_MAX_RETRIES, retry_delay: float = LOCAL_RETRY_DELAY,
+                 lease_seconds: float = LOCAL_LEASE_SECONDS, poll_interval: float = LOCAL_POLL_INTERVAL):
+        self.path = path
+        self.workers = max(1, workers)
+        self.executor = executor
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self._reset()
+        self._db().executescript(SCHEMA)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # A forked child gets its own connections, pool and dispatcher
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._connections = threading.local()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pool = None
+        self._in_flight = 0
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._connections, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._connections.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    # Producing
+
+    def enqueue(self, name: str, args: Sequence[Any] = (), kwargs: Optional[Dict[str, Any]] = None,
+                countdown: float = 0) -> int:
+        with self._transaction() as db:
+            task_id = self._insert(db, (name, list(args), kwargs or {}), countdown)
+        self._started()
+        return task_id
+
+    def enqueue_group(self, calls: List[TaskCall]) -> List[int]:
+        with self._transaction() as db:
+            ids = [self._insert(db, call) for call in calls]
+        self._started()
+        return ids
+
+    def enqueue_chord(self, header: List[TaskCall], callback: TaskCall) -> int:
+        """Run ``header`` in parallel, then ``callback(results, *args)`` with the results in header order"""
+        name, args, kwargs = callback
+        with self._transaction() as db:
+            if not header:
+                chord_id = self._insert(db, (name, [[]] + list(args), kwargs))
+            else:
+                chord_id = db.execute('INSERT INTO chords (callback, remaining) VALUES (?, ?)',
+                                      (json.dumps([name, args, kwargs]), len(header))).lastrowid
+                for index, call in enumerate(header):
+                    self._insert(db, call, chord=(chord_id, index))
+        self._started()
+        return chord_id
+
+    def _insert(self, db, call: TaskCall, countdown: float = 0, chord: Tuple[int, int] = (None, None)) -> int:
+        name, args, kwargs = call
+        now = time.time()
+        return db.execute(
+            'INSERT INTO tasks (name, args, kwargs, run_after, chord_id, chord_index, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (name, json.dumps(args), json.dumps(kwargs), now + countdown, chord[0], chord[1], now, now)
+        ).lastrowid
+
+    # Consuming
+
+    def _started(self):
+        if LOCAL_AUTOSTART:
+            self.start()
+        self._wake.set()
+
+    def start(self):
+        """Start the dispatcher thread of this process (idempotent)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._requeue_dead_owners()
+                self._thread = threading.Thread(target=self._run, name='ai-knowledge-tasks', daemon=True)
+                self._thread.start()
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.executor == 'thread':
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='ai-knowledge-task')
+            else:
+                self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        return self._pool
+
+    def _requeue_dead_owners(self):
+        # Tasks leased by a process of this host that no longer exists go back to the queue at once
+        host = socket.gethostname()
+        with self._transaction() as db:
+            owners = [row[0] for row in db.execute("SELECT DISTINCT owner FROM tasks WHERE status = 'running'")]
+            for owner in owners:
+                owner_host, _, pid = (owner or '').rpartition(':')
+                if owner_host != host or not pid.isdigit():
+                    continue
+                try:
+                    os.kill(int(pid), 0)
+                except ProcessLookupError:
+                    db.execute("UPDATE tasks SET status = 'queued', run_after = ?, owner = NULL "
+                               "WHERE status = 'running' AND owner = ?", (time.time(), owner))
+                except OSError:
+                    pass
+
+    def _claim(self, limit: int) -> List[Tuple[int, str, List[Any], Dict[str, Any]]]:
+        # 'running' rows whose lease ran out belong to a crashed or hung worker and are taken over
+        now = time.time()
+        with self._transaction() as db:
+            rows = db.execute(
+                "SELECT id, name, args, kwargs FROM tasks WHERE status IN ('queued', 'running') AND run_after <= ? "
+                "ORDER BY run_after, id LIMIT ?", (now, limit)
+            ).fetchall()
+            db.executemany(
+                "UPDATE tasks SET status = 'running', run_after = ?, owner = ?, updated_at = ? WHERE id = ?",
+                [(now + self.lease_seconds, self.owner, now, row[0]) for row in rows]
+            )
+        return [(task_id, name, json.loads(args), json.loads(kwargs)) for task_id, name, args, kwargs in rows]
+
+    def stop(self):
+        """Stop dispatching and wait for the tasks in flight"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        self._thread = self._pool = None
+        self._stopping.clear()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            free = self.workers - self._in_flight
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = self._claim(free)
+                except sqlite3.Error as e:
+                    logger.error(f"Local task queue claim failed: {e}")
+            for task_id, name, args, kwargs in claimed:
+                with self._lock:
+                    self._in_flight += 1
+                try:
+                    future = self._get_pool().submit(_run_task, name, args, kwargs)
+                except Exception as e:
+                    future = Future()
+                    future.set_exception(e)
+                future.add_done_callback(lambda future, task_id=task_id: self._finished(task_id, future))
+            if not claimed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _finished(self, task_id: int, future: Future):
+        try:
+            self._record(task_id, future)
+        except Exception as e:
+            logger.error(f"Local task queue could not record the outcome of task {task_id}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    def _record(self, task_id: int, future: Future):
+        now = time.time()
+        error = future.exception()
+        with self._transaction() as db:
+            name, attempts, chord_id = db.execute(
+                'SELECT name, attempts, chord_id FROM tasks WHERE id = ?', (task_id,)
+            ).fetchone()
+            if error is None:
+                self.completed += 1
+                if chord_id is None:
+                    db.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+                else:
+                    db.execute("UPDATE tasks SET status = 'done', result = ?, updated_at = ? WHERE id = ?",
+                               (json.dumps(future.result(), default=str), now, task_id))
+                    self._chord_part_done(db, chord_id)
+                return
+
+            if Retry is not None and isinstance(error, Retry):
+                # self.retry(): re-queued without using up an attempt
+                when = error.when
+                if isinstance(when, datetime):
+                    when = when.timestamp() - now
+                elif not isinstance(when, (int, float)):
+                    when = self.retry_delay
+                self.retried += 1
+                db.execute("UPDATE tasks SET status = 'queued', run_after = ?, owner = NULL, updated_at = ? "
+                           "WHERE id = ?", (now + when, now, task_id))
+                return
+
+            if isinstance(error, BrokenProcessPool):
+                self._pool = None
+            attempts += 1
+            if attempts <= self.max_retries:
+                self.retried += 1
+                logger.warning(f"Task {name} ({task_id}) failed, retry {attempts}/{self.max_retries}: {error}")
+                db.execute(
+                    "UPDATE tasks SET status = 'queued', attempts = ?, run_after = ?, owner = NULL, error = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (attempts, now + self.retry_delay * 2 ** (attempts - 1), str(error), now, task_id)
+                )
+                return
+            self.failed += 1
+            logger.error(f"Task {name} ({task_id}) failed after {attempts} attempts: {error}")
+            db.execute("UPDATE tasks SET status = 'failed', attempts = ?, error = ?, updated_at = ? WHERE id = ?",
+                       (attempts, str(error), now, task_id))
+            if chord_id is not None:
+                self._chord_part_done(db, chord_id)
+
+    def _chord_part_done(self, db, chord_id: int):
+        # A failed part contributes None to the callback's results, as with Celery's allow_error_in_chord off
+        db.execute('UPDATE chords SET remaining = remaining - 1 WHERE id = ?', (chord_id,))
+        callback, remaining = db.execute('SELECT callback, remaining FROM chords WHERE id = ?', (chord_id,)).fetchone()
+        if remaining > 0:
+            return
+        results = [json.loads(result) if result is not None else None for (result,) in db.execute(
+            'SELECT result FROM tasks WHERE chord_id = ? ORDER BY chord_index', (chord_id,)
+        )]
+        name, args, kwargs = json.loads(callback)
+        self._insert(db, (name, [results] + args, kwargs))
+        db.execute("DELETE FROM tasks WHERE chord_id = ? AND status = 'done'", (chord_id,))
+        db.execute('DELETE FROM chords WHERE id = ?', (chord_id,))
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until no task is queued or running; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.depth():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def depth(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM tasks WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._db()
+        counts = dict(db.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall())
+        oldest = db.execute("SELECT MIN(created_at) FROM tasks WHERE status = 'queued'").fetchone()[0]
+        return {
+            'path': self.path,
+            'executor': self.executor,
+            'workers': self.workers,
+            'dispatcher_running': self._thread is not None and self._thread.is_alive(),
+            'in_flight': self._in_flight,
+            'queued': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_queued_seconds': round(time.time() - oldest, 1) if oldest else None,
+            'completed_here': self.completed,
+            'retried_here': self.retried,
+            'failed_here': self.failed,
+        }
+
+
+_local_queue: Optional[LocalTaskQueue] = None
+_local_queue_lock = threading.Lock()
+_broker_down_until = 0.0
+
+
+def get_local_queue() -> LocalTaskQueue:
+    """Get the process-wide local task queue"""
+    global _local_queue
+    if _local_queue is None:
+        with _local_queue_lock:
+            if _local_queue is None:
+                _local_queue = LocalTaskQueue()
+    return _local_queue
+
+
+def _use_celery() -> bool:
+    if TASK_BACKEND == 'celery':
+        return True
+    if TASK_BACKEND == 'local' or Retry is None:
+        return False
+    return time.monotonic() >= _broker_down_until
+
+
+def _dispatch(send_celery, send_local):
+    global _broker_down_until
+    if _use_celery():
+        try:
+            return send_celery()
+        except Exception as e:
+            if TASK_BACKEND == 'celery':
+                raise
+            logger.warning(f"Celery broker unavailable ({e}); using the local task queue "
+                           f"for the next {BROKER_RETRY_SECONDS}s")
+            _broker_down_until = time.monotonic() + BROKER_RETRY_SECONDS
+    return send_local()
+
+
+def delay(task, *args, **kwargs):
+    """``task.delay(*args, **kwargs)`` on the active backend"""
+    return apply_async(task, args, kwargs)
+
+
+def apply_async(task, args: Sequence[Any] = (), kwargs: Optional[Dict[str, Any]] = None, countdown: float = 0):
+    return _dispatch(
+        lambda: task.apply_async(args, kwargs, countdown=countdown or None, retry=False),
+        lambda: LocalResult(get_local_queue().enqueue(task_name(task), args, kwargs, countdown)),
+    )
+
+
+def run_group(signatures: Sequence[Any]):
+    """Queue task signatures (``task.s(...)``) to run in parallel"""
+    def send_celery():
+        from celery import group
+
+        return group(signatures).apply_async(retry=False)
+
+    return _dispatch(send_celery, lambda: get_local_queue().enqueue_group([_call(sig) for sig in signatures]))
+
+
+def run_chord(header: Sequence[Any], callback):
+    """Queue ``header`` signatures in parallel, then ``callback`` with their results"""
+    def send_celery():
+        from celery import chord
+
+        return chord(header)(callback)
+
+    return _dispatch(send_celery, lambda: get_local_queue().enqueue_chord([_call(sig) for sig in header],
+                                                                          _call(callback)))
+
+
+def stats() -> Dict[str, Any]:
+    """Active backend and, once it has been used here, the local queue's depth"""
+    data = {
+        'backend': TASK_BACKEND,
+        'using': 'celery' if _use_celery() else 'local',
+        'broker_retry_in_seconds': max(0, round(_broker_down_until - time.monotonic())) or None,
+    }
+    if _local_queue is not None or os.path.exists(LOCAL_QUEUE_PATH):
+        data['local'] = get_local_queue().stats()
+    return data
@@ -1,12 +1,20 @@
 from celery import shared_task
+from celery.exceptions import Retry
 from django.core.files.storage import default_storage
 from django.utils import timezone
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Greatest, Substr
 import os
 import logging
 import json
 import re
-from typing import Dict, List, Any
+import multiprocessing
+from collections import deque
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Any, Tuple
 
 # Import for document processing
 try:
@@ -27,24 +35,80 @@ from .models import (
     AIDocument, KnowledgeBaseEntry, TrainingData, 
     AIIntent, DocumentProcessingLog
 )
+from .progress import prune_events, publish
+from .task_queue import retry_task, run_chord, run_group
+from .vector_index import index_document
 
 logger = logging.getLogger(__name__)
 
+# PDF page extraction settings
+PDF_WORKERS = getattr(settings, 'AI_KNOWLEDGE_PDF_WORKERS', min(4, os.cpu_count() or 1))
+PDF_WINDOW = getattr(settings, 'AI_KNOWLEDGE_PDF_WINDOW', 16)  # max pages in flight
+PDF_PARALLEL_MIN_PAGES = getattr(settings, 'AI_KNOWLEDGE_PDF_PARALLEL_MIN_PAGES', 8)
+# Rows per INSERT when writing extracted knowledge
+BULK_BATCH_SIZE = getattr(settings, 'AI_KNOWLEDGE_BULK_BATCH_SIZE', 500)
+
+# Sharded knowledge extraction of large documents
+SHARD_CHARS = getattr(settings, 'AI_KNOWLEDGE_SHARD_CHARS', 50000)  # roughly 15-25 pages
+SHARD_PROGRESS_START = 10  # processing_progress once the text is extracted
+SHARD_PROGRESS_END = 90  # ... and once every shard is
+MAX_CONCURRENT_DOCUMENTS = getattr(settings, 'AI_KNOWLEDGE_MAX_CONCURRENT_DOCUMENTS', 4)
+REQUEUE_SECONDS = getattr(settings, 'AI_KNOWLEDGE_REQUEUE_SECONDS', 15)
+PROCESSING_TIMEOUT = getattr(settings, 'AI_KNOWLEDGE_PROCESSING_TIMEOUT', 3600)
+
+# Per-process reader used by the PDF page workers
+_pdf_reader = None
+
+def _pdf_worker_open(file_path: str):
+    global _pdf_reader
+    _pdf_reader = PyPDF2.PdfReader(file_path)
+
+def _pdf_worker_page(index: int) -> str:
+    return _pdf_reader.pages[index].extract_text() or ""
+
 class DocumentProcessor:
     """Document processing utilities"""
     
     @staticmethod
-    def extract_text_from_pdf(file_path: str) -> str:
-        """Extract text from PDF file"""
+    def iter_pdf_pages(file_path: str, workers: int = None, window: int = None) -> Iterator[str]:
+        """Yield PDF page texts in order, parsing pages in a process pool.
+
+        At most ``window`` pages are queued at once, so memory is bounded by the window instead of
+        the whole document. Small files, ``workers <= 1`` and daemonic processes (Celery prefork
+        children cannot spawn a pool) are parsed sequentially in this process.
+        """
         if not PyPDF2:
             raise ImportError("PyPDF2 is required for PDF processing")
-        
-        text = ""
+        workers = PDF_WORKERS if workers is None else workers
+        window = PDF_WINDOW if window is None else window
+
+        reader = PyPDF2.PdfReader(file_path)
+        page_count = len(reader.pages)
+        if workers <= 1 or page_count < PDF_PARALLEL_MIN_PAGES or multiprocessing.current_process().daemon:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+        del reader
+
+        with ProcessPoolExecutor(min(workers, page_count), initializer=_pdf_worker_open,
+                                 initargs=(file_path,)) as pool:
+            pending = deque()
+            next_page = 0
+            try:
+                while next_page < page_count or pending:
+                    while next_page < page_count and len(pending) < window:
+                        pending.append(pool.submit(_pdf_worker_page, next_page))
+                        next_page += 1
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def extract_text_from_pdf(file_path: str) -> str:
+        """Extract text from PDF file"""
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
+            text = "\n".join(DocumentProcessor.iter_pdf_pages(file_path))
         except Exception as e:
             logger.error(f"Error extracting text from PDF {file_path}: {str(e)}")
             raise
@@ -170,12 +234,12 @@ class IntentGenerator:
     """Generate AI intents from processed documents"""
     
     @staticmethod
-    def generate_intents_from_qa(qa_pairs: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    def generate_intents_from_qa(qa_pairs: List[Dict[str, str]], document_id: int) -> List[Dict[str, Any]]:
         """Generate intents from Q&A pairs"""
         intents = []
         
         for i, qa in enumerate(qa_pairs):
-            intent_name = f"qa_intent_{i+1}"
+            intent_name = qa_intent_label(document_id, i)
             
             # Generate variations of the question
             examples = [qa['question']]
@@ -197,23 +261,259 @@ class IntentGenerator:
         
         return intents
 
+def qa_intent_label(document_id: int, index: int) -> str:
+    """Intent name/label of a document's Q&A pair; unique across documents so their answers never share a class"""
+    return f"qa_{document_id}_{index + 1}"
+
+def _log(document: AIDocument, level: str, message: str, step: str, details: Dict[str, Any] = None):
+    DocumentProcessingLog.objects.create(
+        document=document,
+        level=level,
+        message=message,
+        processing_step=step,
+        details=details or {}
+    )
+
+def _set_document_fields(document: AIDocument, **fields):
+    """Write only the given fields (never re-send a multi-MB extracted_text with a status change)"""
+    for name, value in fields.items():
+        setattr(document, name, value)
+    document.save(update_fields=[*fields, 'updated_at'])
+
+def _replace_knowledge_entries(document: AIDocument, qa_pairs, procedures, policies) -> None:
+    entries = [
+        KnowledgeBaseEntry(
+            title=qa['question'][:200],
+            content=qa['answer'],
+            entry_type='faq',
+            source_document=document,
+            confidence_score=0.7
+        )
+        for qa in qa_pairs
+    ]
+    entries += [
+        KnowledgeBaseEntry(
+            title=f"Procedure from {document.title}"[:200],
+            content=json.dumps(proc),
+            entry_type='procedure',
+            source_document=document,
+            confidence_score=0.6
+        )
+        for proc in procedures
+    ]
+    entries += [
+        KnowledgeBaseEntry(
+            title=f"{policy['type'].title()} from {document.title}"[:200],
+            content=policy['content'],
+            entry_type='policy',
+            source_document=document,
+            confidence_score=0.8
+        )
+        for policy in policies
+    ]
+    # Entries (and their embeddings) from an earlier run of this document are replaced, not appended to
+    with transaction.atomic():
+        KnowledgeBaseEntry.objects.filter(source_document=document).delete()
+        KnowledgeBaseEntry.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+        publish('count', model='knowledge_entries', delta=len(entries))
+        _log(document, 'success',
+             f'Knowledge extraction completed. Created {len(qa_pairs)} Q&A pairs, {len(procedures)} procedures, {len(policies)} policies.',
+             'knowledge_extraction')
+
+def _replace_intents(document: AIDocument, intents: List[Dict[str, Any]]) -> int:
+    with transaction.atomic():
+        # Intents generated from this document alone are regenerated; shared ones are kept
+        AIIntent.objects.annotate(
+            document_count=Count('source_documents')
+        ).filter(source_documents=document, document_count=1).delete()
+
+        names = [intent_data['name'] for intent_data in intents]
+        existing = set(AIIntent.objects.filter(name__in=names).values_list('name', flat=True))
+        new_intents = [
+            AIIntent(
+                name=intent_data['name'],
+                description=intent_data['description'],
+                examples=intent_data['examples'],
+                responses=intent_data['responses'],
+                confidence_score=intent_data['confidence_score']
+            )
+            for intent_data in intents
+            if intent_data['name'] not in existing
+        ]
+        AIIntent.objects.bulk_create(new_intents, batch_size=BULK_BATCH_SIZE)
+        publish('count', model='intents', delta=len(new_intents))
+        if new_intents:
+            through = AIIntent.source_documents.through
+            created_ids = AIIntent.objects.filter(
+                name__in=[intent.name for intent in new_intents]
+            ).values_list('id', flat=True)
+            through.objects.bulk_create(
+                [through(aiintent_id=intent_id, aidocument_id=document.id) for intent_id in created_ids],
+                batch_size=BULK_BATCH_SIZE
+            )
+        _log(document, 'success', f'Intent generation completed. Created {len(new_intents)} intents.',
+             'intent_generation')
+    return len(new_intents)
+
+def _replace_training_data(document: AIDocument, qa_pairs: List[Dict[str, str]]) -> None:
+    training_data = [
+        TrainingData(
+            name=f"Training data from {document.title} - {i+1}"[:200],
+            training_type='intent',
+            input_text=qa['question'],
+            expected_output=qa['answer'],
+            intent_label=qa_intent_label(document.id, i),
+            source_document=document,
+            confidence_threshold=0.7
+        )
+        for i, qa in enumerate(qa_pairs)
+    ]
+    with transaction.atomic():
+        TrainingData.objects.filter(source_document=document, training_type='intent').delete()
+        TrainingData.objects.bulk_create(training_data, batch_size=BULK_BATCH_SIZE)
+        # Backends that return no primary keys from bulk_create are corrected by the broker's resync
+        publish('training', ids=[item.id for item in training_data if item.id], progress=0, stage='')
+        _log(document, 'success',
+             f'Training data generation completed. Created {len(qa_pairs)} training entries.',
+             'training_data_generation')
+
+# Line breaks followed by a question, where a Q&A pair can start
+QUESTION_BREAK = re.compile(r'\n(?=(?:Q|Question)\s*:)', re.IGNORECASE)
+
+def shard_bounds(text: str, size: int = None) -> List[Tuple[int, int]]:
+    """
+    Split text into ``(start, end)`` shards of at most ``size`` characters. Each shard ends after
+    the last paragraph break in its window, else before the last question (so Q&A pairs are not
+    cut in half), else after the last line break.
+    """
+    size = max(1, size or SHARD_CHARS)
+    bounds = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind('\n\n', start, end)
+            if cut > start:
+                end = cut + 2
+            else:
+                questions = list(QUESTION_BREAK.finditer(text, start + 1, end))
+                cut = questions[-1].start() if questions else text.rfind('\n', start, end)
+                if cut > start:
+                    end = cut + 1
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+def extract_knowledge(text: str) -> Dict[str, Any]:
+    """Q&A pairs, procedures and policies of one text (a whole document or a shard)"""
+    extractor = KnowledgeExtractor()
+    return {
+        'qa_pairs': extractor.extract_qa_pairs(text),
+        'procedures': extractor.extract_procedures(text),
+        'policies': extractor.extract_policies(text),
+    }
+
+def merge_knowledge(shard_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine shard extractions in shard order: duplicate Q&A pairs and policies are dropped and the
+    numbered steps of all shards form one procedure, as when the document is extracted whole.
+    """
+    qa_pairs, policies, steps = [], [], []
+    seen_qa, seen_policies = set(), set()
+    for result in sorted(shard_results, key=lambda result: result.get('shard', 0)):
+        for qa in result.get('qa_pairs', []):
+            key = (qa['question'].casefold(), qa['answer'].casefold())
+            if key not in seen_qa:
+                seen_qa.add(key)
+                qa_pairs.append(qa)
+        for policy in result.get('policies', []):
+            key = (policy['type'], policy['content'])
+            if key not in seen_policies:
+                seen_policies.add(key)
+                policies.append(policy)
+        for proc in result.get('procedures', []):
+            steps.extend(proc['steps'])
+    procedures = [{'type': 'procedure', 'steps': steps}] if steps else []
+    return {'qa_pairs': qa_pairs, 'procedures': procedures, 'policies': policies}
+
+def _materialize_knowledge(document: AIDocument, knowledge: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Write the extracted knowledge, intents and training data, embed, and mark the document processed"""
+    if knowledge is not None:
+        try:
+            _replace_knowledge_entries(document, knowledge['qa_pairs'], knowledge['procedures'], knowledge['policies'])
+            
+        except Exception as e:
+            _log(document, 'warning', f'Knowledge extraction partially failed: {str(e)}', 'knowledge_extraction',
+                 {'error': str(e)})
+        
+        # Generate AI intents
+        try:
+            intents = IntentGenerator().generate_intents_from_qa(knowledge['qa_pairs'], document.id)
+            _replace_intents(document, intents)
+            
+        except Exception as e:
+            _log(document, 'warning', f'Intent generation failed: {str(e)}', 'intent_generation', {'error': str(e)})
+        
+        # Generate training data
+        try:
+            _replace_training_data(document, knowledge['qa_pairs'])
+            
+        except Exception as e:
+            _log(document, 'warning', f'Training data generation failed: {str(e)}', 'training_data_generation',
+                 {'error': str(e)})
+    
+    # Embed text chunks and knowledge base entries for vector search (bulk_create sends no
+    # post_save, so entries are only embedded here)
+    try:
+        embedded = index_document(document)
+        _log(document, 'success' if embedded is not None else 'warning',
+             (f'Embedding completed. Stored {embedded} new or changed vectors.' if embedded is not None
+              else 'Embedding skipped: embedding service not available.'),
+             'embedding')
+        
+    except Exception as e:
+        _log(document, 'warning', f'Embedding failed: {str(e)}', 'embedding', {'error': str(e)})
+    
+    # Mark document as processed; the post_save also marks the search indexes stale
+    _set_document_fields(document, status='processed', processing_progress=100, processing_stage='completed',
+                         processing_completed_at=timezone.now(),
+                         processing_notes='Document processing completed successfully')
+    _log(document, 'success', 'Document processing completed successfully', 'completion')
+    
+    return {
+        'status': 'success',
+        'document_id': document.id,
+        'message': 'Document processed successfully'
+    }
+
+def _processing_slots_taken(document_id: int) -> int:
+    # Documents stuck in 'processing' (e.g. a killed worker) stop counting after the timeout
+    since = timezone.now() - timedelta(seconds=PROCESSING_TIMEOUT)
+    return AIDocument.objects.filter(
+        status='processing', processing_started_at__gte=since
+    ).exclude(id=document_id).count()
+
 @shared_task(bind=True)
-def process_document_async(self, document_id: int):
-    """Process uploaded document asynchronously"""
+def process_document_async(self, document_id: int, respect_cap: bool = False):
+    """
+    Process uploaded document asynchronously.
+
+    Text longer than one shard (AI_KNOWLEDGE_SHARD_CHARS) is split at section breaks and the shards
+    are extracted by parallel ``extract_document_shard`` tasks; ``merge_document_shards`` then
+    deduplicates their output and writes it. Each stage writes with bulk_create in one transaction,
+    replacing whatever an earlier run derived from the same document. With ``respect_cap`` the task
+    waits (re-queues itself) while AI_KNOWLEDGE_MAX_CONCURRENT_DOCUMENTS documents are processing.
+    """
     try:
-        document = AIDocument.objects.get(id=document_id)
+        if respect_cap and _processing_slots_taken(document_id) >= MAX_CONCURRENT_DOCUMENTS:
+            raise retry_task(self, REQUEUE_SECONDS)
         
-        # Log start of processing
-        DocumentProcessingLog.objects.create(
-            document=document,
-            level='info',
-            message='Starting document processing',
-            processing_step='initialization'
-        )
+        document = AIDocument.objects.get(id=document_id)
         
-        # Update document status
-        document.status = 'processing'
-        document.save()
+        _log(document, 'info', 'Starting document processing', 'initialization')
+        _set_document_fields(document, status='processing', processing_progress=0,
+                             processing_stage='text_extraction', processing_started_at=timezone.now(),
+                             processing_completed_at=None)
         
         # Get file path
         file_path = document.file.path
@@ -234,167 +534,40 @@ def process_document_async(self, document_id: int):
             else:
                 raise ValueError(f"Unsupported file type: {document.file_type}")
             
-            # Save extracted text
-            document.extracted_text = extracted_text
-            document.save()
-            
-            DocumentProcessingLog.objects.create(
-                document=document,
-                level='success',
-                message=f'Text extraction completed. Extracted {len(extracted_text)} characters.',
-                processing_step='text_extraction'
-            )
+            _set_document_fields(document, extracted_text=extracted_text, processing_progress=SHARD_PROGRESS_START,
+                                 processing_stage='knowledge_extraction')
+            _log(document, 'success', f'Text extraction completed. Extracted {len(extracted_text)} characters.',
+                 'text_extraction')
             
         except Exception as e:
-            DocumentProcessingLog.objects.create(
-                document=document,
-                level='error',
-                message=f'Text extraction failed: {str(e)}',
-                processing_step='text_extraction',
-                details={'error': str(e)}
-            )
-            document.status = 'error'
-            document.processing_notes = f'Text extraction failed: {str(e)}'
-            document.save()
+            _log(document, 'error', f'Text extraction failed: {str(e)}', 'text_extraction', {'error': str(e)})
+            _set_document_fields(document, status='error', processing_notes=f'Text extraction failed: {str(e)}')
             return
         
-        # Extract knowledge
-        try:
-            extractor = KnowledgeExtractor()
-            
-            # Extract Q&A pairs
-            qa_pairs = extractor.extract_qa_pairs(extracted_text)
-            
-            # Create knowledge base entries
-            for qa in qa_pairs:
-                KnowledgeBaseEntry.objects.create(
-                    title=qa['question'][:200],
-                    content=qa['answer'],
-                    entry_type='faq',
-                    source_document=document,
-                    confidence_score=0.7
-                )
-            
-            # Extract procedures
-            procedures = extractor.extract_procedures(extracted_text)
-            for proc in procedures:
-                KnowledgeBaseEntry.objects.create(
-                    title=f"Procedure from {document.title}",
-                    content=json.dumps(proc),
-                    entry_type='procedure',
-                    source_document=document,
-                    confidence_score=0.6
-                )
-            
-            # Extract policies
-            policies = extractor.extract_policies(extracted_text)
-            for policy in policies:
-                KnowledgeBaseEntry.objects.create(
-                    title=f"{policy['type'].title()} from {document.title}",
-                    content=policy['content'],
-                    entry_type='policy',
-                    source_document=document,
-                    confidence_score=0.8
-                )
-            
-            DocumentProcessingLog.objects.create(
-                document=document,
-                level='success',
-                message=f'Knowledge extraction completed. Created {len(qa_pairs)} Q&A pairs, {len(procedures)} procedures, {len(policies)} policies.',
-                processing_step='knowledge_extraction'
-            )
-            
-        except Exception as e:
-            DocumentProcessingLog.objects.create(
-                document=document,
-                level='warning',
-                message=f'Knowledge extraction partially failed: {str(e)}',
-                processing_step='knowledge_extraction',
-                details={'error': str(e)}
-            )
-        
-        # Generate AI intents
-        try:
-            intent_generator = IntentGenerator()
-            qa_pairs = extractor.extract_qa_pairs(extracted_text)
-            intents = intent_generator.generate_intents_from_qa(qa_pairs)
-            
-            for intent_data in intents:
-                # Check if intent already exists
-                if not AIIntent.objects.filter(name=intent_data['name']).exists():
-                    intent = AIIntent.objects.create(
-                        name=intent_data['name'],
-                        description=intent_data['description'],
-                        examples=intent_data['examples'],
-                        responses=intent_data['responses'],
-                        confidence_score=intent_data['confidence_score']
-                    )
-                    intent.source_documents.add(document)
-            
-            DocumentProcessingLog.objects.create(
-                document=document,
-                level='success',
-                message=f'Intent generation completed. Created {len(intents)} intents.',
-                processing_step='intent_generation'
-            )
-            
-        except Exception as e:
-            DocumentProcessingLog.objects.create(
-                document=document,
-                level='warning',
-                message=f'Intent generation failed: {str(e)}',
-                processing_step='intent_generation',
-                details={'error': str(e)}
-            )
+        bounds = shard_bounds(extracted_text)
+        if len(bounds) > 1:
+            _log(document, 'info', f'Split into {len(bounds)} shards for parallel knowledge extraction.',
+                 'sharding', {'shards': len(bounds)})
+            header = [
+                extract_document_shard.s(document_id, index, start, end, len(bounds))
+                for index, (start, end) in enumerate(bounds)
+            ]
+            run_chord(header, merge_document_shards.s(document_id))
+            return {
+                'status': 'processing',
+                'document_id': document_id,
+                'shards': len(bounds),
+                'message': f'Document split into {len(bounds)} shards'
+            }
         
-        # Generate training data
         try:
-            qa_pairs = extractor.extract_qa_pairs(extracted_text)
-            
-            for i, qa in enumerate(qa_pairs):
-                TrainingData.objects.create(
-                    name=f"Training data from {document.title} - {i+1}",
-                    training_type='intent',
-                    input_text=qa['question'],
-                    expected_output=qa['answer'],
-                    intent_label=f"qa_intent_{i+1}",
-                    source_document=document,
-                    confidence_threshold=0.7
-                )
-            
-            DocumentProcessingLog.objects.create(
-                document=document,
-                level='success',
-                message=f'Training data generation completed. Created {len(qa_pairs)} training entries.',
-                processing_step='training_data_generation'
-            )
-            
+            knowledge = extract_knowledge(extracted_text)
         except Exception as e:
-            DocumentProcessingLog.objects.create(
-                document=document,
-                level='warning',
-                message=f'Training data generation failed: {str(e)}',
-                processing_step='training_data_generation',
-                details={'error': str(e)}
-            )
-        
-        # Mark document as processed
-        document.status = 'processed'
-        document.processing_notes = 'Document processing completed successfully'
-        document.save()
-        
-        DocumentProcessingLog.objects.create(
-            document=document,
-            level='success',
-            message='Document processing completed successfully',
-            processing_step='completion'
-        )
+            knowledge = None
+            _log(document, 'warning', f'Knowledge extraction failed: {str(e)}', 'knowledge_extraction',
+                 {'error': str(e)})
         
-        return {
-            'status': 'success',
-            'document_id': document_id,
-            'message': 'Document processed successfully'
-        }
+        return _materialize_knowledge(document, knowledge)
         
     except AIDocument.DoesNotExist:
         logger.error(f"Document with ID {document_id} not found")
@@ -404,40 +577,109 @@ def process_document_async(self, document_id: int):
             'message': 'Document not found'
         }
     
+    except Retry:
+        raise
+    
     except Exception as e:
         logger.error(f"Error processing document {document_id}: {str(e)}")
+        _mark_failed(document_id, e)
         
-        try:
-            document = AIDocument.objects.get(id=document_id)
-            document.status = 'error'
-            document.processing_notes = f'Processing failed: {str(e)}'
-            document.save()
-            
-            DocumentProcessingLog.objects.create(
-                document=document,
-                level='error',
-                message=f'Document processing failed: {str(e)}',
-                processing_step='error',
-                details={'error': str(e)}
-            )
-        except:
-            pass
+        return {
+            'status': 'error',
+            'document_id': document_id,
+            'message': str(e)
+        }
+
+def _mark_failed(document_id: int, error: Exception):
+    try:
+        document = AIDocument.objects.get(id=document_id)
+        _set_document_fields(document, status='error', processing_notes=f'Processing failed: {str(error)}')
+        _log(document, 'error', f'Document processing failed: {str(error)}', 'error', {'error': str(error)})
+    except:
+        pass
+
+@shared_task
+def extract_document_shard(document_id: int, index: int, start: int, end: int, total: int) -> Dict[str, Any]:
+    """
+    Extract the knowledge of ``extracted_text[start:end]`` of a document. Only the shard is read
+    from the database; failures are returned (not raised) so the merge step still runs.
+    """
+    try:
+        text = AIDocument.objects.filter(id=document_id).annotate(
+            shard=Substr('extracted_text', start + 1, end - start)
+        ).values_list('shard', flat=True).first() or ''
+        result = extract_knowledge(text)
+        level, details = 'info', {'shard': index}
+        message = f'Shard {index + 1}/{total} extracted: {len(result["qa_pairs"])} Q&A pairs, {len(result["policies"])} policies.'
+    except Exception as e:
+        result = {'error': str(e)}
+        level, details = 'warning', {'shard': index, 'error': str(e)}
+        message = f'Shard {index + 1}/{total} extraction failed: {str(e)}'
+    result['shard'] = index
+    
+    # Nothing below may raise: under Celery the chord callback only runs once every shard returned
+    try:
+        DocumentProcessingLog.objects.create(
+            document_id=document_id,
+            level=level,
+            message=message,
+            processing_step='shard_extraction',
+            details=details
+        )
+        
+        # Progress follows the shards completed in this run (one log row each)
+        started_at = AIDocument.objects.filter(id=document_id).values_list('processing_started_at', flat=True).first()
+        done = DocumentProcessingLog.objects.filter(
+            document_id=document_id, processing_step='shard_extraction', created_at__gte=started_at or timezone.now()
+        ).count()
+        progress = SHARD_PROGRESS_START + (SHARD_PROGRESS_END - SHARD_PROGRESS_START) * min(done, total) // total
+        stage = f'knowledge_extraction ({min(done, total)}/{total} shards)'
+        AIDocument.objects.filter(id=document_id).update(
+            processing_progress=Greatest('processing_progress', Value(progress)),
+            processing_stage=stage
+        )
+        publish('document', id=document_id, progress=progress, stage=stage)
+    except Exception as e:
+        logger.warning(f"Could not record progress of shard {index + 1}/{total} of document {document_id}: {e}")
+    return result
+
+@shared_task
+def merge_document_shards(shard_results: List[Dict[str, Any]], document_id: int):
+    """Chord callback: deduplicate the shard extractions and write them for the document"""
+    try:
+        document = AIDocument.objects.get(id=document_id)
+        # Shards return their failures; a missing result only comes from a task the local queue lost
+        failed = [index for index, result in enumerate(shard_results) if not result or result.get('error')]
+        if failed:
+            _log(document, 'warning', f'{len(failed)} of {len(shard_results)} shards failed; their sections were skipped.',
+                 'knowledge_extraction', {'shards': failed})
+        _set_document_fields(document, processing_progress=SHARD_PROGRESS_END, processing_stage='merging')
+        return _materialize_knowledge(document, merge_knowledge([result for result in shard_results if result]))
         
+    except Exception as e:
+        logger.error(f"Error merging shards of document {document_id}: {str(e)}")
+        _mark_failed(document_id, e)
         return {
             'status': 'error',
             'document_id': document_id,
             'message': str(e)
         }
 
+def enqueue_documents(document_ids: List[int]):
+    """
+    Queue processing of many documents in one round trip to the task backend; at most
+    AI_KNOWLEDGE_MAX_CONCURRENT_DOCUMENTS of them are processed at the same time.
+    """
+    return run_group([process_document_async.s(document_id, respect_cap=True) for document_id in document_ids])
+
 @shared_task
 def cleanup_old_logs(days: int = 30):
     """Clean up old processing logs"""
-    from datetime import timedelta
-    
     cutoff_date = timezone.now() - timedelta(days=days)
     deleted_count = DocumentProcessingLog.objects.filter(
         created_at__lt=cutoff_date
     ).delete()[0]
+    prune_events()
     
     logger.info(f"Cleaned up {deleted_count} old processing logs")
     return deleted_count
@@ -483,113 +725,66 @@ def generate_training_data_from_feedback(feedback_data: Dict[str, Any]):
 
 @shared_task(bind=True)
 def start_training_process(self, training_data_id: int):
-    """Start the training process for a specific training data item"""
+    """Start the training process for a specific training data item (trains the whole intent model once)"""
+    return batch_training_process(training_data_ids=[training_data_id])
+
+
+@shared_task
+def batch_training_process(training_data_ids: List[int], user_id: int = None):
+    """
+    Train the intent classifier once for a batch of training data items.
+
+    One model is fitted over all approved examples (see intent_model.train_intent_model); the
+    progress and stage of every item in the batch are updated together as training advances.
+    """
+    from django.contrib.auth.models import User
+
+    from .intent_model import train_intent_model
+
+    batch = TrainingData.objects.filter(id__in=training_data_ids)
+    
+    # Items without text or expected output are not trained
+    incomplete = list(batch.filter(Q(input_text='') | Q(expected_output='')).values_list('id', flat=True))
+    if incomplete:
+        TrainingData.objects.filter(id__in=incomplete).update(training_stage='failed', updated_at=timezone.now())
+        publish('training', ids=incomplete, stage='failed')
+    ids = [training_id for training_id in batch.values_list('id', flat=True) if training_id not in incomplete]
+    batch = TrainingData.objects.filter(id__in=ids)
+    
+    def progress(percent: int, stage: str):
+        batch.update(training_progress=percent, training_stage=stage, updated_at=timezone.now())
+        publish('training', ids=ids, progress=percent, stage=stage)
+    
+    batch.filter(training_started_at__isnull=True).update(training_started_at=timezone.now())
     try:
-        from .models import TrainingData
-        
-        # Get the training data
-        training_data = TrainingData.objects.get(id=training_data_id)
-        
-        logger.info(f"Starting training process for: {training_data.name}")
-        
-        # Update status to processing
-        training_data.training_progress = 10
-        training_data.training_stage = 'preprocessing'
-        training_data.save()
-        
-        # Simulate preprocessing phase
-        import time
-        time.sleep(2)
-        
-        # Update to data validation phase
-        training_data.training_progress = 25
-        training_data.training_stage = 'validating'
-        training_data.save()
-        
-        # Validate training data
-        if not training_data.input_text or not training_data.expected_output:
-            raise ValueError("Training data is incomplete")
-        
-        time.sleep(2)
-        
-        # Update to model training phase
-        training_data.training_progress = 50
-        training_data.training_stage = 'training'
-        training_data.save()
-        
-        # Simulate model training
-        time.sleep(3)
-        
-        # Update to evaluation phase
-        training_data.training_progress = 75
-        training_data.training_stage = 'evaluating'
-        training_data.save()
-        
-        # Simulate evaluation
-        time.sleep(2)
-        
-        # Complete training
-        training_data.training_progress = 100
-        training_data.training_stage = 'completed'
-        training_data.training_completed_at = timezone.now()
-        training_data.save()
-        
-        logger.info(f"Training completed for: {training_data.name}")
-        
-        return {
-            'status': 'success',
-            'message': f'Training completed for {training_data.name}',
-            'training_data_id': training_data_id,
-            'final_progress': 100
-        }
-        
-    except TrainingData.DoesNotExist:
-        logger.error(f"Training data with ID {training_data_id} not found")
-        return {
-            'status': 'error',
-            'message': f'Training data with ID {training_data_id} not found'
-        }
+        report = train_intent_model(
+            created_by=User.objects.filter(id=user_id).first() if user_id else None,
+            training_ids=ids,
+            progress=progress,
+        )
     except Exception as e:
-        logger.error(f"Error in training process for ID {training_data_id}: {str(e)}")
-        
-        # Update training data with error status
-        try:
-            training_data = TrainingData.objects.get(id=training_data_id)
-            training_data.training_stage = 'failed'
-            training_data.save()
-        except:
-            pass
-        
+        logger.error(f"Intent training failed for {len(ids)} training data items: {str(e)}")
+        batch.update(training_stage='failed', updated_at=timezone.now())
+        publish('training', ids=ids, stage='failed')
         return {
             'status': 'error',
             'message': f'Training failed: {str(e)}',
-            'training_data_id': training_data_id
+            'training_data_ids': ids,
+            'skipped_ids': incomplete
         }
-
-
-@shared_task
-def batch_training_process(training_data_ids: List[int]):
-    """Process multiple training data items in batch"""
-    results = []
     
-    for training_id in training_data_ids:
-        try:
-            result = start_training_process.delay(training_id)
-            results.append({
-                'training_data_id': training_id,
-                'task_id': result.id,
-                'status': 'started'
-            })
-        except Exception as e:
-            logger.error(f"Failed to start training for ID {training_id}: {str(e)}")
-            results.append({
-                'training_data_id': training_id,
-                'status': 'failed',
-                'error': str(e)
-            })
+    batch.update(training_progress=100, training_stage='completed', training_completed_at=timezone.now(),
+                 updated_at=timezone.now())
+    publish('training', ids=ids, progress=100, stage='completed')
+    model_version = report.pop('model_version')
+    logger.info(f"Training completed for {len(ids)} items in {report['elapsed_seconds']}s: {model_version}")
     
     return {
         'status': 'success',
-        'message': f'Batch training started for {len(training_data_ids)} items',
-        'results': results
-    }
\ No newline at end of file
+        'message': f'Trained {model_version} on {report["examples"]} examples of {report["intents"]} intents',
+        'model_version': model_version.version,
+        'training_data_ids': ids,
+        'skipped_ids': incomplete,
+        'final_progress': 100,
+        **report
+    }
@@ -1,3 +1,720 @@
-from django.test import TestCase
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase
+
+from .models import (
+    AIDocument,
+    AIModelVersion,
+    DocumentCategory,
+    KnowledgeBaseEntry,
+    KnowledgeEmbedding,
+    ProgressEvent,
+    TrainingData,
+)
+from .progress import ProgressBroker, publish
+from .search import get_search_backend, query_terms
+from .task_queue import LocalTaskQueue, task_name
+from .utils import semantic_search
+from .vector_index import (
+    VectorIndex,
+    chunk_text,
+    defer_embeddings,
+    get_vector_index,
+    index_document,
+)
+
+
+class FullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="kb-search")
+        category = DocumentCategory.objects.create(name="Policy")
+        document = AIDocument(
+            title="Handbook", category=category, uploaded_by=user, status="processed"
+        )
+        document.file.save("handbook.txt", ContentFile(b"handbook"), save=False)
+        document.save()
+        cls.leave = KnowledgeBaseEntry.objects.create(
+            title="Prosedur cuti melahirkan",
+            content="Karyawan berhak atas cuti melahirkan selama tiga bulan.",
+            keywords="cuti,melahirkan",
+            source_document=document,
+        )
+        cls.overtime = KnowledgeBaseEntry.objects.create(
+            title="Lembur",
+            content="Lembur dibayar sesuai peraturan.",
+            keywords="lembur",
+            source_document=document,
+        )
+
+    def setUp(self):
+        self.backend = get_search_backend()
+        if self.backend is None:
+            self.skipTest("No full-text backend for this database")
+
+    def test_query_terms(self):
+        self.assertEqual(
+            query_terms('Cuti "cuti" OR a melahirkan?'), ["cuti", "melahirkan"]
+        )
+
+    def test_ranks_matching_entries(self):
+        ranked = self.backend.search_entries("bagaimana cuti melahirkan", 5)
+        self.assertEqual([pk for pk, _ in ranked], [self.leave.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.overtime.title = "Lembur saat cuti"
+        self.overtime.save()
+        ranked = self.backend.search_entries("cuti", 5)
+        self.assertIn(self.overtime.pk, [pk for pk, _ in ranked])
+
+        self.overtime.delete()
+        ranked = self.backend.search_entries("lembur", 5)
+        self.assertEqual(ranked, [])
+
+    def test_inactive_entries_are_excluded(self):
+        self.leave.is_active = False
+        self.leave.save()
+        self.assertEqual(self.backend.search_entries("melahirkan", 5), [])
+
+
+class VectorIndexTests(SimpleTestCase):
+    def test_nearest_is_exact_cosine_top_k(self):
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((500, 16)).astype(np.float32)
+        index = VectorIndex()
+        index.add(list(range(1, 501)), vectors)
+        query = rng.standard_normal(16)
+
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = list(
+            np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5] + 1
+        )
+        self.assertEqual(
+            [embedding_id for embedding_id, _ in index.nearest(query, 5)], expected
+        )
+
+    def test_remove_and_replace(self):
+        index = VectorIndex()
+        index.add([1, 2, 3], np.eye(3))
+        index.remove([1])
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.nearest([1, 0, 0], 1)[0][1], 0.0)
+        index.add([3], [[1, 0, 0]])
+        self.assertEqual(index.nearest([1, 0, 0], 1), [(3, 1.0)])
+        self.assertEqual(
+            [embedding_id for embedding_id, _ in index.nearest([0, 1, 0], 5)], [2, 3]
+        )
+
+    def test_chunk_text_packs_paragraphs(self):
+        text = "\n\n".join(["a" * 300] * 5 + ["b" * 1000])
+        chunks = chunk_text(text, size=700, overlap=100)
+        self.assertEqual([len(chunk) for chunk in chunks], [602, 602, 300, 700, 400])
+
+
+class FakeEmbeddingService:
+    embedding_model = "fake-embed"
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_embedding(self, text):
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts, batch_size=None):
+        self.calls += len(texts)
+        return [
+            [
+                float(sum(word.startswith(prefix) for word in text.lower().split()))
+                for prefix in ("cuti", "lembur", "gaji")
+            ]
+            for text in texts
+        ]
+
+
+class SemanticSearchTests(TestCase):
+    def setUp(self):
+        self.service = FakeEmbeddingService()
+        patcher = mock.patch(
+            "ai_knowledge.vector_index.get_embedding_service", return_value=self.service
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_vector_index().reset()
+        get_vector_index().model = None
+
+        user = User.objects.create(username="kb-vector")
+        category = DocumentCategory.objects.create(name="Policy")
+        self.document = AIDocument(
+            title="Handbook",
+            category=category,
+            uploaded_by=user,
+            status="processed",
+            extracted_text="Aturan lembur dan lembur akhir pekan.\n\nGaji dibayar setiap akhir bulan.",
+        )
+        self.document.file.save("handbook.txt", ContentFile(b"handbook"), save=False)
+        self.document.save()
+        with defer_embeddings():
+            self.entry = KnowledgeBaseEntry.objects.create(
+                title="Cuti tahunan",
+                content="Cuti tahunan 12 hari",
+                source_document=self.document,
+            )
+
+    def test_document_processing_embeds_entries_and_chunks(self):
+        self.assertEqual(index_document(self.document), 2)
+        self.assertEqual(KnowledgeEmbedding.objects.count(), 2)
+        self.assertEqual(
+            index_document(self.document), 0
+        )  # unchanged text is not re-embedded
+        self.assertEqual(self.service.calls, 2)
+
+        results = semantic_search("cuti", limit=1)
+        self.assertEqual(results[0]["type"], "knowledge_base")
+        self.assertEqual(results[0]["id"], self.entry.id)
+        self.assertAlmostEqual(results[0]["score"], 1.0)
+        self.assertEqual(
+            semantic_search("gaji lembur", limit=1)[0]["type"], "document_chunk"
+        )
+
+    def test_entry_edits_and_deletes_update_the_index(self):
+        index_document(self.document)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.entry.content = "Gaji gaji gaji"
+            self.entry.title = "Gaji"
+            self.entry.save()
+        self.assertEqual(semantic_search("gaji", limit=1)[0]["id"], self.entry.id)
+
+        self.entry.delete()
+        self.assertEqual(
+            [result["type"] for result in semantic_search("gaji", limit=5)],
+            ["document_chunk"],
+        )
+
+
+class DocumentProcessingTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch(
+            "ai_knowledge.vector_index.get_embedding_service",
+            return_value=FakeEmbeddingService(),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_vector_index().reset()
+        get_vector_index().model = None
+
+        user = User.objects.create(username="kb-processing")
+        category = DocumentCategory.objects.create(name="Handbook")
+        text = "".join(
+            f"Question: how many leave days in year {i}\nAnswer: twelve days, see the leave policy.\n"
+            for i in range(300)
+        )
+        self.document = AIDocument(
+            title="Handbook", category=category, uploaded_by=user
+        )
+        self.document.file.save("handbook.txt", ContentFile(text.encode()), save=False)
+        self.document.save()
+
+    def test_processing_writes_in_bulk_and_replaces_on_reprocessing(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .models import AIIntent, DocumentProcessingLog, TrainingData
+        from .tasks import process_document_async
+
+        other = AIDocument.objects.create(
+            title="Other",
+            category=self.document.category,
+            uploaded_by=self.document.uploaded_by,
+        )
+        shared = AIIntent.objects.create(name="shared_leave", description="Leave")
+        shared.source_documents.add(self.document, other)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                process_document_async(self.document.id)["status"], "success"
+            )
+        # 300 rows per table are written by a few multi-row INSERTs (SQLite caps their size), not one per row
+        inserts = [
+            query["sql"].split('"')[1]
+            for query in queries
+            if query["sql"].startswith("INSERT INTO")
+        ]
+        for table in (
+            "ai_knowledge_knowledgebaseentry",
+            "ai_knowledge_aiintent",
+            "ai_knowledge_trainingdata",
+            "ai_knowledge_aiintent_source_documents",
+        ):
+            self.assertLessEqual(inserts.count(table), 10, table)
+        counts = (
+            KnowledgeBaseEntry.objects.count(),
+            AIIntent.objects.count(),
+            TrainingData.objects.count(),
+            KnowledgeEmbedding.objects.count(),
+        )
+        self.assertGreaterEqual(counts[0], 300)
+        self.assertEqual(counts[1:3], (301, 300))
+        self.assertGreaterEqual(counts[3], counts[0])
+        self.assertEqual(
+            AIIntent.objects.filter(source_documents=self.document).count(), 301
+        )
+
+        # Reprocessing replaces the entries together with their embeddings
+        self.assertEqual(process_document_async(self.document.id)["status"], "success")
+        self.assertEqual(
+            (
+                KnowledgeBaseEntry.objects.count(),
+                AIIntent.objects.count(),
+                TrainingData.objects.count(),
+                KnowledgeEmbedding.objects.count(),
+            ),
+            counts,
+        )
+        self.assertTrue(AIIntent.objects.filter(id=shared.id).exists())
+        self.assertFalse(
+            DocumentProcessingLog.objects.filter(
+                document=self.document, level__in=["warning", "error"]
+            ).exists()
+        )
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.status, "processed")
+
+    def test_qa_labels_are_unique_per_document(self):
+        from .models import AIIntent
+        from .tasks import process_document_async, qa_intent_label
+
+        other = AIDocument(
+            title="Contract",
+            category=self.document.category,
+            uploaded_by=self.document.uploaded_by,
+        )
+        other.file.save(
+            "contract.txt",
+            ContentFile(
+                b"Question: how many leave days in year 0\nAnswer: twenty days.\n"
+            ),
+            save=False,
+        )
+        other.save()
+        for document in (self.document, other):
+            self.assertEqual(process_document_async(document.id)["status"], "success")
+
+        labels = [
+            set(
+                TrainingData.objects.filter(source_document=document).values_list(
+                    "intent_label", flat=True
+                )
+            )
+            for document in (self.document, other)
+        ]
+        self.assertFalse(labels[0] & labels[1])
+        # The first pair of each document has its own intent, with its own answer
+        first = [
+            AIIntent.objects.get(
+                source_documents=document, name=qa_intent_label(document.id, 0)
+            )
+            for document in (self.document, other)
+        ]
+        self.assertIn("twenty days", first[1].responses[0])
+        self.assertNotIn("twenty days", first[0].responses[0])
+
+    def test_sharded_extraction_merges_to_the_whole_document_result(self):
+        from django.utils import timezone
+
+        from .tasks import (
+            extract_document_shard,
+            extract_knowledge,
+            merge_document_shards,
+            merge_knowledge,
+            shard_bounds,
+        )
+
+        text = self.document.file.read().decode()
+        self.document.extracted_text = text
+        self.document.processing_started_at = timezone.now()
+        self.document.save()
+
+        bounds = shard_bounds(text, size=1000)
+        self.assertGreater(len(bounds), 10)
+        self.assertEqual("".join(text[start:end] for start, end in bounds), text)
+        self.assertTrue(
+            all(text[start:end].startswith("Question") for start, end in bounds)
+        )
+
+        results = [
+            extract_document_shard(self.document.id, i, start, end, len(bounds))
+            for i, (start, end) in enumerate(bounds)
+        ]
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.processing_progress, 90)
+
+        whole = extract_knowledge(text)
+        merged = merge_knowledge(
+            results[::-1] + results[:2]
+        )  # out of order, with repeated shards
+        self.assertEqual(merged["qa_pairs"], whole["qa_pairs"])
+        self.assertEqual(merged["procedures"], whole["procedures"])
+
+        self.assertEqual(
+            merge_document_shards(results, self.document.id)["status"], "success"
+        )
+        self.document.refresh_from_db()
+        self.assertEqual(
+            (self.document.status, self.document.processing_progress),
+            ("processed", 100),
+        )
+        self.assertEqual(
+            KnowledgeBaseEntry.objects.filter(entry_type="faq").count(), 300
+        )
+
+    def test_shard_failures_are_returned_not_raised(self):
+        from .tasks import extract_document_shard
+
+        with mock.patch(
+            "ai_knowledge.tasks.Substr", side_effect=RuntimeError("read failed")
+        ), mock.patch(
+            "ai_knowledge.tasks.DocumentProcessingLog.objects.create",
+            side_effect=RuntimeError("log failed"),
+        ):
+            result = extract_document_shard(self.document.id, 1, 0, 100, 3)
+        self.assertEqual(result, {"error": "read failed", "shard": 1})
+
+
+TASK_CALLS = {}
+
+
+def double(value):
+    return value * 2
+
+
+def flaky(key, failures):
+    TASK_CALLS[key] = TASK_CALLS.get(key, 0) + 1
+    if TASK_CALLS[key] <= failures:
+        raise RuntimeError(f"attempt {TASK_CALLS[key]} failed")
+    return key
+
+
+def collect(results, key):
+    TASK_CALLS[key] = results
+
+
+def requeue_later(key, countdown):
+    from .task_queue import retry_task
+
+    TASK_CALLS[key] = TASK_CALLS.get(key, 0) + 1
+    raise retry_task(mock.Mock(**{"request.called_directly": True}), countdown)
+
+
+class LocalTaskQueueTests(SimpleTestCase):
+    def setUp(self):
+        TASK_CALLS.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.queue = LocalTaskQueue(
+            path=os.path.join(directory.name, "tasks.sqlite3"),
+            workers=4,
+            executor="thread",
+            max_retries=2,
+            retry_delay=0,
+            poll_interval=0.01,
+        )
+        self.queue.start()
+        self.addCleanup(self.queue.stop)
+
+    def test_chord_callback_gets_results_in_header_order(self):
+        header = [(task_name(double), [value], {}) for value in range(10)]
+        self.queue.enqueue_chord(header, (task_name(collect), ["chord"], {}))
+        self.assertTrue(self.queue.wait(timeout=10))
+        self.assertEqual(TASK_CALLS["chord"], [value * 2 for value in range(10)])
+
+    def test_failed_tasks_are_retried_then_marked_failed(self):
+        self.queue.enqueue(task_name(flaky), ["recovers", 2])
+        self.queue.enqueue(task_name(flaky), ["broken", 5])
+        self.assertTrue(self.queue.wait(timeout=10))
+        self.assertEqual((TASK_CALLS["recovers"], TASK_CALLS["broken"]), (3, 3))
+
+        stats = self.queue.stats()
+        self.assertEqual(
+            (stats["queued"], stats["running"], stats["failed"]), (0, 0, 1)
+        )
+        self.assertEqual(
+            (stats["completed_here"], stats["retried_here"], stats["failed_here"]),
+            (1, 4, 1),
+        )
+
+    def test_retry_keeps_the_requested_countdown(self):
+        import sqlite3
+        import time
+
+        self.queue.enqueue(task_name(requeue_later), ["capped", 3600])
+        deadline = time.monotonic() + 10
+        while self.queue.stats()["retried_here"] < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(TASK_CALLS["capped"], 1)
+        with sqlite3.connect(self.queue.path) as db:
+            status, attempts, run_after = db.execute(
+                "SELECT status, attempts, run_after FROM tasks"
+            ).fetchone()
+        self.assertEqual((status, attempts), ("queued", 0))
+        self.assertGreater(run_after, time.time() + 3500)
+
+    def test_queue_survives_a_restart(self):
+        self.queue.enqueue(task_name(double), [1], countdown=3600)
+        self.queue.stop()
+        restarted = LocalTaskQueue(path=self.queue.path, executor="thread")
+        self.assertEqual(restarted.depth(), 1)
+        self.assertEqual(restarted.stats()["queued"], 1)
+
+
+class ProgressBrokerTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="kb-progress")
+        self.document = AIDocument(
+            title="Handbook",
+            category=DocumentCategory.objects.create(name="HR"),
+            uploaded_by=user,
+        )
+        self.document.file.save("handbook.txt", ContentFile(b"handbook"), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.document.save()
+            self.training = TrainingData.objects.create(
+                name="Leave", training_type="intent", input_text="how much leave"
+            )
+        self.broker = ProgressBroker()
+        patcher = mock.patch.object(
+            self.broker, "_ensure"
+        )  # no poller thread; the tests poll
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broker.resync()
+
+    def test_transaction_events_are_merged_and_applied_without_per_client_queries(self):
+        from django.db import connection, transaction
+        from django.test.utils import CaptureQueriesContext
+
+        first = self.broker.changes(None)
+        self.assertEqual(first["snapshot"]["counters"]["pending_documents"], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            AIDocument.objects.filter(id=self.document.id).update(
+                status="processing", processing_progress=40
+            )
+            publish(
+                "document",
+                id=self.document.id,
+                status="processing",
+                progress=40,
+                stage="extraction",
+            )
+            with defer_embeddings():
+                for title in ("Leave", "Payroll"):
+                    KnowledgeBaseEntry.objects.create(
+                        title=title, content="...", source_document=self.document
+                    )
+            TrainingData.objects.filter(id=self.training.id).update(
+                training_progress=50
+            )
+            publish("training", ids=[self.training.id], progress=50, stage="training")
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    publish("count", model="intents", delta=5)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(
+            sorted(
+                ProgressEvent.objects.filter(
+                    id__gt=self.broker.events.cursor
+                ).values_list("kind", flat=True)
+            ),
+            ["count", "document", "training"],
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            delta = self.broker.poll()
+        self.assertEqual(
+            len(queries), 3
+        )  # events, logs, and the text of the newly active training item
+        self.assertEqual(
+            delta["documents"][self.document.id]["processing_progress"], 40
+        )
+        self.assertEqual(
+            delta["training"][self.training.id]["question"], "how much leave"
+        )
+        self.assertEqual(
+            (
+                delta["counters"]["processing_documents"],
+                delta["counters"]["pending_documents"],
+                delta["counters"]["total_knowledge_entries"],
+                delta["counters"]["in_progress_training"],
+            ),
+            (1, 0, 2, 1),
+        )
+
+        with self.assertNumQueries(0):
+            update = self.broker.changes(first["cursor"])
+            snapshot = self.broker.snapshot()
+        self.assertEqual(update["delta"], delta)
+        self.assertEqual(
+            self.broker.changes(update["cursor"], timeout=0.01)["delta"], {}
+        )
+        self.assertEqual(snapshot["counters"]["total_intents"], 0)
+        self.assertEqual(
+            [doc["id"] for doc in snapshot["processing_documents"]], [self.document.id]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.document.status = "processed"
+            self.document.save()
+        with self.assertNumQueries(2):
+            delta = self.broker.poll()
+        self.assertIsNone(delta["documents"][self.document.id])
+        self.assertEqual(
+            (
+                delta["counters"]["processed_documents"],
+                delta["counters"]["recent_completed"],
+            ),
+            (1, 1),
+        )
+
+        # Cursors from before a resync get a fresh snapshot
+        self.broker.resync()
+        self.assertIn("snapshot", self.broker.changes(update["cursor"]))
+
+    def test_rows_committed_late_with_lower_ids_are_not_skipped(self):
+        from .models import DocumentProcessingLog
+
+        def log(row_id, message):
+            DocumentProcessingLog.objects.create(
+                id=row_id,
+                document=self.document,
+                level="info",
+                message=message,
+                processing_step="knowledge_extraction",
+            )
+
+        cursor, log_cursor = self.broker.events.cursor, self.broker.logs.cursor
+        ProgressEvent.objects.create(
+            id=cursor + 2, kind="count", data={"model": "intents", "delta": 1}
+        )
+        log(log_cursor + 2, "second")
+        self.broker.poll()
+        self.assertEqual(
+            (list(self.broker.events.gaps), list(self.broker.logs.gaps)),
+            ([cursor + 1], [log_cursor + 1]),
+        )
+
+        # The transactions holding the lower ids commit afterwards, with an outdated document state
+        ProgressEvent.objects.create(
+            id=cursor + 1,
+            kind="document",
+            data={"id": self.document.id, "status": "processing", "progress": 10},
+        )
+        log(log_cursor + 1, "first")
+        delta = self.broker.poll()
+        self.assertEqual(
+            [activity["message"] for activity in delta["activities"]], ["first"]
+        )
+        self.assertEqual(
+            self.broker.documents[self.document.id]["status"], "pending"
+        )  # re-read, not the stale event
+        self.assertEqual(self.broker.counters()["total_intents"], 1)
+        self.assertEqual((self.broker.events.gaps, self.broker.logs.gaps), ({}, {}))
+
+
+class IntentModelTests(TestCase):
+    EXAMPLES = {
+        "leave_request": [
+            "how do I request annual leave",
+            "ajukan cuti tahunan",
+            "I want to take leave next week",
+            "cara mengajukan cuti",
+            "leave request for holiday",
+            "request time off",
+        ],
+        "payslip": [
+            "where is my payslip",
+            "slip gaji bulan ini",
+            "download my salary slip",
+            "kapan gaji dibayar",
+            "show my payslip for march",
+            "salary payment date",
+        ],
+        "overtime": [
+            "how is overtime paid",
+            "aturan lembur",
+            "overtime rate on weekends",
+            "lembur hari libur",
+            "claim overtime hours",
+            "overtime approval process",
+        ],
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch("ai_knowledge.intent_model.MODEL_DIR", directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create(username="kb-trainer")
+        TrainingData.objects.bulk_create(
+            [
+                TrainingData(
+                    name=f"{label} {i}",
+                    training_type="intent",
+                    input_text=text,
+                    intent_label=label,
+                    expected_output=f"Answer about {label}",
+                    confidence_threshold=0.4,
+                )
+                for label, texts in self.EXAMPLES.items()
+                for i, text in enumerate(texts)
+            ]
+        )
+
+    def test_batch_training_fits_one_versioned_model(self):
+        from .intent_model import get_intent_classifier
+        from .tasks import batch_training_process
+
+        ids = list(TrainingData.objects.values_list("id", flat=True))
+        result = batch_training_process(ids, self.user.id)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual((result["examples"], result["intents"]), (18, 3))
+        self.assertGreater(result["test_examples"], 0)
+
+        version = AIModelVersion.objects.get(is_active=True)
+        self.assertEqual(version.version, result["model_version"])
+        self.assertEqual(version.accuracy_score, result["accuracy"])
+        self.assertTrue(os.path.exists(version.model_path))
+        self.assertEqual(
+            set(
+                TrainingData.objects.values_list("training_progress", "training_stage")
+            ),
+            {(100, "completed")},
+        )
+
+        prediction = get_intent_classifier().predict(
+            "berapa tarif lembur di hari minggu"
+        )
+        self.assertEqual(prediction["intent"], "overtime")
+        self.assertEqual(prediction["response"], "Answer about overtime")
+
+    def test_training_needs_two_intents(self):
+        from .tasks import batch_training_process
+
+        TrainingData.objects.exclude(intent_label="payslip").delete()
+        result = batch_training_process(
+            list(TrainingData.objects.values_list("id", flat=True))
+        )
+        self.assertEqual(result["status"], "error")
+        self.assertFalse(AIModelVersion.objects.exists())
+        self.assertEqual(
+            set(TrainingData.objects.values_list("training_stage", flat=True)),
+            {"failed"},
+        )
@@ -49,6 +49,7 @@ urlpatterns = [
     path('api/processing-queue/', views.api_processing_queue, name='api_processing_queue'),
     path('api/system-health/', views.api_system_health, name='api_system_health'),
     path('api/training-progress/', views.api_training_progress, name='api_training_progress'),
+    path('api/progress-updates/', views.api_progress_updates, name='api_progress_updates'),
     path('api/documents/<int:document_id>/download/', views.api_download_document, name='api_download_document'),
     path('api/knowledge-base/search/', views.api_knowledge_search, name='api_knowledge_search'),
     path('api/training-data/export/', views.api_export_training_data, name='api_export_training_data'),
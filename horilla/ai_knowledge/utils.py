@@ -31,10 +31,12 @@ except ImportError:
 
 from django.conf import settings
 from django.core.files.storage import default_storage
+from django.db.models import Q
 from .models import (
-    AIDocument, KnowledgeBaseEntry, TrainingData, AIIntent,
+    AIDocument, KnowledgeBaseEntry, KnowledgeEmbedding, TrainingData, AIIntent,
     DocumentProcessingLog
 )
+from .vector_index import defer_embeddings, get_vector_index, index_document
 
 logger = logging.getLogger(__name__)
 
@@ -65,8 +67,9 @@ class DocumentProcessor:
             document.processing_progress = 30
             document.save()
             
-            # Generate knowledge base entries
-            kb_entries = self.generate_knowledge_base_entries(document, extracted_text)
+            # Generate knowledge base entries (embedded together with the text chunks below)
+            with defer_embeddings():
+                kb_entries = self.generate_knowledge_base_entries(document, extracted_text)
             document.processing_progress = 50
             document.save()
             
@@ -80,6 +83,11 @@ class DocumentProcessor:
             document.processing_progress = 90
             document.save()
             
+            # Embed text chunks and knowledge base entries for vector search
+            embedded = index_document(document)
+            if embedded is None:
+                self._log_processing(document, 'embedding_skipped', 'Embedding service not available')
+            
             # Mark as processed
             document.status = 'processed'
             document.processing_progress = 100
@@ -473,11 +481,52 @@ def extract_text_from_file(file_path: str) -> str:
     processor = DocumentProcessor()
     return processor.extract_text_from_file(file_path)
 
+def _preview(text: str, length: int = 200) -> str:
+    return text[:length] + '...' if len(text) > length else text
+
 def semantic_search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
     """Perform semantic search in knowledge base"""
-    # Simple text-based search for now
-    # In production, you would use vector embeddings
+    hits = get_vector_index().search(query, limit)
+    if hits is None:
+        # No embeddings (Ollama unavailable or nothing indexed yet): text matching
+        return _text_search(query, limit)
     
+    embeddings = (
+        KnowledgeEmbedding.objects.select_related('entry', 'document')
+        .defer('vector', 'document__extracted_text')
+        .in_bulk([embedding_id for embedding_id, _ in hits])
+    )
+    results = []
+    for embedding_id, score in hits:
+        embedding = embeddings.get(embedding_id)
+        if embedding is None:
+            continue
+        if embedding.entry_id:
+            entry = embedding.entry
+            results.append({
+                'type': 'knowledge_base',
+                'id': entry.id,
+                'title': entry.title,
+                'content': _preview(entry.content),
+                'confidence': entry.confidence_score,
+                'source': embedding.document.title,
+                'score': round(score, 4)
+            })
+        else:
+            results.append({
+                'type': 'document_chunk',
+                'id': embedding.document_id,
+                'chunk': embedding.chunk_index,
+                'title': embedding.document.title,
+                'content': _preview(embedding.text),
+                'source': embedding.document.title,
+                'score': round(score, 4)
+            })
+    
+    return results
+
+def _text_search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Substring search used when no embeddings are available"""
     results = []
     
     # Search in knowledge base entries
@@ -493,7 +542,7 @@ def semantic_search(query: str, limit: int = 10) -> List[Dict[str, Any]]:
             'type': 'knowledge_base',
             'id': entry.id,
             'title': entry.title,
-            'content': entry.content[:200] + '...' if len(entry.content) > 200 else entry.content,
+            'content': _preview(entry.content),
             'confidence': entry.confidence_score,
             'source': entry.source_document.title if entry.source_document else 'Manual Entry'
         })
@@ -0,0 +1,351 @@
+"""
+Vector retrieval over AI Knowledge entries and document text chunks.
+
+Embeddings come from ``OllamaService.get_embeddings`` and are stored as float32 bytes in
+``KnowledgeEmbedding``: one row per knowledge base entry and one per chunk of a document's
+extracted text. Rows are (re-)embedded in batches when a document is processed and when a single
+entry is edited; unchanged text (same content hash and model) is never sent to Ollama again.
+
+Each process keeps the vectors of searchable rows in one L2-normalised float32 matrix, so a query
+is a single matrix-vector product plus ``argpartition``: exact cosine nearest neighbours. The
+matrix is synced incrementally like ``nlp_engine.knowledge_index`` (only rows whose ``updated_at``
+changed are re-read) when a model signal fires in this process or at most every
+``AI_KNOWLEDGE_VECTOR_REFRESH`` seconds.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import AIDocument, KnowledgeBaseEntry, KnowledgeEmbedding
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH = getattr(settings, 'AI_KNOWLEDGE_EMBED_BATCH', 32)
+CHUNK_CHARS = getattr(settings, 'AI_KNOWLEDGE_CHUNK_CHARS', 1200)
+CHUNK_OVERLAP = getattr(settings, 'AI_KNOWLEDGE_CHUNK_OVERLAP', 200)
+REFRESH_SECONDS = getattr(settings, 'AI_KNOWLEDGE_VECTOR_REFRESH', 30)
+SEARCHABLE_STATUSES = ['processed', 'approved']
+LOAD_BATCH = 2000
+UPDATE_FIELDS = ['text', 'content_hash', 'model', 'dimensions', 'vector', 'updated_at']
+
+# (document_id, entry_id or None, chunk_index)
+EmbeddingKey = Tuple[int, Optional[int], int]
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Pack paragraphs into chunks of about ``size`` characters; longer paragraphs are windowed"""
+    chunks, current = [], ''
+    for paragraph in re.split(r'\n\s*\n', text or ''):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > size:
+            chunks.append(current)
+            current = ''
+        if len(paragraph) > size:
+            for start in range(0, len(paragraph) - overlap, size - overlap):
+                chunks.append(paragraph[start:start + size])
+            continue
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _entry_text(entry: KnowledgeBaseEntry) -> str:
+    return f"{entry.title}\n{entry.content}"
+
+
+def get_embedding_service():
+    """Available OllamaService, or None"""
+    from nlp_engine.ollama_service import get_ollama_service
+
+    service = get_ollama_service()
+    return service if service and service.is_available() else None
+
+
+def _embed_batch(service, texts: List[str]) -> List[Optional[np.ndarray]]:
+    return [np.asarray(vector, dtype=np.float32) if vector else None
+            for vector in service.get_embeddings(texts, batch_size=EMBED_BATCH)]
+
+
+def _write_embeddings(wanted: Dict[EmbeddingKey, str], existing) -> Optional[int]:
+    """
+    Make the rows in ``existing`` match ``wanted``: embed new or changed texts in batches of
+    EMBED_BATCH and drop rows that are no longer wanted. Returns rows written, None without Ollama.
+    """
+    service = get_embedding_service()
+    if service is None:
+        return None
+    model = service.embedding_model
+    rows = {
+        (row.document_id, row.entry_id, row.chunk_index): row
+        for row in existing.only('id', 'document_id', 'entry_id', 'chunk_index', 'content_hash', 'model')
+    }
+    stale = [row.id for key, row in rows.items() if key not in wanted]
+    pending = []
+    for key, text in wanted.items():
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        row = rows.get(key)
+        if row is None or row.content_hash != digest or row.model != model:
+            pending.append((key, text, digest, row))
+
+    written = 0
+    for start in range(0, len(pending), EMBED_BATCH):
+        batch = pending[start:start + EMBED_BATCH]
+        created, updated = [], []
+        for (key, text, digest, row), vector in zip(batch, _embed_batch(service, [item[1] for item in batch])):
+            if vector is None:
+                continue
+            fields = {'text': text, 'content_hash': digest, 'model': model,
+                      'dimensions': len(vector), 'vector': vector.tobytes()}
+            if row is None:
+                document_id, entry_id, chunk_index = key
+                created.append(KnowledgeEmbedding(
+                    document_id=document_id, entry_id=entry_id, chunk_index=chunk_index, **fields))
+            else:
+                for name, value in fields.items():
+                    setattr(row, name, value)
+                row.updated_at = timezone.now()  # bulk_update skips auto_now
+                updated.append(row)
+        KnowledgeEmbedding.objects.bulk_create(created)
+        if updated:
+            KnowledgeEmbedding.objects.bulk_update(updated, UPDATE_FIELDS)
+        written += len(created) + len(updated)
+
+    if stale:
+        KnowledgeEmbedding.objects.filter(id__in=stale).delete()
+    if written or stale:
+        get_vector_index().mark_stale()
+    return written
+
+
+def index_entries(entries: Iterable[KnowledgeBaseEntry]) -> Optional[int]:
+    """(Re-)embed knowledge base entries whose text changed"""
+    entries = list(entries)
+    wanted = {(entry.source_document_id, entry.id, 0): _entry_text(entry) for entry in entries}
+    existing = KnowledgeEmbedding.objects.filter(entry__in=[entry.id for entry in entries])
+    return _write_embeddings(wanted, existing)
+
+
+def index_document(document: AIDocument, entries: bool = True) -> Optional[int]:
+    """
+    Embed the chunks of a document's extracted text and, by default, its knowledge base entries.
+    Returns the number of vectors written, or None when the embedding service is unavailable.
+    """
+    wanted = {(document.id, None, i): chunk for i, chunk in enumerate(chunk_text(document.extracted_text))}
+    written = _write_embeddings(wanted, KnowledgeEmbedding.objects.filter(document=document, entry__isnull=True))
+    if written is None or not entries:
+        return written
+    return written + (index_entries(document.knowledge_entries.all()) or 0)
+
+
+class VectorIndex:
+    """In-memory cosine index over the stored embeddings of one embedding model"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)  # embedding id per matrix row
+        self._slots: Dict[int, int] = {}  # embedding id -> matrix row; rows [0, len) are in use
+        self._versions: Dict[int, object] = {}
+        self.model: Optional[str] = None
+        self._next_sync = 0.0
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def dimensions(self) -> int:
+        return self._matrix.shape[1]
+
+    def reset(self, dimensions: int = 0):
+        with self._lock:
+            self._matrix = np.zeros((0, dimensions), dtype=np.float32)
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._slots, self._versions = {}, {}
+
+    def add(self, ids: List[int], vectors: np.ndarray):
+        """Insert or replace vectors (rows of ``vectors``) under the given embedding ids"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(ids):
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._lock:
+            if not self._slots and self.dimensions != vectors.shape[1]:
+                self._matrix = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+                self._ids = np.zeros(0, dtype=np.int64)
+            known = [(i, self._slots[embedding_id]) for i, embedding_id in enumerate(ids) if embedding_id in self._slots]
+            if known:
+                rows, slots = zip(*known)
+                self._matrix[list(slots)] = vectors[list(rows)]
+            new = [i for i, embedding_id in enumerate(ids) if embedding_id not in self._slots]
+            if new:
+                start = len(self._slots)
+                self._reserve(start + len(new))
+                self._matrix[start:start + len(new)] = vectors[new]
+                for slot, i in enumerate(new, start):
+                    self._ids[slot] = ids[i]
+                    self._slots[ids[i]] = slot
+
+    def _reserve(self, size: int):
+        if size > len(self._matrix):
+            capacity = max(1024, 2 * len(self._matrix), size)
+            used = len(self._slots)
+            matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+            matrix[:used] = self._matrix[:used]
+            ids = np.zeros(capacity, dtype=np.int64)
+            ids[:used] = self._ids[:used]
+            self._matrix, self._ids = matrix, ids
+
+    def remove(self, ids: Iterable[int]):
+        """Drop vectors; the last row moves into the freed slot so the matrix stays dense"""
+        with self._lock:
+            for embedding_id in ids:
+                slot = self._slots.pop(embedding_id, None)
+                if slot is None:
+                    continue
+                last = len(self._slots)
+                if slot != last:
+                    self._matrix[slot] = self._matrix[last]
+                    self._ids[slot] = self._ids[last]
+                    self._slots[int(self._ids[slot])] = slot
+                self._ids[last] = 0
+
+    def nearest(self, vector, limit: int = 10) -> List[Tuple[int, float]]:
+        """Exact top-``limit`` (embedding id, cosine similarity), best first"""
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        with self._lock:
+            size = len(self._slots)
+            if not size or query.shape != (self.dimensions,) or not norm:
+                return []
+            scores = self._matrix[:size] @ (query / norm)
+            k = min(limit, size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self._ids[slot]), float(scores[slot])) for slot in top]
+
+    def sync(self, model: str, force: bool = False):
+        """Load rows of ``model`` whose updated_at changed and drop rows that are no longer searchable"""
+        now = time.monotonic()
+        if not force and now < self._next_sync and model == self.model:
+            return
+        with self._lock:
+            self._next_sync = now + REFRESH_SECONDS
+            if model != self.model:
+                self.reset()
+                self.model = model
+            queryset = KnowledgeEmbedding.objects.filter(
+                model=model, document__status__in=SEARCHABLE_STATUSES
+            ).filter(Q(entry__isnull=True) | Q(entry__is_active=True))
+            current = dict(queryset.values_list('id', 'updated_at'))
+            gone = [embedding_id for embedding_id in self._versions if embedding_id not in current]
+            self.remove(gone)
+            for embedding_id in gone:
+                del self._versions[embedding_id]
+            changed = [embedding_id for embedding_id, updated in current.items()
+                       if self._versions.get(embedding_id) != updated]
+            for start in range(0, len(changed), LOAD_BATCH):
+                rows = KnowledgeEmbedding.objects.filter(id__in=changed[start:start + LOAD_BATCH]).values_list(
+                    'id', 'vector', 'updated_at')
+                ids, vectors = [], []
+                for embedding_id, vector, updated in rows:
+                    vector = np.frombuffer(vector, dtype=np.float32)
+                    if self._slots and len(vector) != self.dimensions:
+                        continue
+                    ids.append(embedding_id)
+                    vectors.append(vector)
+                    self._versions[embedding_id] = updated
+                if ids:
+                    self.add(ids, np.vstack(vectors))
+
+    def mark_stale(self):
+        """Sync on the next query"""
+        self._next_sync = 0.0
+
+    def search(self, query: str, limit: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """
+        Nearest embeddings to the query text as (embedding id, cosine similarity), or None when
+        the embedding service is unavailable so callers can fall back to text matching
+        """
+        service = get_embedding_service()
+        if service is None:
+            return None
+        try:
+            self.sync(service.embedding_model)
+        except Exception as e:
+            logger.warning(f"Vector index sync failed: {e}")
+        if not len(self):
+            return None
+        vector = service.get_embedding(query)
+        if not vector:
+            return None
+        return self.nearest(vector, limit)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {'model': self.model, 'vectors': len(self._slots), 'dimensions': self.dimensions,
+                    'capacity': len(self._matrix), 'megabytes': round(self._matrix.nbytes / 2 ** 20, 1)}
+
+
+_index: Optional[VectorIndex] = None
+_index_lock = threading.Lock()
+_deferred = threading.local()
+
+
+def get_vector_index() -> VectorIndex:
+    """Process-wide vector index (loaded on first search)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = VectorIndex()
+    return _index
+
+
+@contextmanager
+def defer_embeddings():
+    """Skip per-entry embedding on save; the caller runs index_document() afterwards"""
+    _deferred.depth = getattr(_deferred, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _deferred.depth -= 1
+
+
+def _reindex_entry(entry_id: int):
+    try:
+        index_entries(KnowledgeBaseEntry.objects.filter(id=entry_id))
+    except Exception as e:
+        logger.warning(f"Could not embed knowledge base entry {entry_id}: {e}")
+
+
+def _entry_saved(sender, instance, raw=False, **kwargs):
+    if raw or getattr(_deferred, 'depth', 0):
+        return
+    transaction.on_commit(lambda: _reindex_entry(instance.pk))
+
+
+def _knowledge_changed(sender, **kwargs):
+    if _index is not None:
+        _index.mark_stale()
+
+
+post_save.connect(_entry_saved, sender=KnowledgeBaseEntry, dispatch_uid='vector_index_entry_saved')
+for _model in (KnowledgeBaseEntry, AIDocument, KnowledgeEmbedding):
+    post_save.connect(_knowledge_changed, sender=_model, dispatch_uid=f'vector_index_save_{_model.__name__}')
+    post_delete.connect(_knowledge_changed, sender=_model, dispatch_uid=f'vector_index_delete_{_model.__name__}')
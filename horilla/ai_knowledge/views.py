@@ -18,16 +18,23 @@ from datetime import datetime, timedelta
 
 from .models import (
     AIDocument, DocumentCategory, TrainingData, AIIntent, 
-    KnowledgeBaseEntry, DocumentProcessingLog, AIModelVersion
+    KnowledgeBaseEntry, DocumentProcessingLog, AIModelVersion, KnowledgeEmbedding
 )
 from .forms import (
     DocumentUploadForm, DocumentCategoryForm, TrainingDataForm,
     AIIntentForm, KnowledgeBaseEntryForm, DocumentSearchForm
 )
 from .decorators import admin_manager_required, admin_manager_permission_required, api_admin_manager_required
+from .progress import get_progress_broker, publish, publish_many
+from .task_queue import stats as task_queue_stats
+from .vector_index import get_vector_index
 
 logger = logging.getLogger(__name__)
 
+# Longest wait of a progress long poll (api_progress_updates); keep it well below the gunicorn worker
+# timeout, and serve with threaded workers (entrypoint.sh) so waiting requests don't block the app
+PROGRESS_WAIT_SECONDS = getattr(settings, 'AI_KNOWLEDGE_PROGRESS_WAIT_SECONDS', 20)
+
 @admin_manager_required
 def dashboard(request):
     """AI Knowledge Management Dashboard"""
@@ -667,68 +674,58 @@ def analytics(request):
     
     return render(request, 'ai_knowledge/analytics.html', context)
 
-@api_admin_manager_required
-def api_training_progress(request):
-    """API endpoint for real-time training progress data"""
-    # Training data progress
-    total_training_data = TrainingData.objects.count()
-    completed_training = TrainingData.objects.filter(training_progress=100).count()
-    in_progress_training = TrainingData.objects.filter(
-        training_progress__gt=0, training_progress__lt=100
-    ).count()
-    pending_training = TrainingData.objects.filter(training_progress=0).count()
-    
-    # Document processing progress
-    documents_in_progress = list(AIDocument.objects.filter(
-        status='processing', processing_progress__gt=0
-    ).values('id', 'title', 'processing_progress', 'processing_stage'))
-    
-    # Training data in progress - format for frontend
-    training_in_progress = list(TrainingData.objects.filter(
-        training_progress__gt=0, training_progress__lt=100
-    ).values('id', 'name', 'training_progress', 'training_stage', 'training_type', 'input_text'))
-    
-    # Format active training processes for frontend compatibility
-    active_training_processes = []
-    for training in training_in_progress:
-        active_training_processes.append({
-            'id': training['id'],
-            'question': training['input_text'] or training['name'],  # Use input_text as question
-            'training_progress': training['training_progress'],
-            'training_stage': training['training_stage'] or 'Initializing',
-            'training_type': training['training_type']
-        })
-    
-    # Format processing documents for frontend compatibility
-    processing_documents = []
-    for doc in documents_in_progress:
-        processing_documents.append({
-            'id': doc['id'],
-            'title': doc['title'],
-            'processing_progress': doc['processing_progress'],
-            'processing_stage': doc['processing_stage'] or 'Processing'
-        })
-    
-    # Calculate progress percentage
-    progress_percentage = (completed_training / total_training_data * 100) if total_training_data > 0 else 0
-    
-    data = {
+def _training_progress_data(snapshot):
+    counters = snapshot['counters']
+    return {
         'training_stats': {
-            'total': total_training_data,
-            'completed': completed_training,
-            'in_progress': in_progress_training,
-            'pending': pending_training,
-            'completion_rate': progress_percentage,
-            'progress_percentage': progress_percentage,  # Add this field for frontend compatibility
+            'total': counters['total_training_data'],
+            'completed': counters['completed_training'],
+            'in_progress': counters['in_progress_training'],
+            'pending': counters['pending_training'],
+            'completion_rate': counters['training_completion_rate'],
+            'progress_percentage': counters['training_completion_rate'],  # Add this field for frontend compatibility
         },
-        'documents_in_progress': documents_in_progress,  # Keep original format
-        'training_in_progress': training_in_progress,    # Keep original format
-        'active_training_processes': active_training_processes,  # Add formatted data for frontend
-        'processing_documents': processing_documents,    # Add formatted data for frontend
+        # Original formats
+        'documents_in_progress': [
+            {'id': doc['id'], 'title': doc['title'], 'processing_progress': doc['processing_progress'],
+             'processing_stage': doc['processing_stage']}
+            for doc in snapshot['processing_documents']
+        ],
+        'training_in_progress': [
+            {'id': training['id'], 'name': training['name'], 'training_progress': training['training_progress'],
+             'training_stage': training['training_stage'], 'training_type': training['training_type'],
+             'input_text': training['question']}
+            for training in snapshot['active_training_processes']
+        ],
+        'active_training_processes': [
+            {key: training[key] for key in ('id', 'question', 'training_progress', 'training_stage', 'training_type')}
+            for training in snapshot['active_training_processes']
+        ],
+        'processing_documents': snapshot['processing_documents'],
         'timestamp': timezone.now().isoformat(),
     }
-    
-    return JsonResponse(data)
+
+@api_admin_manager_required
+def api_training_progress(request):
+    """API endpoint for real-time training progress data (served from the progress broker's memory)"""
+    return JsonResponse(_training_progress_data(get_progress_broker().snapshot()))
+
+@api_admin_manager_required
+def api_progress_updates(request):
+    """
+    Long-polled dashboard progress. Without ``since``, or with a cursor the progress broker can no
+    longer serve, returns ``{cursor, snapshot}`` (the api_training_progress data plus counters and
+    recent activities) right away. Otherwise waits until something changed after ``since`` (at most
+    AI_KNOWLEDGE_PROGRESS_WAIT_SECONDS) and returns ``{cursor, delta}``: changed document/training
+    ids mapped to their entry, or null once they left the in-progress lists, plus the changed
+    counters and new activities. The delta is empty when nothing changed in time.
+    """
+    result = get_progress_broker().changes(request.GET.get('since'), timeout=PROGRESS_WAIT_SECONDS)
+    if 'snapshot' in result:
+        snapshot = result.pop('snapshot')
+        result['snapshot'] = {**_training_progress_data(snapshot), 'counters': snapshot['counters'],
+                              'recent_activities': snapshot['recent_activities']}
+    return JsonResponse(result)
 
 @admin_manager_required
 def processing_logs(request):
@@ -851,12 +848,13 @@ def process_document_async(document_id):
     """Process document asynchronously using Celery task"""
     try:
         # Import the Celery task
+        from .task_queue import delay
         from .tasks import process_document_async as celery_process_document
         
-        # Start the Celery task
-        celery_process_document.delay(document_id)
+        # Start the task on Celery, or on the local executor when the broker is unavailable
+        delay(celery_process_document, document_id)
         
-        logger.info(f'Celery task started for document {document_id}')
+        logger.info(f'Processing task queued for document {document_id}')
         
     except Exception as e:
         logger.error(f'Error starting Celery task for document {document_id}: {e}')
@@ -992,16 +990,32 @@ def api_search_semantic(request):
         if not query:
             return JsonResponse({'error': 'Query parameter required'}, status=400)
         
-        # Simple text search for now (can be enhanced with semantic search later)
-        documents = AIDocument.objects.filter(
-            Q(title__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(extracted_text__icontains=query)
-        ).select_related('category', 'uploaded_by')[:10]
+        # Nearest entries/chunks by embedding, grouped per document (best match first)
+        hits = get_vector_index().search(query, limit=50)
+        if hits is None:
+            # No embeddings available: text search
+            documents = AIDocument.objects.filter(
+                Q(title__icontains=query) | 
+                Q(description__icontains=query) |
+                Q(extracted_text__icontains=query)
+            ).select_related('category', 'uploaded_by').defer('extracted_text')[:10]
+            matches = {}
+        else:
+            embeddings = KnowledgeEmbedding.objects.defer('vector').in_bulk([embedding_id for embedding_id, _ in hits])
+            matches = {}
+            for embedding_id, score in hits:
+                embedding = embeddings.get(embedding_id)
+                if embedding and embedding.document_id not in matches:
+                    matches[embedding.document_id] = (score, embedding)
+                if len(matches) == 10:
+                    break
+            document_map = AIDocument.objects.select_related('category', 'uploaded_by').defer(
+                'extracted_text').in_bulk(list(matches))
+            documents = [document_map[doc_id] for doc_id in matches if doc_id in document_map]
         
         results = []
         for doc in documents:
-            results.append({
+            result = {
                 'id': doc.id,
                 'title': doc.title,
                 'description': doc.description,
@@ -1009,7 +1023,15 @@ def api_search_semantic(request):
                 'uploaded_by': doc.uploaded_by.username if doc.uploaded_by else None,
                 'created_at': doc.created_at.isoformat(),
                 'status': doc.status
-            })
+            }
+            if doc.id in matches:
+                score, embedding = matches[doc.id]
+                result.update({
+                    'score': round(score, 4),
+                    'match': embedding.text[:300],
+                    'entry_id': embedding.entry_id,
+                })
+            results.append(result)
         
         return JsonResponse({
             'results': results,
@@ -1050,65 +1072,29 @@ def api_document_status(request, document_id):
 @admin_manager_required
 def api_dashboard_stats(request):
     """API endpoint for dashboard statistics"""
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    stats = {
-        'total_documents': AIDocument.objects.count(),
-        'processed_documents': AIDocument.objects.filter(status='processed').count(),
-        'pending_documents': AIDocument.objects.filter(status='pending').count(),
-        'processing_documents': AIDocument.objects.filter(status='processing').count(),
-        'failed_documents': AIDocument.objects.filter(status='failed').count(),
-        'approved_documents': AIDocument.objects.filter(status='approved').count(),
-        'total_training_data': TrainingData.objects.count(),
-        'total_intents': AIIntent.objects.count(),
-        'total_knowledge_entries': KnowledgeBaseEntry.objects.count(),
-        'recent_logs_count': DocumentProcessingLog.objects.filter(
-            created_at__gte=timezone.now() - timedelta(hours=24)
-        ).count(),
-        'error_logs_count': DocumentProcessingLog.objects.filter(
-            level='error',
-            created_at__gte=timezone.now() - timedelta(hours=24)
-        ).count()
-    }
+    counters = get_progress_broker().snapshot()['counters']
+    stats = {key: counters[key] for key in (
+        'total_documents', 'processed_documents', 'pending_documents', 'processing_documents', 'failed_documents',
+        'approved_documents', 'total_training_data', 'total_intents', 'total_knowledge_entries',
+        'recent_logs_count', 'error_logs_count',
+    )}
     
     return JsonResponse(stats)
 
 @admin_manager_required
 def api_processing_queue(request):
     """API endpoint for processing queue status"""
-    from django.utils import timezone
-    from datetime import timedelta
-    
     try:
+        snapshot = get_progress_broker().snapshot()
+        counters = snapshot['counters']
         queue_data = {
-            'pending': AIDocument.objects.filter(status='pending').count(),
-            'processing': AIDocument.objects.filter(status='processing').count(),
-            'failed': AIDocument.objects.filter(status='failed').count(),
-            'recent_completed': AIDocument.objects.filter(
-                status='processed',
-                updated_at__gte=timezone.now() - timedelta(hours=1)
-            ).count()
+            'pending': counters['pending_documents'],
+            'processing': counters['processing_documents'],
+            'failed': counters['failed_documents'],
+            'recent_completed': counters['recent_completed'],
+            'recent_activities': snapshot['recent_activities'],
         }
         
-        # Get recent processing activities
-        recent_activities = DocumentProcessingLog.objects.select_related('document').filter(
-            created_at__gte=timezone.now() - timedelta(minutes=30)
-        ).order_by('-created_at')[:10]
-        
-        activities = []
-        for log in recent_activities:
-            activities.append({
-                'document_id': log.document.id,
-                'document_title': log.document.title,
-                'step': log.processing_step,
-                'level': log.level,
-                'message': log.message,
-                'timestamp': log.created_at.isoformat()
-            })
-        
-        queue_data['recent_activities'] = activities
-        
         return JsonResponse(queue_data)
         
     except Exception as e:
@@ -1120,22 +1106,18 @@ def api_system_health(request):
     """API endpoint for system health monitoring"""
     try:
         # Calculate system health metrics
-        total_docs = AIDocument.objects.count()
-        processed_docs = AIDocument.objects.filter(status='processed').count()
-        failed_docs = AIDocument.objects.filter(status='failed').count()
+        broker = get_progress_broker()
+        counters = broker.snapshot()['counters']
+        total_docs = counters['total_documents']
+        processed_docs = counters['processed_documents']
+        failed_docs = counters['failed_documents']
         
         # Processing success rate
         success_rate = (processed_docs / total_docs * 100) if total_docs > 0 else 100
         
         # Recent error rate (last 24 hours)
-        recent_errors = DocumentProcessingLog.objects.filter(
-            level='error',
-            created_at__gte=timezone.now() - timedelta(hours=24)
-        ).count()
-        
-        recent_total = DocumentProcessingLog.objects.filter(
-            created_at__gte=timezone.now() - timedelta(hours=24)
-        ).count()
+        recent_errors = counters['error_logs_count']
+        recent_total = counters['recent_logs_count']
         
         error_rate = (recent_errors / recent_total * 100) if recent_total > 0 else 0
         
@@ -1156,8 +1138,10 @@ def api_system_health(request):
             'total_documents': total_docs,
             'processed_documents': processed_docs,
             'failed_documents': failed_docs,
-            'pending_documents': AIDocument.objects.filter(status='pending').count(),
-            'processing_documents': AIDocument.objects.filter(status='processing').count(),
+            'pending_documents': counters['pending_documents'],
+            'processing_documents': counters['processing_documents'],
+            'task_queue': task_queue_stats(),
+            'progress_broker': broker.stats(),
             'last_updated': timezone.now().isoformat()
         }
         
@@ -1276,23 +1260,21 @@ def api_train_intent(request):
         if not training_data.exists():
             return JsonResponse({'error': 'No training data found for this intent'}, status=400)
         
-        # Start training process for related training data
-        from .tasks import start_training_process
+        # Train once for all related training data
+        from .task_queue import delay
+        from .tasks import batch_training_process
         
-        for td in training_data:
-            # Update training status
-            td.training_progress = 1
-            td.training_stage = 'initializing'
-            td.training_started_at = timezone.now()
-            td.save()
-            
-            # Start async training
-            start_training_process.delay(td.id)
+        ids = list(training_data.values_list('id', flat=True))
+        TrainingData.objects.filter(id__in=ids).update(
+            training_progress=1, training_stage='initializing', training_started_at=timezone.now()
+        )
+        publish('training', ids=ids, progress=1, stage='initializing')
+        delay(batch_training_process, ids, request.user.id)
         
         return JsonResponse({
             'success': True,
-            'message': f'Training started for {training_data.count()} training data items',
-            'training_count': training_data.count()
+            'message': f'Training started for {len(ids)} training data items',
+            'training_count': len(ids)
         })
         
     except Exception as e:
@@ -1313,19 +1295,17 @@ def api_start_training(request):
         if not pending_training.exists():
             return JsonResponse({'error': 'No pending training data found'}, status=400)
         
-        from .tasks import start_training_process
+        from .task_queue import delay
+        from .tasks import batch_training_process
         
-        started_count = 0
-        for td in pending_training:
-            # Update training status
-            td.training_progress = 1
-            td.training_stage = 'initializing'
-            td.training_started_at = timezone.now()
-            td.save()
-            
-            # Start async training
-            start_training_process.delay(td.id)
-            started_count += 1
+        # One training run covers every pending item
+        ids = list(pending_training.values_list('id', flat=True))
+        TrainingData.objects.filter(id__in=ids).update(
+            training_progress=1, training_stage='initializing', training_started_at=timezone.now()
+        )
+        publish('training', ids=ids, progress=1, stage='initializing')
+        delay(batch_training_process, ids, request.user.id)
+        started_count = len(ids)
         
         return JsonResponse({
             'success': True,
@@ -1350,16 +1330,17 @@ def api_start_training_data(request, data_id):
         if training_data.training_progress == 100:
             return JsonResponse({'error': 'Training already completed'}, status=400)
         
-        from .tasks import start_training_process
+        from .task_queue import delay
+        from .tasks import batch_training_process
         
         # Update training status
         training_data.training_progress = 1
         training_data.training_stage = 'initializing'
         training_data.training_started_at = timezone.now()
-        training_data.save()
+        training_data.save(update_fields=['training_progress', 'training_stage', 'training_started_at', 'updated_at'])
         
         # Start async training
-        start_training_process.delay(training_data.id)
+        delay(batch_training_process, [training_data.id], request.user.id)
         
         return JsonResponse({
             'success': True,
@@ -1620,24 +1601,35 @@ def bulk_reprocess_documents(request):
             return JsonResponse({'error': 'No documents selected'}, status=400)
         
         documents = AIDocument.objects.filter(id__in=document_ids)
-        reprocessed_count = 0
-        
-        for document in documents:
-            # Reset status
-            document.status = 'pending'
-            document.save()
-            
-            # Log the reprocessing
-            DocumentProcessingLog.objects.create(
-                document=document,
+        ids = list(documents.values_list('id', flat=True))
+        
+        # Reset status and log the reprocessing for all documents at once
+        documents.update(status='pending', processing_progress=0, processing_stage='', updated_at=timezone.now())
+        publish_many(('document', {'id': document_id, 'status': 'pending', 'progress': 0, 'stage': ''})
+                     for document_id in ids)
+        DocumentProcessingLog.objects.bulk_create([
+            DocumentProcessingLog(
+                document_id=document_id,
                 level='info',
                 message=f'Reprocessing requested by {request.user.username} (bulk operation)',
                 processing_step='reprocess_requested'
             )
+            for document_id in ids
+        ])
+        
+        # Queue every document in one go; the tasks cap how many are processed concurrently
+        try:
+            from .tasks import enqueue_documents
             
-            # Start processing
-            process_document_async(document.id)
-            reprocessed_count += 1
+            enqueue_documents(ids)
+        except Exception as e:
+            logger.error(f'Error queueing bulk reprocessing: {e}')
+            AIDocument.objects.filter(id__in=ids).update(
+                status='error', processing_notes=f'Failed to start processing: {str(e)}'
+            )
+            publish_many(('document', {'id': document_id, 'status': 'error'}) for document_id in ids)
+            return JsonResponse({'error': 'Bulk reprocessing failed'}, status=500)
+        reprocessed_count = len(ids)
         
         return JsonResponse({
             'success': True,
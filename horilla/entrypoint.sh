@@ -5,4 +5,9 @@ python3 manage.py makemigrations
 python3 manage.py migrate
 python3 manage.py collectstatic --noinput
 python3 manage.py createhorillauser --first_name admin --last_name admin --username admin --password admin --email admin@example.com --phone 1234567890
-gunicorn --bind 0.0.0.0:8000 horilla.wsgi:application
+# Serves the AI Knowledge task queue when no Celery broker is reachable; the web
+# workers only queue work (AI_KNOWLEDGE_LOCAL_AUTOSTART is off)
+python3 manage.py run_local_tasks &
+# Threaded workers: the AI Knowledge dashboards long-poll progress updates (up to
+# AI_KNOWLEDGE_PROGRESS_WAIT_SECONDS), which must not occupy the only worker
+gunicorn --bind 0.0.0.0:8000 --worker-class gthread --workers 2 --threads 8 horilla.wsgi:application
@@ -29,6 +29,8 @@ AUDITLOG_INCLUDE_ALL_MODELS = True
 AUDITLOG_EXCLUDE_TRACKING_MODELS = (
     # "<app_name>",
     # "<app_name>.<model>"
+    "ai_knowledge.knowledgeembedding",  # raw float32 vectors, not text
+    "ai_knowledge.progressevent",  # dashboard progress notifications, pruned with the processing logs
 )
 
 setattr(settings, "AUDITLOG_INCLUDE_ALL_MODELS", AUDITLOG_INCLUDE_ALL_MODELS)
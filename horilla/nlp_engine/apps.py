@@ -17,15 +17,22 @@ class NlpEngineConfig(AppConfig):
         except ImportError:
             pass
         
-        # Initialize NLP models and dependencies
-        self._initialize_nlp_dependencies()
+        # Register ai_knowledge signals that keep the chatbot knowledge index in sync
+        from . import knowledge_index  # noqa: F401
+        
+        # NLP models and knowledge corpora load lazily on first use; set
+        # NLP_ENGINE_PRELOAD = True to pay that cost at worker boot instead
+        from django.conf import settings
+        if getattr(settings, 'NLP_ENGINE_PRELOAD', False):
+            self._initialize_nlp_dependencies()
     
     def _initialize_nlp_dependencies(self):
-        """Initialize NLP dependencies and models"""
+        """Initialize NLP dependencies, models and knowledge corpora"""
         try:
-            # Import and initialize the text analyzer to load models
-            from .text_analyzer import TextAnalyzer
-            analyzer = TextAnalyzer()
+            from .corpora import CORPORA, get_corpus, get_text_analyzer
+            analyzer = get_text_analyzer()
+            for spec in CORPORA.values():
+                get_corpus(spec)
             print(f"NLP Engine initialized with analyzer: {analyzer}")
         except Exception as e:
             print(f"Warning: Could not initialize NLP models: {e}")
@@ -0,0 +1,141 @@
+"""
+Parallel batch analysis for NLPService.batch_process_texts.
+
+CPU-bound analysis (language detection, preprocessing, VADER/TextBlob, spaCy ``nlp.pipe``) runs
+in chunks on a process pool whose workers load the model pool at start and keep it warm between
+batches. Optional LLM analysis runs at the same time on a bounded thread pool. Chunks are yielded
+as they complete, so the caller can write them in fixed-size batches while the rest is still
+being analyzed.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .corpora import get_text_analyzer
+
+logger = logging.getLogger(__name__)
+
+BATCH_WORKERS = getattr(settings, 'NLP_BATCH_WORKERS', min(4, os.cpu_count() or 1))
+BATCH_CHUNK_SIZE = getattr(settings, 'NLP_BATCH_CHUNK_SIZE', 16)
+BATCH_LLM_CONCURRENCY = getattr(settings, 'NLP_BATCH_LLM_CONCURRENCY', 4)
+BATCH_WRITE_SIZE = getattr(settings, 'NLP_BATCH_WRITE_SIZE', 100)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    # Workers started with spawn/forkserver import the project from scratch
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    from .model_pool import get_model_pool
+
+    get_model_pool().warm_up()
+
+
+def _analyze_chunk(texts: List[str], config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return get_text_analyzer().analyze_many(texts, config, n_process=1)
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Process-wide analysis pool, or None when NLP_BATCH_WORKERS <= 1"""
+    global _process_pool
+    if BATCH_WORKERS <= 1:
+        return None
+    if _process_pool is None:
+        with _pool_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, initializer=_init_worker)
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    with _pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_chunks(texts: Sequence[str], chunks: List[List[int]],
+                config: Dict[str, Any]) -> Iterator[Tuple[List[int], List[Dict[str, Any]]]]:
+    pool = get_process_pool() if len(chunks) > 1 else None
+    pending = list(chunks)
+    if pool is not None:
+        futures = {pool.submit(_analyze_chunk, [texts[i] for i in chunk], config): chunk for chunk in chunks}
+        try:
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    logger.error(f"NLP batch chunk failed in worker, retrying in-process: {e}")
+                    continue
+                pending.remove(chunk)
+                yield chunk, results
+        except BrokenProcessPool:
+            # A worker died (OOM, killed); finish the batch in this process
+            logger.error("NLP batch process pool broke, analyzing the remaining chunks in-process")
+            shutdown_process_pool()
+    for chunk in pending:
+        yield chunk, _analyze_chunk([texts[i] for i in chunk], config)
+
+
+def iter_analyzed_chunks(texts: Sequence[str], config: Optional[Dict[str, Any]] = None,
+                         use_ollama: bool = False, possible_intents: Optional[List[str]] = None,
+                         chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[List[Tuple[int, Dict[str, Any]]]]:
+    """
+    Analyze texts in parallel, yielding ``[(index, result), ...]`` per chunk as chunks complete.
+
+    With ``use_ollama`` every text also gets one combined Ollama analysis, at most
+    NLP_BATCH_LLM_CONCURRENCY in flight; its output is added as ``ollama_intent``,
+    ``ollama_sentiment`` and ``ollama_entities`` like ``TextAnalyzer.analyze_text`` does.
+    """
+    config = config or {}
+    chunk_size = max(1, chunk_size)
+    chunks = [list(range(start, min(start + chunk_size, len(texts))))
+              for start in range(0, len(texts), chunk_size)]
+
+    llm_pool = None
+    llm_futures = {}
+    if use_ollama:
+        from .ollama_service import get_ollama_service
+        from .text_analyzer import HR_INTENTS
+
+        service = get_ollama_service()
+        if service.is_available():
+            llm_pool = ThreadPoolExecutor(max_workers=BATCH_LLM_CONCURRENCY, thread_name_prefix='nlp-batch-llm')
+            llm_futures = {
+                i: llm_pool.submit(service.analyze_text_with_ollama, texts[i], possible_intents or HR_INTENTS)
+                for i in range(len(texts))
+            }
+
+    try:
+        for chunk, results in _run_chunks(texts, chunks, config):
+            for i, result in zip(chunk, results):
+                if i not in llm_futures:
+                    continue
+                try:
+                    ollama_result = llm_futures[i].result() or {}
+                except Exception as e:
+                    logger.error(f"Ollama batch analysis failed: {e}")
+                    continue
+                for key in ('intent', 'sentiment', 'entities'):
+                    if ollama_result.get(key) is not None:
+                        result[f'ollama_{key}'] = ollama_result[key]
+            yield list(zip(chunk, results))
+    finally:
+        if llm_pool is not None:
+            llm_pool.shutdown(wait=False, cancel_futures=True)
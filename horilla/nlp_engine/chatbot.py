@@ -1,9 +1,13 @@
 import json
 import logging
+import time
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db.models import Q, Count
 from django.utils import timezone
 
@@ -15,10 +19,18 @@ except ImportError:
     # Handle case where recruitment app is not installed
     Recruitment = None
     Candidate = None
-from .text_analyzer import TextAnalyzer
-from .models import TextAnalysisResult
-from .knowledge_base import HRKnowledgeBase
+from .corpora import CORPORA, SharedCorpus, get_text_analyzer
+from .knowledge_index import get_knowledge_index
 from .response_variations import ResponseVariations
+from .intent_matcher import IntentMatcher
+from .circuit_breaker import has_budget, latency_budget
+from .write_behind import TEXT_ANALYSIS, get_write_behind_queue
+
+# Intent classifier trained from approved AI Knowledge examples
+try:
+    from ai_knowledge.intent_model import get_intent_classifier
+except ImportError:
+    get_intent_classifier = None
 
 # Ollama Integration
 try:
@@ -27,22 +39,20 @@ try:
 except ImportError:
     OLLAMA_AVAILABLE = False
     logging.warning("Ollama service not available for chatbot enhancement.")
-from .training_data import HRTrainingData
-from .extended_faq_data import ExtendedFAQData
-from .conversation_examples import ConversationExamples
-from .hr_domain_data import HRDomainData
-from .industry_best_practices import IndustryBestPractices
-from .compliance_regulatory_data import ComplianceRegulatoryData
-from .employee_lifecycle_data import EmployeeLifecycleData
-from .advanced_hr_scenarios import AdvancedHRScenarios
-from .multilingual_hr_data import MultilingualHRData
-from .industry_specific_data import IndustrySpecificData
-from .hr_analytics_data import HRAnalyticsData
-from .hr_technology_data import HRTechnologyData
-from .hr_metrics_kpi_data import HRMetricsKPIData
 
 logger = logging.getLogger(__name__)
 
+# Total seconds the LLM calls of one chat message may take before falling back to keywords/knowledge
+LLM_BUDGET_SECONDS = getattr(settings, 'NLP_CHATBOT_LLM_BUDGET', 8.0)
+# Seconds a user's name/role/employee lookup is reused (in the session, or the cache without one)
+USER_CONTEXT_TTL = getattr(settings, 'NLP_CHATBOT_CONTEXT_TTL', 900)
+# Record every message as a 'chatbot' TextAnalysisResult (written behind, see write_behind.py)
+LOG_INTERACTIONS = getattr(settings, 'NLP_CHATBOT_LOG_INTERACTIONS', True)
+USER_CONTEXT_KEY = 'nlp_chatbot_user_context'
+
+# Cached user context of the message being processed
+_current_user_context: ContextVar[Optional[Dict[str, Any]]] = ContextVar('chatbot_user_context', default=None)
+
 class HRChatbot:
     """
     AI Chatbot untuk sistem HR dengan kemampuan:
@@ -51,9 +61,23 @@ class HRChatbot:
     3. Menampilkan jumlah pelamar (admin only)
     """
     
+    # Knowledge corpora: imported on first use and shared by the whole process (see corpora.py)
+    knowledge_base = SharedCorpus(CORPORA['knowledge_base'])
+    training_data = SharedCorpus(CORPORA['training_data'])
+    extended_faq = SharedCorpus(CORPORA['extended_faq'])
+    conversation_examples = SharedCorpus(CORPORA['conversation_examples'])
+    hr_domain_data = SharedCorpus(CORPORA['hr_domain_data'])
+    industry_best_practices = SharedCorpus(CORPORA['industry_best_practices'])
+    compliance_data = SharedCorpus(CORPORA['compliance_data'])
+    lifecycle_data = SharedCorpus(CORPORA['lifecycle_data'])
+    advanced_scenarios = SharedCorpus(CORPORA['advanced_scenarios'])
+    multilingual_data = SharedCorpus(CORPORA['multilingual_data'])
+    industry_data = SharedCorpus(CORPORA['industry_data'])
+    analytics_data = SharedCorpus(CORPORA['analytics_data'])
+    technology_data = SharedCorpus(CORPORA['technology_data'])
+    metrics_data = SharedCorpus(CORPORA['metrics_data'])
+    
     def __init__(self):
-        self.text_analyzer = TextAnalyzer()
-        self.knowledge_base = HRKnowledgeBase()
         self.response_variations = ResponseVariations()
         
         # Initialize Ollama service if available
@@ -66,20 +90,6 @@ class HRChatbot:
                 logger.warning(f"Failed to initialize Ollama service: {e}")
                 self.ollama_service = None
         
-        # Initialize comprehensive data sources
-        self.training_data = HRTrainingData()
-        self.extended_faq = ExtendedFAQData()
-        self.conversation_examples = ConversationExamples()
-        self.hr_domain_data = HRDomainData()
-        self.industry_best_practices = IndustryBestPractices()
-        self.compliance_data = ComplianceRegulatoryData()
-        self.lifecycle_data = EmployeeLifecycleData()
-        self.advanced_scenarios = AdvancedHRScenarios()
-        self.multilingual_data = MultilingualHRData()
-        self.industry_data = IndustrySpecificData()
-        self.analytics_data = HRAnalyticsData()
-        self.technology_data = HRTechnologyData()
-        self.metrics_data = HRMetricsKPIData()
         self.intents = {
             # Leave Balance - Expanded keywords
             'leave_balance': [
@@ -207,22 +217,103 @@ class HRChatbot:
                 'option', 'pilihan', 'support', 'dukungan'
             ]
         }
+        self.intent_matcher = IntentMatcher(self.intents)
     
-    def process_message(self, message: str, user: User) -> Dict[str, Any]:
+    @property
+    def text_analyzer(self):
+        """Shared TextAnalyzer, created on first use"""
+        return get_text_analyzer()
+    
+    def process_message(self, message: str, user: User, session=None) -> Dict[str, Any]:
         """
         Memproses pesan dari user dan memberikan respons yang sesuai
+        
+        ``session`` (request.session) keeps the user's context for the session; the
+        interaction itself is recorded by the write-behind queue, outside the request.
         """
         try:
-            # Analisis intent dari pesan
-            intent = self._detect_intent(message.lower())
-            
-            # Get user context for personalization
-            employee = Employee.objects.filter(employee_user_id=user).first()
-            user_context = {
+            cached = self._get_user_context(user, session)
+        except Exception as e:
+            # Like any other failure while answering: degrade, don't fail the request
+            logger.error(f"Chatbot user context lookup failed: {e}")
+            cached = self._fallback_user_context(user)
+        token = _current_user_context.set(cached)
+        try:
+            with latency_budget(LLM_BUDGET_SECONDS):
+                response = self._process_message(message, user, dict(cached['context']))
+        finally:
+            _current_user_context.reset(token)
+        
+        if LOG_INTERACTIONS:
+            self._log_interaction(message, user, cached, response)
+        return response
+    
+    def _get_user_context(self, user: User, session=None) -> Dict[str, Any]:
+        """
+        Name, role and badge of the user, looked up once per USER_CONTEXT_TTL seconds
+        """
+        key = f'{USER_CONTEXT_KEY}:{user.pk}'
+        cached = session.get(USER_CONTEXT_KEY) if session is not None else cache.get(key)
+        if cached and cached.get('user_id') == user.pk and cached.get('expires', 0) > time.time():
+            return cached
+        
+        employee = Employee.objects.filter(employee_user_id=user).first()
+        cached = {
+            'user_id': user.pk,
+            'employee_pk': employee.pk if employee else None,
+            'expires': time.time() + USER_CONTEXT_TTL,
+            'context': {
                 'name': employee.get_full_name() if employee else user.get_full_name() or user.username,
                 'role': 'admin' if user.is_superuser else ('hr' if user.groups.filter(name='HR').exists() else 'employee'),
                 'employee_id': employee.badge_id if employee else None
             }
+        }
+        if session is not None:
+            session[USER_CONTEXT_KEY] = cached
+        else:
+            cache.set(key, cached, USER_CONTEXT_TTL)
+        return cached
+    
+    def _fallback_user_context(self, user: User) -> Dict[str, Any]:
+        """Context built without queries, not cached (used when the lookup fails)"""
+        return {
+            'user_id': user.pk,
+            'employee_pk': None,
+            'expires': 0,
+            'context': {
+                'name': user.get_full_name() or user.username,
+                'role': 'admin' if user.is_superuser else 'employee',
+                'employee_id': None
+            }
+        }
+    
+    def _display_name(self, user: User) -> str:
+        """Name to greet the user with (from the cached context of the current message)"""
+        cached = _current_user_context.get()
+        if cached and cached.get('user_id') == user.pk:
+            return cached['context']['name']
+        employee = Employee.objects.filter(employee_user_id=user).first()
+        return employee.get_full_name() if employee else user.get_full_name() or user.username
+    
+    def _log_interaction(self, message: str, user: User, cached: Dict[str, Any], response: Dict[str, Any]):
+        get_write_behind_queue().put(TEXT_ANALYSIS, {
+            'text_content': message,
+            'source_type': 'chatbot',
+            'source_id': f'user_{user.id}',
+            'analyzed_by': user.pk,
+            'employee': cached['employee_pk'],
+            'sentiment': 'neutral',
+            'metadata': {
+                'intent': (response or {}).get('intent', 'unknown'),
+                'success': bool((response or {}).get('success')),
+                'response_preview': str((response or {}).get('response', ''))[:200]
+            }
+        })
+    
+    def _process_message(self, message: str, user: User, user_context: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            # Analisis intent dari pesan
+            intent = self._detect_intent(message.lower())
             
             # Proses berdasarkan intent
             response = None
@@ -282,26 +373,14 @@ class HRChatbot:
         """
         Mendeteksi intent dari pesan user dengan Ollama enhancement
         """
-        message_lower = message.lower()
-        
         # First try keyword-based detection with priority scoring
-        intent_scores = {}
-        for intent, keywords in self.intents.items():
-            score = 0
-            for keyword in keywords:
-                if keyword in message_lower:
-                    # Give higher score for longer, more specific keywords
-                    score += len(keyword.split())
-            if score > 0:
-                intent_scores[intent] = score
-        
-        # Return the intent with highest score
-        if intent_scores:
-            best_intent = max(intent_scores, key=intent_scores.get)
+        # (longer, more specific keywords score higher; see IntentMatcher)
+        best_intent = self.intent_matcher.best(message)
+        if best_intent:
             return best_intent
         
         # If Ollama is available, use it for enhanced intent detection
-        if self.ollama_service:
+        if self._llm_ready():
             try:
                 ollama_intent = self._detect_intent_with_ollama(message)
                 if ollama_intent and ollama_intent in self.intents:
@@ -528,8 +607,7 @@ class HRChatbot:
         Menangani sapaan dari user dengan variasi respons
         """
         try:
-            employee = Employee.objects.filter(employee_user_id=user).first()
-            name = employee.get_full_name() if employee else user.get_full_name() or user.username
+            name = self._display_name(user)
             
             # Get contextual greeting based on time
             greeting = self.response_variations.get_greeting(name)
@@ -978,11 +1056,25 @@ class HRChatbot:
         Menangani pesan yang tidak dikenali dengan comprehensive knowledge search dan Ollama
         """
         try:
-            employee = Employee.objects.filter(employee_user_id=user).first()
-            name = employee.get_full_name() if employee else user.get_full_name() or user.username
+            name = self._display_name(user)
             
-            # Try Ollama for intelligent response generation first
-            if self.ollama_service:
+            # The trained intent classifier answers in a few milliseconds, so it goes before any LLM call
+            trained = self._predict_trained_intent(message)
+            if trained:
+                return {
+                    'success': True,
+                    'intent': 'trained_intent',
+                    'response': f'Halo {name}! {trained["response"]}',
+                    'data': {
+                        'trained_intent': trained['intent'],
+                        'confidence': trained['confidence'],
+                        'source': 'intent_model'
+                    },
+                    'follow_up': self.response_variations.get_transition('additional_help')
+                }
+            
+            # Try Ollama for intelligent response generation next
+            if self._llm_ready():
                 try:
                     ollama_response = self._generate_ollama_response(message, user)
                     if ollama_response and ollama_response.get('success'):
@@ -990,47 +1082,13 @@ class HRChatbot:
                 except Exception as e:
                     logger.warning(f"Ollama response generation failed: {e}")
             
-            # Multi-layer search approach with AI Knowledge prioritized
+            # Single BM25 query over AI Knowledge, FAQs and the HR corpora
+            # (AI Knowledge sources are boosted, see knowledge_index.SOURCE_BOOST)
             search_results = []
-            
-            # 1. Search AI Knowledge first (highest priority)
             try:
-                ai_knowledge_results = self.knowledge_base.search_faq(message)
-                if ai_knowledge_results:
-                    # Filter and prioritize AI Knowledge results
-                    ai_results = [r for r in ai_knowledge_results if r.get('source') == 'ai_knowledge']
-                    if ai_results:
-                        search_results.extend(ai_results[:2])
-                    # Add other high-quality results
-                    other_results = [r for r in ai_knowledge_results if r.get('source') != 'ai_knowledge']
-                    search_results.extend(other_results[:2])
+                search_results = get_knowledge_index().search(message, limit=10)
             except Exception as e:
-                logger.warning(f"AI Knowledge search failed: {e}")
-            
-            # 2. Search extended FAQ data
-            extended_faq_results = self.extended_faq.search_faq(message)
-            if extended_faq_results:
-                search_results.extend(extended_faq_results[:2])
-            
-            # 3. Search HR domain data
-            domain_results = self.hr_domain_data.search_domain_data(message)
-            if domain_results:
-                search_results.extend(domain_results[:2])
-            
-            # 4. Search compliance and regulatory data
-            compliance_results = self.compliance_data.search_compliance_data(message)
-            if compliance_results:
-                search_results.extend(compliance_results[:2])
-            
-            # 5. Search industry best practices
-            best_practices = self.industry_best_practices.search_best_practices(message)
-            if best_practices:
-                search_results.extend(best_practices[:2])
-            
-            # 6. Search advanced scenarios
-            scenario_results = self.advanced_scenarios.search_scenario(message)
-            if scenario_results:
-                search_results.extend(scenario_results[:1])
+                logger.warning(f"Knowledge index search failed: {e}")
             
             # Process search results
             if search_results:
@@ -1082,14 +1140,16 @@ class HRChatbot:
             # No specific results found, provide intelligent suggestions
             suggestions = self._generate_intelligent_suggestions(message)
             
-            # Simpan pesan yang tidak dikenali untuk analisis
-            TextAnalysisResult.objects.create(
-                text_content=message,
-                source_type='general',
-                source_id=f'user_{user.id}',
-                analyzed_by=user,
-                sentiment='neutral'
-            )
+            # Simpan pesan yang tidak dikenali untuk analisis (written behind the request). With
+            # LOG_INTERACTIONS process_message already records it, with intent 'unknown'
+            if not LOG_INTERACTIONS:
+                get_write_behind_queue().put(TEXT_ANALYSIS, {
+                    'text_content': message,
+                    'source_type': 'general',
+                    'source_id': f'user_{user.id}',
+                    'analyzed_by': user.pk,
+                    'sentiment': 'neutral'
+                })
             
             apology = self.response_variations.get_apology('not_found')
             
@@ -1114,6 +1174,19 @@ class HRChatbot:
                 'response': self.response_variations.get_apology('error')
             }
     
+    def _predict_trained_intent(self, message: str) -> Optional[Dict[str, Any]]:
+        """Confident prediction of the active trained intent model that has a response, or None"""
+        if get_intent_classifier is None:
+            return None
+        try:
+            prediction = get_intent_classifier().predict(message)
+        except Exception as e:
+            logger.warning(f"Trained intent prediction failed: {e}")
+            return None
+        if prediction and prediction['confident'] and prediction['response']:
+            return prediction
+        return None
+    
     def _generate_intelligent_suggestions(self, message: str) -> List[str]:
         """
         Generate intelligent suggestions based on message content and available data
@@ -1150,6 +1223,10 @@ class HRChatbot:
         
         return suggestions[:5]  # Limit to 5 suggestions
     
+    def _llm_ready(self) -> bool:
+        """Ollama reachable, circuit breaker not open and latency budget left for this message"""
+        return bool(self.ollama_service) and has_budget(0.5) and self.ollama_service.is_available()
+    
     def _detect_intent_with_ollama(self, message: str) -> Optional[str]:
         """
         Use Ollama to detect intent from user message
@@ -1192,8 +1269,7 @@ Respond with only the intent name, nothing else. If no intent matches, respond w
             return None
         
         try:
-            employee = Employee.objects.filter(employee_user_id=user).first()
-            name = employee.get_full_name() if employee else user.get_full_name() or user.username
+            name = self._display_name(user)
             
             # Create context-aware prompt
             prompt = f"""
@@ -1242,7 +1318,7 @@ Provide a helpful, concise response (max 200 words) that addresses their questio
         """
         Enhance existing response with Ollama-generated additional context
         """
-        if not self.ollama_service or not response.get('success'):
+        if not self._llm_ready() or not response.get('success'):
             return response
         
         try:
@@ -0,0 +1,178 @@
+"""
+Circuit breaker and per-request latency budget for LLM calls.
+
+The breaker keeps a rolling window of the last calls; a failed call or one slower than
+``slow_call_seconds`` counts as an error. When the error ratio over at least ``min_calls`` calls
+reaches ``failure_ratio`` the breaker opens and calls are rejected without touching the network.
+After ``open_seconds`` it is half-open: a single probe call is let through and its outcome closes
+or re-opens the breaker. Breakers are process-wide, one per name, shared by every caller.
+
+A latency budget bounds the total time the LLM calls of one request may take (e.g. one chatbot
+message): ``OllamaService`` shortens its timeout to the remaining budget and skips the call once
+the budget is spent, so the caller falls back to its non-LLM path.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+BREAKER_WINDOW = getattr(settings, 'NLP_LLM_BREAKER_WINDOW', 20)
+BREAKER_MIN_CALLS = getattr(settings, 'NLP_LLM_BREAKER_MIN_CALLS', 5)
+BREAKER_FAILURE_RATIO = getattr(settings, 'NLP_LLM_BREAKER_FAILURE_RATIO', 0.5)
+BREAKER_SLOW_CALL_SECONDS = getattr(settings, 'NLP_LLM_BREAKER_SLOW_CALL_SECONDS', 15.0)
+BREAKER_OPEN_SECONDS = getattr(settings, 'NLP_LLM_BREAKER_OPEN_SECONDS', 30.0)
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker (closed -> open -> half-open -> closed)"""
+
+    def __init__(self, name: str, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_ratio: float = BREAKER_FAILURE_RATIO,
+                 slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+                 open_seconds: float = BREAKER_OPEN_SECONDS):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window)  # (ok, seconds)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_started = None
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_started = None
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (in half-open state only one probe at a time)"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and (self._probe_started is None
+                                       or now - self._probe_started >= self.open_seconds):
+                self._probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, seconds: float):
+        if seconds >= self.slow_call_seconds:
+            self.record_failure(seconds)
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._calls.clear()
+            self._calls.append((True, seconds))
+
+    def record_failure(self, seconds: Optional[float] = None):
+        now = time.monotonic()
+        with self._lock:
+            if self._current_state(now) == HALF_OPEN:
+                self._trip(now)
+                return
+            self._calls.append((False, seconds))
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            if len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_ratio:
+                self._trip(now)
+
+    def release(self):
+        """Call ended without a verdict (e.g. cut short by the latency budget)"""
+        with self._lock:
+            self._probe_started = None
+
+    def _trip(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self._calls.clear()
+        self.trips += 1
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._calls.clear()
+            self._probe_started = None
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            durations = sorted(seconds for _, seconds in self._calls if seconds is not None)
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            return {
+                'state': state,
+                'trips': self.trips,
+                'rejected_calls': self.rejected,
+                'window_calls': len(self._calls),
+                'window_failures': failures,
+                'p50_seconds': round(durations[len(durations) // 2], 3) if durations else None,
+                'p95_seconds': round(durations[int(len(durations) * 0.95)], 3) if durations else None,
+                'retry_in_seconds': round(max(0.0, self.open_seconds - (now - self._opened_at)), 1)
+                if state == OPEN else 0.0,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for a dependency name (e.g. 'ollama')"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.stats() for name, breaker in sorted(_breakers.items())}
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar('llm_deadline', default=None)
+
+
+@contextmanager
+def latency_budget(seconds: float):
+    """Limit the LLM time of the enclosed block (a nested budget never extends an outer one)"""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current latency budget, or None when no budget is active"""
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def has_budget(minimum: float = 0.0) -> bool:
+    remaining = remaining_budget()
+    return remaining is None or remaining > minimum
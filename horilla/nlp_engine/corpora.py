@@ -0,0 +1,73 @@
+"""
+Process-wide, lazily loaded knowledge corpora for the HR chatbot.
+
+The corpus modules (hr_domain_data, employee_lifecycle_data, ...) are large Python literal
+modules. They are only imported and instantiated the first time a corpus is used, and the
+instance is shared by every HRChatbot in the worker process.
+"""
+
+import importlib
+import threading
+from typing import Any, Dict
+
+# Attribute name on HRChatbot -> "module:ClassName" inside nlp_engine
+CORPORA = {
+    'training_data': 'training_data:HRTrainingData',
+    'extended_faq': 'extended_faq_data:ExtendedFAQData',
+    'conversation_examples': 'conversation_examples:ConversationExamples',
+    'hr_domain_data': 'hr_domain_data:HRDomainData',
+    'industry_best_practices': 'industry_best_practices:IndustryBestPractices',
+    'compliance_data': 'compliance_regulatory_data:ComplianceRegulatoryData',
+    'lifecycle_data': 'employee_lifecycle_data:EmployeeLifecycleData',
+    'advanced_scenarios': 'advanced_hr_scenarios:AdvancedHRScenarios',
+    'multilingual_data': 'multilingual_hr_data:MultilingualHRData',
+    'industry_data': 'industry_specific_data:IndustrySpecificData',
+    'analytics_data': 'hr_analytics_data:HRAnalyticsData',
+    'technology_data': 'hr_technology_data:HRTechnologyData',
+    'metrics_data': 'hr_metrics_kpi_data:HRMetricsKPIData',
+    'knowledge_base': 'knowledge_base:HRKnowledgeBase',
+}
+
+_instances: Dict[str, Any] = {}
+_lock = threading.RLock()
+
+
+def get_corpus(spec: str) -> Any:
+    """
+    Get the shared instance for a "module:ClassName" spec, importing it on first use
+    """
+    instance = _instances.get(spec)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(spec)
+            if instance is None:
+                module_name, class_name = spec.split(':')
+                module = importlib.import_module(f'{__package__}.{module_name}')
+                instance = _instances[spec] = getattr(module, class_name)()
+    return instance
+
+
+def get_text_analyzer():
+    """
+    Get the shared TextAnalyzer (NLTK data, VADER and the spaCy model load on first call)
+    """
+    return get_corpus('text_analyzer:TextAnalyzer')
+
+
+def loaded_corpora() -> list:
+    """Specs of the corpora loaded so far in this process"""
+    return sorted(_instances)
+
+
+class SharedCorpus:
+    """
+    Descriptor exposing a shared corpus as an instance attribute, loaded on first access
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return get_corpus(self.spec)
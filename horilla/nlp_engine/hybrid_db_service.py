@@ -16,6 +16,7 @@ from .models import (
 )
 from .mongodb_service import MongoDBService, get_mongodb_service
 from .mongodb_config import MongoDBConfig
+from .write_behind import PROCESSING_LOG, get_write_behind_queue
 
 logger = logging.getLogger(__name__)
 
@@ -182,6 +183,81 @@ class HybridDatabaseService:
             stats['errors'] = 1
             return stats
     
+    def bulk_create_text_analyses(self, analyses_data: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """
+        Bulk create text analyses together with their entities and intents.
+        
+        Args:
+            analyses_data: List of analysis data dictionaries (fields as for
+                create_text_analysis, plus 'entities' and 'intents' lists in the format of
+                create_entity_extraction / create_intent_classification)
+            
+        Returns:
+            list: Django model IDs in input order (None where no ID is available)
+        """
+        if not analyses_data:
+            return []
+        
+        batch_size = MongoDBConfig.get_batch_size()
+        with transaction.atomic():
+            created_objects = TextAnalysisResult.objects.bulk_create([
+                TextAnalysisResult(
+                    text_content=data.get('text_content', data.get('original_text', '')),
+                    processed_text=data.get('processed_text', ''),
+                    language_detected=(data.get('language_detected') or '')[:10],
+                    language_confidence=data.get('language_confidence'),
+                    sentiment=data.get('sentiment', 'neutral'),
+                    sentiment_confidence=data.get('sentiment_confidence'),
+                    sentiment_score=data.get('sentiment_score'),
+                    word_count=data.get('word_count'),
+                    sentence_count=data.get('sentence_count'),
+                    readability_score=data.get('readability_score'),
+                    source_type=data.get('source_type', 'general'),
+                    source_id=data.get('source_id', ''),
+                    analyzed_by_id=data.get('analyzed_by'),
+                    employee_id=data.get('employee_id', data.get('employee')),
+                    processing_time=data.get('processing_time'),
+                    configuration_used_id=data.get('configuration_used'),
+                    metadata=data.get('metadata') or {}
+                ) for data in analyses_data
+            ], batch_size=batch_size)
+            
+            entity_objects = []
+            intent_objects = []
+            for obj, data in zip(created_objects, analyses_data):
+                if obj.pk is None:
+                    continue
+                for entity_data in data.get('entities') or []:
+                    entity_objects.append(EntityExtraction(
+                        analysis_result_id=obj.pk,
+                        entity_text=str(entity_data.get('text', ''))[:200],
+                        entity_type=entity_data.get('type', 'OTHER'),
+                        confidence_score=entity_data.get('confidence'),
+                        start_position=entity_data.get('start', 0),
+                        end_position=entity_data.get('end', 0)
+                    ))
+                for intent_data in data.get('intents') or []:
+                    intent_objects.append(IntentClassification(
+                        analysis_result_id=obj.pk,
+                        intent_type=intent_data.get('intent', 'other'),
+                        confidence_score=intent_data.get('confidence', 0.0)
+                    ))
+            EntityExtraction.objects.bulk_create(entity_objects, batch_size=batch_size)
+            IntentClassification.objects.bulk_create(intent_objects, batch_size=batch_size)
+        
+        if self.use_mongodb and self.sync_enabled:
+            try:
+                self.mongodb_service.bulk_insert_analyses([
+                    self._convert_django_to_mongo(obj, data)
+                    for obj, data in zip(created_objects, analyses_data)
+                ])
+            except Exception as e:
+                logger.error(f"MongoDB bulk sync failed: {e}")
+        
+        logger.info(f"Bulk created {len(created_objects)} text analyses "
+                    f"({len(entity_objects)} entities, {len(intent_objects)} intents)")
+        return [obj.pk for obj in created_objects]
+    
     def get_analysis_by_id(self, analysis_id: int, use_mongodb: bool = False) -> Optional[Dict[str, Any]]:
         """
         Get text analysis by ID from Django or MongoDB.
@@ -433,6 +509,9 @@ class HybridDatabaseService:
         """
         Log processing activity.
         
+        The log row is queued and bulk-inserted by the write-behind flusher
+        (see write_behind.py), so callers do not wait for the write.
+        
         Args:
             level: Log level (INFO, WARNING, ERROR)
             message: Log message
@@ -440,20 +519,14 @@ class HybridDatabaseService:
             metadata: Additional metadata
             
         Returns:
-            bool: True if logged successfully
-        """
-        try:
-            NLPProcessingLog.objects.create(
-                level=level,
-                message=message,
-                source_type=source_type,
-                extra_data=metadata or {}
-            )
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error logging processing activity: {e}")
-            return False
+            bool: True if queued (False when dropped because the queue is full)
+        """
+        return get_write_behind_queue().put(PROCESSING_LOG, {
+            'level': level,
+            'message': message,
+            'source_type': source_type,
+            'extra_data': metadata or {}
+        })
     
     def cleanup_old_data(self, days_old: int = 90) -> Dict[str, int]:
         """
@@ -4,7 +4,7 @@ from django.conf import settings
 import logging
 
 from .models import TextAnalysisResult
-from .text_analyzer import TextAnalyzer
+from .corpora import get_text_analyzer
 from .hybrid_db_service import HybridDatabaseService
 
 # Import models that we want to integrate with NLP
@@ -28,9 +28,12 @@ class NLPIntegrationService:
     """
     
     def __init__(self):
-        self.analyzer = TextAnalyzer()
         self.db_service = HybridDatabaseService()
     
+    @property
+    def analyzer(self):
+        return get_text_analyzer()
+    
     def analyze_and_store(self, text_content, source_type, source_id, user_id=None):
         """
         Analyze text content and store results
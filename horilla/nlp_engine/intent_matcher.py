@@ -0,0 +1,72 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Enclitics/plural endings that should still match the bare keyword ("cutinya", "gajiku", "applicants")
+SUFFIXES = ('nya', 'lah', 'kah', 'ku', 'mu', 's')
+MIN_STEM = 3
+
+
+def _stem(word: str) -> Optional[str]:
+    if word.endswith(SUFFIXES):
+        for suffix in SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+                return word[:-len(suffix)]
+    return None
+
+
+class IntentMatcher:
+    """
+    Keyword intent matcher compiled once into a phrase table.
+
+    Keywords are matched on whole words (so "hi" no longer fires inside "hiring"). The message is
+    tokenized once and every word n-gram is looked up in the table, so all keywords, including
+    overlapping ones such as "cuti" and "sisa cuti", are found in a single pass. A prefix set stops
+    each n-gram walk as soon as no keyword can continue it. Each matched keyword adds its word
+    count to its intent's score, the same weighting the previous substring loop used.
+    """
+
+    def __init__(self, intents: Dict[str, Iterable[str]]):
+        self.intent_names: List[str] = list(intents)
+        self._phrases: Dict[str, List[Tuple[int, int, int]]] = {}
+        self._prefixes = set()
+        self.keyword_count = 0
+        for idx, keywords in enumerate(intents.values()):
+            for keyword in keywords:
+                words = _WORD_RE.findall(keyword.lower())
+                if not words:
+                    continue
+                for n in range(1, len(words)):
+                    self._prefixes.add(" ".join(words[:n]))
+                self._phrases.setdefault(" ".join(words), []).append(
+                    (self.keyword_count, idx, len(keyword.split())))
+                self.keyword_count += 1
+
+    def scores(self, message: str) -> Dict[str, int]:
+        """Return {intent: score} for intents with at least one keyword match"""
+        words = _WORD_RE.findall(message.lower())
+        stems = [_stem(word) for word in words]
+        phrases, prefixes = self._phrases, self._prefixes
+        matched = set()
+        for start in range(len(words)):
+            gram = ""
+            for word, stem in zip(words[start:], stems[start:]):
+                if stem and (gram + stem) in phrases:
+                    matched.update(phrases[gram + stem])
+                gram += word
+                if gram in phrases:
+                    matched.update(phrases[gram])
+                if gram not in prefixes:
+                    break
+                gram += " "
+
+        totals = [0] * len(self.intent_names)
+        for _, idx, weight in matched:
+            totals[idx] += weight
+        return {self.intent_names[i]: s for i, s in enumerate(totals) if s > 0}
+
+    def best(self, message: str) -> Optional[str]:
+        """Highest-scoring intent (ties go to the intent defined first), or None"""
+        scores = self.scores(message)
+        return max(scores, key=scores.get) if scores else None
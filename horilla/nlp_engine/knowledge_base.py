@@ -1,18 +1,25 @@
 from typing import Dict, List, Any, Optional
+import logging
 import re
 from datetime import datetime
 from django.db.models import Q
+from django.db.models.functions import Substr
 from .extended_faq_data import extended_faq_data
 
 # Import AI Knowledge models
 try:
     from ai_knowledge.models import KnowledgeBaseEntry, AIDocument
+    from ai_knowledge.search import get_search_backend
     AI_KNOWLEDGE_AVAILABLE = True
 except ImportError:
     AI_KNOWLEDGE_AVAILABLE = False
     KnowledgeBaseEntry = None
     AIDocument = None
 
+logger = logging.getLogger(__name__)
+
+AI_DOCUMENT_STATUSES = ['processed', 'approved']
+
 class HRKnowledgeBase:
     """
     Knowledge Base untuk menyimpan informasi HR yang sering ditanyakan
@@ -223,10 +230,72 @@ class HRKnowledgeBase:
         return results[:limit]
     
     def _search_ai_knowledge(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
-        """Search dalam AI Knowledge Management database dengan pencarian kata kunci yang fleksibel"""
+        """Search dalam AI Knowledge Management database, diranking oleh full-text index database"""
         if not AI_KNOWLEDGE_AVAILABLE:
             return []
         
+        backend = get_search_backend()
+        if backend is None:
+            return self._search_ai_knowledge_like(query, limit)
+        
+        try:
+            entry_ranks = backend.search_entries(query, limit)
+            doc_ranks = backend.search_documents(query, limit, AI_DOCUMENT_STATUSES)
+        except Exception as e:
+            logger.warning(f"Full-text search unavailable, using keyword lookup: {e}")
+            return self._search_ai_knowledge_like(query, limit)
+        
+        results = []
+        # Relevansi = rank database dinormalisasi terhadap hasil terbaik (0..1)
+        top_rank = max([rank for _, rank in entry_ranks + doc_ranks] or [0]) or 1.0
+        
+        entries = KnowledgeBaseEntry.objects.in_bulk([pk for pk, _ in entry_ranks])
+        for pk, rank in entry_ranks:
+            entry = entries.get(pk)
+            if entry is None:
+                continue
+            results.append({
+                'type': 'ai_knowledge',
+                'category': entry.entry_type or 'general',
+                'question': entry.title,
+                'answer': entry.content,
+                'relevance': rank / top_rank,
+                'source': 'ai_knowledge',
+                'keywords': entry.keywords.split(',') if entry.keywords else [],
+                'confidence_score': entry.confidence_score,
+                'last_updated': entry.updated_at.isoformat() if entry.updated_at else None
+            })
+        
+        # extracted_text bisa sangat besar: hanya ambil cuplikan untuk jawaban
+        docs = (
+            AIDocument.objects.filter(pk__in=[pk for pk, _ in doc_ranks])
+            .select_related('category')
+            .defer('extracted_text')
+            .annotate(text_snippet=Substr('extracted_text', 1, 501))
+            .in_bulk()
+        )
+        for pk, rank in doc_ranks:
+            doc = docs.get(pk)
+            if doc is None:
+                continue
+            answer_text = doc.text_snippet or doc.description or 'Tidak ada konten tersedia.'
+            if len(answer_text) > 500:
+                answer_text = answer_text[:500] + '...'
+            results.append({
+                'type': 'ai_document',
+                'category': doc.category.name if doc.category else 'document',
+                'question': doc.title,
+                'answer': answer_text,
+                'relevance': rank / top_rank,
+                'source': 'ai_document',
+                'document_status': doc.status,
+                'last_updated': doc.updated_at.isoformat() if doc.updated_at else None
+            })
+        
+        return results
+    
+    def _search_ai_knowledge_like(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Pencarian kata kunci (icontains) untuk database tanpa full-text backend"""
         results = []
         
         try:
@@ -278,7 +347,7 @@ class HRKnowledgeBase:
                 Q(title__icontains=query) |
                 Q(extracted_text__icontains=query) |
                 Q(description__icontains=query)
-            ).filter(status__in=['processed', 'approved'])[:limit]
+            ).filter(status__in=AI_DOCUMENT_STATUSES)[:limit]
             
             # Jika tidak ada hasil exact match, cari berdasarkan kata kunci individual
             if not ai_docs_exact.exists() and query_words:
@@ -286,7 +355,7 @@ class HRKnowledgeBase:
                 for word in query_words:
                     doc_query |= Q(title__icontains=word) | Q(extracted_text__icontains=word) | Q(description__icontains=word)
                 
-                ai_docs_partial = AIDocument.objects.filter(doc_query).filter(status__in=['processed', 'approved'])[:limit*2]
+                ai_docs_partial = AIDocument.objects.filter(doc_query).filter(status__in=AI_DOCUMENT_STATUSES)[:limit*2]
                 
                 # Score dan sort berdasarkan relevansi
                 scored_docs = []
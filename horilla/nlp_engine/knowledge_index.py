@@ -0,0 +1,327 @@
+"""
+Unified BM25 inverted index over every chatbot knowledge source.
+
+One tokenized index covers the basic and extended FAQs, the HR domain, compliance, best practice
+and scenario corpora, plus active ``ai_knowledge`` entries and processed documents. Static corpora
+are indexed once per process; ``ai_knowledge`` rows are synced incrementally (only rows whose
+``updated_at`` changed are re-read) when a model signal fires in this process or at most every
+``NLP_KNOWLEDGE_INDEX_REFRESH`` seconds, so edits made by Celery workers show up as well.
+"""
+
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from .corpora import CORPORA, get_corpus
+
+try:
+    from ai_knowledge.models import AIDocument, KnowledgeBaseEntry
+    AI_KNOWLEDGE_AVAILABLE = True
+except ImportError:
+    AI_KNOWLEDGE_AVAILABLE = False
+    AIDocument = None
+    KnowledgeBaseEntry = None
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = getattr(settings, 'NLP_KNOWLEDGE_INDEX_REFRESH', 30)
+BM25_K1 = 1.5
+BM25_B = 0.75
+ANSWER_CHARS = 500
+MAX_INDEXED_CHARS = 50000  # per AI document
+
+# Ranking boosts per source tag; AI Knowledge stays ahead of the static corpora as before
+SOURCE_BOOST = {
+    'ai_knowledge': 1.5,
+    'ai_document': 1.2,
+}
+
+# Nested corpora: source tag -> (corpus attribute, top-level sections to index)
+NESTED_SOURCES = {
+    'hr_domain': ('hr_domain_data', [
+        'employee_lifecycle', 'compensation_benefits', 'performance_management',
+        'learning_development', 'compliance_policies', 'organizational_structure',
+        'hr_processes', 'employee_relations'
+    ]),
+    'compliance': ('compliance_data', [
+        'labor_laws', 'employment_regulations', 'workplace_safety',
+        'data_privacy', 'equal_opportunity', 'compensation_compliance',
+        'leave_policies', 'audit_checklists'
+    ]),
+    'best_practices': ('industry_best_practices', [
+        'talent_acquisition', 'employee_engagement', 'performance_management',
+        'learning_development', 'compensation_benchmarks', 'hr_analytics',
+        'digital_transformation', 'diversity_inclusion'
+    ]),
+    'scenarios': ('advanced_scenarios', [
+        'complex_scenarios', 'edge_cases', 'crisis_management',
+        'legal_scenarios', 'cultural_scenarios', 'remote_work_scenarios',
+        'diversity_scenarios', 'change_management'
+    ]),
+}
+
+STOPWORDS = {
+    'yang', 'dan', 'di', 'ke', 'dari', 'untuk', 'dengan', 'atau', 'ini', 'itu', 'apa', 'apakah',
+    'saya', 'aku', 'kami', 'kita', 'anda', 'bagaimana', 'ada', 'adalah', 'akan', 'bisa', 'dapat',
+    'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'is', 'are', 'what', 'how',
+    'my', 'me', 'i', 'do', 'does', 'can', 'with', 'be',
+}
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _humanize(key: str) -> str:
+    return key.replace('_', ' ').strip().capitalize()
+
+
+def _flatten(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, list):
+        return '; '.join(s for s in (_flatten(v) for v in value) if s)
+    return ''
+
+
+def _iter_sections(data: Any, path: Tuple[str, ...]) -> Iterator[Tuple[Tuple[str, ...], str]]:
+    """Yield (path, text) for every dict holding scalar/list values directly"""
+    if isinstance(data, dict):
+        parts = [f"{_humanize(k)}: {_flatten(v)}" for k, v in data.items()
+                 if not isinstance(v, dict) and _flatten(v)]
+        if parts:
+            yield path, '\n'.join(parts)
+        for key, value in data.items():
+            if isinstance(value, dict):
+                yield from _iter_sections(value, path + (key,))
+            elif isinstance(value, list):
+                for i, item in enumerate(value):
+                    if isinstance(item, dict):
+                        yield from _iter_sections(item, path + (f"{key}[{i}]",))
+
+
+class KnowledgeIndex:
+    """
+    In-memory BM25 index; documents carry a source tag and the payload returned on search
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._docs: Dict[str, Tuple[int, Dict[str, Any], Tuple[str, ...]]] = {}  # id -> (length, payload, terms)
+        self._total_length = 0
+        self._db_versions: Dict[str, Any] = {}
+        self._next_sync = 0.0
+        self.built = False
+
+    # ---- maintenance -------------------------------------------------
+
+    def add(self, doc_id: str, text: str, payload: Dict[str, Any], title: str = ''):
+        """Add or replace a document; the title is weighted twice"""
+        counts = Counter(tokenize(text))
+        for token in tokenize(title):
+            counts[token] += 2
+        with self._lock:
+            self.remove(doc_id)
+            if not counts:
+                return
+            length = sum(counts.values())
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            self._docs[doc_id] = (length, payload, tuple(counts))
+            self._total_length += length
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            doc = self._docs.pop(doc_id, None)
+            if not doc:
+                return
+            length, _, terms = doc
+            for term in terms:
+                posting = self._postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self._postings[term]
+            self._total_length -= length
+
+    def build(self):
+        """Index the static corpora once, then the ai_knowledge tables"""
+        started = time.perf_counter()
+        with self._lock:
+            if self.built:
+                return
+            self._index_basic_faq()
+            self._index_extended_faq()
+            for source, (attribute, sections) in NESTED_SOURCES.items():
+                self._index_nested(source, get_corpus(CORPORA[attribute]), sections)
+            self.built = True
+            self.sync()
+        logger.info("Knowledge index built: %d documents, %d terms in %.0f ms",
+                    len(self._docs), len(self._postings), (time.perf_counter() - started) * 1000)
+
+    def _index_basic_faq(self):
+        for category, data in get_corpus(CORPORA['knowledge_base']).faq_data.items():
+            for i, question in enumerate(data['questions']):
+                self.add(f"basic:q:{category}:{i}", question, {
+                    'type': 'faq', 'category': category, 'question': question, 'source': 'basic'})
+            for key, answer in data['answers'].items():
+                self.add(f"basic:a:{category}:{key}", answer, {
+                    'type': 'faq_answer', 'category': category, 'key': key, 'answer': answer,
+                    'title': _humanize(key), 'source': 'basic'}, title=key)
+
+    def _index_extended_faq(self):
+        for faq_id, faq in get_corpus(CORPORA['extended_faq']).detailed_faqs.items():
+            keywords = ' '.join(faq.get('keywords', []))
+            self.add(f"extended:{faq_id}", f"{faq.get('answer', '')} {keywords}", {
+                'type': 'extended_faq', 'id': faq_id, 'category': faq.get('category', 'general'),
+                'question': faq.get('question', ''), 'answer': faq.get('answer', ''),
+                'related_topics': faq.get('related_topics', []), 'source': 'extended'},
+                title=faq.get('question', ''))
+
+    def _index_nested(self, source: str, corpus: Any, sections: List[str]):
+        for section in sections:
+            data = getattr(corpus, section, None)
+            if not isinstance(data, dict):
+                continue
+            for path, text in _iter_sections(data, (section,)):
+                title = _humanize(re.sub(r"\[\d+\]$", '', path[-1]))
+                self.add(f"{source}:{'.'.join(path)}", text, {
+                    'type': source, 'category': section, 'path': '.'.join(path), 'title': title,
+                    'answer': text[:ANSWER_CHARS], 'source': source},
+                    title=' '.join(_humanize(p) for p in path[1:]))
+
+    def sync(self, force: bool = False):
+        """Re-read ai_knowledge rows whose updated_at changed; drop rows that went away"""
+        if not AI_KNOWLEDGE_AVAILABLE:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return
+        with self._lock:
+            self._next_sync = now + REFRESH_SECONDS
+            try:
+                self._sync_model('ai_knowledge', KnowledgeBaseEntry.objects.filter(is_active=True),
+                                 self._index_entry)
+                self._sync_model('ai_document', AIDocument.objects.filter(status__in=['processed', 'approved']),
+                                 self._index_document, select_related=('category',))
+            except Exception as e:
+                logger.warning(f"Knowledge index sync failed: {e}")
+
+    def _sync_model(self, source: str, queryset, index_row, select_related=()):
+        current = {f"{source}:{pk}": updated for pk, updated in queryset.values_list('id', 'updated_at')}
+        for doc_id in [d for d in self._db_versions if d.startswith(source + ':') and d not in current]:
+            self.remove(doc_id)
+            del self._db_versions[doc_id]
+        changed = [int(d.split(':', 1)[1]) for d, updated in current.items() if self._db_versions.get(d) != updated]
+        if changed:
+            for row in queryset.filter(id__in=changed).select_related(*select_related):
+                index_row(row)
+                self._db_versions[f"{source}:{row.id}"] = row.updated_at
+
+    def _index_entry(self, entry):
+        self.add(f"ai_knowledge:{entry.id}", f"{entry.content} {entry.keywords or ''}", {
+            'type': 'ai_knowledge', 'category': entry.entry_type or 'general', 'question': entry.title,
+            'answer': entry.content, 'source': 'ai_knowledge',
+            'keywords': entry.keywords.split(',') if entry.keywords else [],
+            'confidence_score': entry.confidence_score,
+            'last_updated': entry.updated_at.isoformat() if entry.updated_at else None}, title=entry.title)
+
+    def _index_document(self, doc):
+        text = doc.extracted_text or doc.description or ''
+        answer = text or 'Tidak ada konten tersedia.'
+        if len(answer) > ANSWER_CHARS:
+            answer = answer[:ANSWER_CHARS] + '...'
+        self.add(f"ai_document:{doc.id}", f"{doc.description or ''} {text[:MAX_INDEXED_CHARS]}", {
+            'type': 'ai_document', 'category': doc.category.name if doc.category else 'document',
+            'question': doc.title, 'answer': answer, 'source': 'ai_document', 'document_status': doc.status,
+            'last_updated': doc.updated_at.isoformat() if doc.updated_at else None}, title=doc.title)
+
+    def mark_stale(self):
+        """Sync ai_knowledge rows on the next query"""
+        self._next_sync = 0.0
+
+    # ---- query -------------------------------------------------------
+
+    def search(self, query: str, limit: int = 10, sources: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k documents for the query across all sources (one BM25 pass over the postings)
+
+        Each result is the document payload plus ``score`` (boosted BM25) and ``relevance``: the
+        share of the query's terms it contains, weighted by their idf (0..1, comparable across
+        queries; query terms the index has never seen count as missing).
+        """
+        if not self.built:
+            self.build()
+        self.sync()
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._docs)
+            if not terms or not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: Dict[str, float] = {}
+            covered: Dict[str, float] = {}
+            query_idf = 0.0
+            for term in terms:
+                posting = self._postings.get(term) or {}
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                query_idf += idf
+                for doc_id, tf in posting.items():
+                    length = self._docs[doc_id][0]
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+                    covered[doc_id] = covered.get(doc_id, 0.0) + idf
+            ranked = []
+            for doc_id, score in scores.items():
+                payload = self._docs[doc_id][1]
+                if sources and payload['source'] not in sources:
+                    continue
+                ranked.append((score * SOURCE_BOOST.get(payload['source'], 1.0), doc_id))
+            top = heapq.nlargest(limit, ranked)
+            return [
+                dict(self._docs[doc_id][1], score=round(score, 4), relevance=round(covered[doc_id] / query_idf, 3))
+                for score, doc_id in top
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_source = Counter(payload['source'] for _, payload, _ in self._docs.values())
+            return {'built': self.built, 'documents': len(self._docs), 'terms': len(self._postings),
+                    'by_source': dict(by_source)}
+
+
+_index: Optional[KnowledgeIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """Process-wide knowledge index (built on first search)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = KnowledgeIndex()
+    return _index
+
+
+def _ai_knowledge_changed(sender, **kwargs):
+    if _index is not None and _index.built:
+        _index.mark_stale()
+
+
+if AI_KNOWLEDGE_AVAILABLE:
+    for _model in (KnowledgeBaseEntry, AIDocument):
+        post_save.connect(_ai_knowledge_changed, sender=_model, dispatch_uid=f'knowledge_index_save_{_model.__name__}')
+        post_delete.connect(_ai_knowledge_changed, sender=_model, dispatch_uid=f'knowledge_index_delete_{_model.__name__}')
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from nlp_engine.chatbot import HRChatbot
+from nlp_engine.intent_matcher import IntentMatcher
+
+SAMPLE_MESSAGES = [
+    "Berapa sisa cuti saya?",
+    "hi",
+    "Bagaimana status hiring untuk posisi backend engineer?",
+    "Tolong tampilkan slip gaji bulan ini dan potongan bpjs",
+    "Saya mau tahu kebijakan work from home dan keamanan informasi di perusahaan",
+    "Jadwal training sertifikasi minggu depan kapan ya?",
+    "siapa atasan saya",
+    "Good morning! Can you show the employee directory for the finance team?",
+    "Apakah lembur di hari libur nasional dihitung dua kali lipat menurut peraturan perusahaan?",
+    "random text without any hr keywords at all",
+]
+
+
+def legacy_detect(intents, message):
+    """Previous substring loop, kept here as the benchmark baseline"""
+    message_lower = message.lower()
+    intent_scores = {}
+    for intent, keywords in intents.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in message_lower:
+                score += len(keyword.split())
+        if score > 0:
+            intent_scores[intent] = score
+    return max(intent_scores, key=intent_scores.get) if intent_scores else None
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark keyword intent detection: substring loop vs compiled IntentMatcher'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Passes over the sample messages (default: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        intents = HRChatbot().intents
+
+        started = time.perf_counter()
+        matcher = IntentMatcher(intents)
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        results = {}
+        for name, detect in (('substring loop', lambda m: legacy_detect(intents, m)),
+                             ('IntentMatcher', matcher.best)):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                for message in SAMPLE_MESSAGES:
+                    detect(message)
+            elapsed = time.perf_counter() - started
+            results[name] = elapsed * 1e6 / (iterations * len(SAMPLE_MESSAGES))
+
+        self.stdout.write(f"{matcher.keyword_count} keywords, {len(intents)} intents, compiled in {compile_ms:.2f} ms")
+        for name, per_message in results.items():
+            self.stdout.write(f"{name:15} {per_message:8.2f} us/message")
+        self.stdout.write(f"speedup {results['substring loop'] / results['IntentMatcher']:.1f}x")
+
+        self.stdout.write("\nDecisions that differ (substring loop -> IntentMatcher):")
+        for message in SAMPLE_MESSAGES:
+            old, new = legacy_detect(intents, message), matcher.best(message)
+            if old != new:
+                self.stdout.write(f"  {message!r}: {old} -> {new}")
@@ -0,0 +1,98 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from nlp_engine.corpora import get_text_analyzer
+from nlp_engine.model_pool import get_model_pool
+
+FEEDBACK_TEMPLATES = [
+    "The onboarding with {name} in {dept} was well organized, thank you!",
+    "I have a problem with my {month} payroll, the overtime from {dept} is missing.",
+    "Please review the leave policy, {name} had to wait two weeks for approval.",
+    "Great training session on {topic} last {month}, I would like a follow-up.",
+    "The {dept} team needs more support during the {month} closing, workload is too high.",
+    "Could HR clarify the remote work rules for {dept}? {name} received different answers.",
+    "My manager {name} gave helpful feedback in the {month} performance review.",
+    "The new attendance system keeps failing at the {dept} office, this is frustrating.",
+]
+SHORT_TEXTS = ["thanks", "ok", "need help with leave", "payroll issue", "great job", "cuti saya berapa?"]
+NAMES = ["Andi", "Budi", "Citra", "Dewi", "Eko", "Fitri", "Maria Santos", "John Lee"]
+DEPARTMENTS = ["Finance", "Engineering", "Sales", "Operations", "Human Resources", "Marketing"]
+MONTHS = ["January", "March", "June", "September", "December"]
+TOPICS = ["data privacy", "leadership", "Excel", "customer service", "safety"]
+
+
+def feedback_texts(count, seed=0):
+    """Synthetic employee feedback; about one in five texts is a repeated short message"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        if rng.random() < 0.2:
+            texts.append(rng.choice(SHORT_TEXTS))
+        else:
+            texts.append(rng.choice(FEEDBACK_TEMPLATES).format(
+                name=rng.choice(NAMES), dept=rng.choice(DEPARTMENTS),
+                month=rng.choice(MONTHS), topic=rng.choice(TOPICS),
+            ))
+    return texts
+
+
+class Command(BaseCommand):
+    help = "Benchmark TextAnalyzer: one analyze() call per text vs analyze_many() over the warm model pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,10000",
+            help="Comma separated numbers of feedback texts (default: 1000,10000)",
+        )
+        parser.add_argument("--batch-size", type=int, default=None, help="nlp.pipe batch size")
+        parser.add_argument("--n-process", type=int, default=None, help="nlp.pipe worker processes")
+
+    def handle(self, *args, **options):
+        pool = get_model_pool()
+        started = time.perf_counter()
+        pool.warm_up()
+        analyzer = get_text_analyzer()
+        self.stdout.write(f"model pool warm in {(time.perf_counter() - started) * 1000:.0f} ms: {pool.stats()}")
+
+        self.stdout.write(
+            f"{'texts':>6} {'ner doc/s':>10} {'ner pipe/s':>11} {'analyze/s':>10} {'many/s':>8} {'cache hits':>11}"
+        )
+        for size in [int(s) for s in options["sizes"].split(",")]:
+            texts = feedback_texts(size)
+            extractor = analyzer.entity_extractor
+
+            started = time.perf_counter()
+            for text in texts:
+                extractor.extract_with_spacy(text)
+            ner_doc_rate = size / (time.perf_counter() - started)
+            started = time.perf_counter()
+            extractor.extract_many_with_spacy(texts, batch_size=options["batch_size"], n_process=options["n_process"])
+            ner_pipe_rate = size / (time.perf_counter() - started)
+
+            self._clear_caches(analyzer)
+            started = time.perf_counter()
+            single = [analyzer.analyze(text) for text in texts]
+            single_rate = size / (time.perf_counter() - started)
+
+            self._clear_caches(analyzer)
+            started = time.perf_counter()
+            many = analyzer.analyze_many(texts, batch_size=options["batch_size"], n_process=options["n_process"])
+            many_rate = size / (time.perf_counter() - started)
+            hits = analyzer.preprocessor._preprocess_cached.cache_info().hits
+
+            self.stdout.write(
+                f"{size:>6} {ner_doc_rate:>10.0f} {ner_pipe_rate:>11.0f} {single_rate:>10.0f} {many_rate:>8.0f} {hits:>11}"
+            )
+            differing = sum(
+                1 for a, b in zip(single, many)
+                if (a['sentiment'], a['entities'], a['processed_text']) != (b['sentiment'], b['entities'], b['processed_text'])
+            )
+            if differing:
+                self.stdout.write(self.style.ERROR(f"  {differing} results differ between analyze and analyze_many"))
+
+    def _clear_caches(self, analyzer):
+        analyzer.preprocessor._preprocess_cached.cache_clear()
+        analyzer.language_detector._detect_cached.cache_clear()
@@ -0,0 +1,46 @@
+import importlib
+import os
+import resource
+import time
+
+from django.core.management.base import BaseCommand
+
+from nlp_engine.corpora import CORPORA, get_corpus, get_text_analyzer, loaded_corpora
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = ('Report import time and RSS of nlp_engine as a web worker sees it: at boot '
+            '(lazy corpora) and after first chatbot use (what every worker paid on boot before)')
+
+    def handle(self, *args, **options):
+        rows = [('django ready', 0.0, current_rss_mb())]
+
+        started = time.perf_counter()
+        importlib.import_module('nlp_engine.views')
+        rows.append(('boot: import nlp_engine.views', time.perf_counter() - started, current_rss_mb()))
+
+        started = time.perf_counter()
+        get_text_analyzer()
+        rows.append(('first use: TextAnalyzer', time.perf_counter() - started, current_rss_mb()))
+
+        started = time.perf_counter()
+        for spec in CORPORA.values():
+            get_corpus(spec)
+        rows.append((f'first use: {len(CORPORA)} corpora', time.perf_counter() - started, current_rss_mb()))
+
+        self.stdout.write(f"{'step':40} {'seconds':>8} {'rss_mb':>8}")
+        for step, seconds, rss in rows:
+            self.stdout.write(f"{step:40} {seconds:8.3f} {rss:8.1f}")
+        eager = sum(seconds for _, seconds, _ in rows[1:])
+        self.stdout.write(f"\nboot now {rows[1][1]:.3f}s / {rows[1][2] - rows[0][2]:.1f} MB; "
+                          f"eager loading (previous boot) {eager:.3f}s / {rows[-1][2] - rows[0][2]:.1f} MB")
+        self.stdout.write(f"loaded: {', '.join(loaded_corpora())}")
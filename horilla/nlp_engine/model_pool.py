@@ -0,0 +1,178 @@
+"""
+Process-wide warm pool of the NLP models used by text_analyzer.
+
+The spaCy pipeline, the NLTK lemmatizer and stop words, and VADER are loaded once per process on
+first use and shared by every TextPreprocessor, SentimentAnalyzer and EntityExtractor. spaCy is
+loaded with the components entity extraction does not need disabled (NLP_SPACY_DISABLE; the ``ner``
+of the trained pipelines has its own tok2vec), and NLTK data is only downloaded when missing.
+"""
+
+import logging
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+try:
+    import spacy
+except ImportError:
+    spacy = None
+
+try:
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+except ImportError:
+    nltk = None
+
+try:
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+except ImportError:
+    SentimentIntensityAnalyzer = None
+
+logger = logging.getLogger(__name__)
+
+SPACY_MODEL = getattr(settings, 'NLP_SPACY_MODEL', 'en_core_web_sm')
+SPACY_DISABLE = getattr(settings, 'NLP_SPACY_DISABLE',
+                        ['tok2vec', 'tagger', 'parser', 'attribute_ruler', 'lemmatizer'])
+# nlp.pipe defaults for EntityExtractor.extract_many_with_spacy / TextAnalyzer.analyze_many
+SPACY_BATCH_SIZE = getattr(settings, 'NLP_SPACY_BATCH_SIZE', 64)
+SPACY_N_PROCESS = getattr(settings, 'NLP_SPACY_N_PROCESS', 1)
+LEMMA_CACHE_SIZE = getattr(settings, 'NLP_LEMMA_CACHE_SIZE', 65536)
+PREPROCESS_CACHE_SIZE = getattr(settings, 'NLP_PREPROCESS_CACHE_SIZE', 4096)
+PREPROCESS_CACHE_MAX_CHARS = getattr(settings, 'NLP_PREPROCESS_CACHE_MAX_CHARS', 256)
+
+# NLTK package -> resource path checked before downloading (the *_tab/*_eng variants are what
+# NLTK >= 3.9 loads)
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+    'averaged_perceptron_tagger_eng': 'taggers/averaged_perceptron_tagger_eng',
+    'maxent_ne_chunker': 'chunkers/maxent_ne_chunker',
+    'maxent_ne_chunker_tab': 'chunkers/maxent_ne_chunker_tab',
+    'words': 'corpora/words',
+}
+
+_UNLOADED = object()
+
+
+class ModelPool:
+    """Lazily loaded models shared by the analyzers of one process"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._spacy = _UNLOADED
+        self._nltk = _UNLOADED
+        self._vader = _UNLOADED
+
+    def _get(self, attr: str, loader):
+        value = getattr(self, attr)
+        if value is _UNLOADED:
+            with self._lock:
+                value = getattr(self, attr)
+                if value is _UNLOADED:
+                    value = loader()
+                    setattr(self, attr, value)
+        return value
+
+    @property
+    def nlp(self):
+        """spaCy pipeline with unused components disabled, or None"""
+        return self._get('_spacy', self._load_spacy)
+
+    @property
+    def lemmatizer(self):
+        return self._get('_nltk', self._load_nltk)['lemmatizer']
+
+    @property
+    def stop_words(self) -> frozenset:
+        return self._get('_nltk', self._load_nltk)['stop_words']
+
+    @property
+    def lemmatize(self):
+        """Cached ``lemmatize(token)``, or None without the NLTK lemmatizer"""
+        return self._get('_nltk', self._load_nltk)['lemmatize']
+
+    @property
+    def vader(self):
+        return self._get('_vader', self._load_vader)
+
+    def _load_spacy(self):
+        if not spacy:
+            return None
+        try:
+            nlp = spacy.load(SPACY_MODEL)
+            for name in SPACY_DISABLE:
+                if name in nlp.pipe_names:
+                    nlp.disable_pipe(name)
+            logger.info(f"Loaded spaCy {SPACY_MODEL} with pipes {nlp.pipe_names}")
+            return nlp
+        except OSError:
+            logger.warning(f"spaCy model {SPACY_MODEL} not found. Install with: python -m spacy download {SPACY_MODEL}")
+        except Exception as e:
+            logger.warning(f"Failed to initialize spaCy: {e}")
+        return None
+
+    def _load_nltk(self) -> Dict[str, Any]:
+        loaded = {'lemmatizer': None, 'stop_words': frozenset(), 'lemmatize': None}
+        if not nltk:
+            return loaded
+        for package, resource in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                try:
+                    nltk.download(package, quiet=True)
+                except Exception as e:
+                    logger.warning(f"Failed to download NLTK {package}: {e}")
+        try:
+            lemmatizer = WordNetLemmatizer()
+            loaded['lemmatizer'] = lemmatizer
+            loaded['lemmatize'] = lru_cache(maxsize=LEMMA_CACHE_SIZE)(lemmatizer.lemmatize)
+            loaded['stop_words'] = frozenset(stopwords.words('english'))
+        except Exception as e:
+            logger.warning(f"Failed to initialize NLTK: {e}")
+        return loaded
+
+    def _load_vader(self):
+        if not SentimentIntensityAnalyzer:
+            return None
+        try:
+            return SentimentIntensityAnalyzer()
+        except Exception as e:
+            logger.warning(f"Failed to initialize VADER: {e}")
+            return None
+
+    def warm_up(self):
+        """Load every model now (e.g. in a worker process before it takes work)"""
+        for attr in ('nlp', 'lemmatize', 'vader'):
+            getattr(self, attr)
+
+    def stats(self) -> Dict[str, Any]:
+        nlp = None if self._spacy is _UNLOADED else self._spacy
+        lemmatize = None if self._nltk is _UNLOADED else self._nltk['lemmatize']
+        return {
+            'spacy_model': SPACY_MODEL if nlp else None,
+            'spacy_pipes': list(nlp.pipe_names) if nlp else [],
+            'nltk_loaded': lemmatize is not None,
+            'vader_loaded': self._vader not in (_UNLOADED, None),
+            'lemma_cache': lemmatize.cache_info()._asdict() if lemmatize else None,
+        }
+
+
+_model_pool: Optional[ModelPool] = None
+_model_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """Get the process-wide model pool"""
+    global _model_pool
+    if _model_pool is None:
+        with _model_pool_lock:
+            if _model_pool is None:
+                _model_pool = ModelPool()
+    return _model_pool
@@ -78,6 +78,7 @@ class TextAnalysisResult(models.Model):
         ('leave_request', 'Leave Request'),
         ('performance_review', 'Performance Review'),
         ('general', 'General Text'),
+        ('chatbot', 'Chatbot Message'),
     ]
     
     # Basic Information
@@ -120,6 +121,7 @@ class TextAnalysisResult(models.Model):
     )
     
     # Metadata
+    metadata = models.JSONField(default=dict, blank=True, help_text="Extra context (e.g. chatbot intent, MongoDB ID)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
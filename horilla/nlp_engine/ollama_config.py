@@ -29,8 +29,10 @@ OLLAMA_ENABLE_RESPONSE_ENHANCEMENT = getattr(settings, 'OLLAMA_ENABLE_RESPONSE_E
 # Performance Settings
 OLLAMA_RETRY_ATTEMPTS = getattr(settings, 'OLLAMA_RETRY_ATTEMPTS', 3)
 OLLAMA_RETRY_DELAY = getattr(settings, 'OLLAMA_RETRY_DELAY', 1.0)
-OLLAMA_CACHE_RESPONSES = getattr(settings, 'OLLAMA_CACHE_RESPONSES', False)
+OLLAMA_CACHE_RESPONSES = getattr(settings, 'OLLAMA_CACHE_RESPONSES', False)  # free-text generations
 OLLAMA_CACHE_TTL = getattr(settings, 'OLLAMA_CACHE_TTL', 3600)  # 1 hour
+OLLAMA_POOL_SIZE = getattr(settings, 'OLLAMA_POOL_SIZE', 10)  # keep-alive connections per process
+OLLAMA_EMBED_BATCH = getattr(settings, 'OLLAMA_EMBED_BATCH', 32)  # texts per /api/embed request
 
 # HR-Specific Configuration
 HR_INTENTS = [
@@ -83,6 +85,15 @@ SYSTEM_PROMPTS = {
         "dates, departments, job titles, etc."
     ),
     
+    'combined_analysis': (
+        "You are an NLP analysis engine for an HR system. Analyze the given text and respond with "
+        "one JSON object with exactly these keys: 'sentiment' (object with 'sentiment' "
+        "(positive/negative/neutral), 'confidence' (0.0-1.0) and 'explanation'), 'intent' (object "
+        "with 'intent' (one of the available intents), 'confidence' (0.0-1.0) and 'explanation') and "
+        "'entities' (array of objects with 'text', 'label', 'start', 'end' and 'confidence'; "
+        "HR-relevant entities like names, dates, departments, job titles)."
+    ),
+    
     'response_enhancement': (
         "You are an HR assistant. Enhance the given response to be more natural, "
         "helpful, and professional while maintaining the core information. "
@@ -129,6 +140,8 @@ def get_ollama_config() -> dict:
         'retry_delay': OLLAMA_RETRY_DELAY,
         'cache_responses': OLLAMA_CACHE_RESPONSES,
         'cache_ttl': OLLAMA_CACHE_TTL,
+        'pool_size': OLLAMA_POOL_SIZE,
+        'embed_batch': OLLAMA_EMBED_BATCH,
         'hr_intents': HR_INTENTS,
         'hr_entity_types': HR_ENTITY_TYPES,
         'system_prompts': SYSTEM_PROMPTS,
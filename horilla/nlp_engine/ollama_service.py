@@ -5,11 +5,16 @@ Provides integration with local Ollama models for improved text analysis
 """
 
 import requests
+import hashlib
 import logging
 import time
 import json
 from typing import Dict, List, Optional, Any, Union
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .circuit_breaker import get_circuit_breaker, remaining_budget
 from .ollama_config import (
     get_ollama_config, validate_ollama_config, SYSTEM_PROMPTS,
     OLLAMA_BASE_URL, OLLAMA_EMBEDDING_MODEL, OLLAMA_GENERATION_MODEL,
@@ -33,18 +38,50 @@ class OllamaService:
         self.timeout = OLLAMA_TIMEOUT
         self.retry_attempts = OLLAMA_RETRY_ATTEMPTS
         self.retry_delay = OLLAMA_RETRY_DELAY
+        self.session = self._create_session(self.retry_attempts)
+        # Used inside a latency budget: no retries, the budget is the timeout
+        self.interactive_session = self._create_session(0)
+        self.breaker = get_circuit_breaker('ollama')
+        self.health_check_interval = self.config.get('health_check_interval', 300)
         
         # Validate configuration
         is_valid, errors = validate_ollama_config()
         if not is_valid:
             logger.warning(f"Ollama configuration issues: {errors}")
         
+        self._last_probe = time.monotonic()
         self.available = self._check_availability()
         if self.available:
             logger.info(f"Ollama service initialized successfully at {self.base_url}")
         else:
             logger.warning(f"Ollama service not available at {self.base_url}")
         
+    def _create_session(self, retries: int) -> requests.Session:
+        """
+        HTTP session with a keep-alive connection pool shared by all requests of this process.
+        
+        Connection failures and 502/503/504 responses are retried by urllib3 with exponential
+        backoff; read timeouts are not retried (a generation that timed out would only time
+        out again).
+        """
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=False,  # raise read timeouts as-is, never retried
+            status=retries,
+            backoff_factor=self.retry_delay / 2,  # sleeps delay/2, delay, 2*delay, ...
+            status_forcelist=(502, 503, 504),
+            allowed_methods=None,
+            raise_on_status=False,
+        )
+        pool_size = self.config.get('pool_size', 10)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json'})
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
     def _check_availability(self) -> bool:
         """
         Check if Ollama service is available
@@ -53,7 +90,9 @@ class OllamaService:
             bool: True if Ollama is available, False otherwise
         """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            remaining = remaining_budget()
+            timeout = 5 if remaining is None else min(5, remaining)
+            response = self.interactive_session.get(f"{self.base_url}/api/tags", timeout=timeout)
             return response.status_code == 200
         except Exception as e:
             logger.warning(f"Ollama service not available: {e}")
@@ -63,69 +102,88 @@ class OllamaService:
         """
         Check if Ollama service is currently available
         
+        An unreachable server is probed again every OLLAMA_HEALTH_CHECK_INTERVAL seconds, and an
+        open circuit breaker reports the service as unavailable until its half-open probe.
+        
         Returns:
             bool: True if available, False otherwise
         """
-        return self.available
+        if not self.available and time.monotonic() - self._last_probe >= self.health_check_interval:
+            self._last_probe = time.monotonic()
+            self.available = self._check_availability()
+        return self.available and self.breaker.state != 'open'
+    
+    def _cache_key(self, endpoint: str, data: Dict[str, Any]) -> str:
+        payload = json.dumps(data, sort_keys=True, ensure_ascii=False)
+        return f"ollama:{data.get('model')}:{endpoint}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
     
-    def _make_request(self, endpoint: str, data: Dict[str, Any], retries: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    def _make_request(self, endpoint: str, data: Dict[str, Any], retries: Optional[int] = None,
+                      use_cache: bool = False) -> Optional[Dict[str, Any]]:
         """
-        Make HTTP request to Ollama API with retry logic
+        Make HTTP request to Ollama API over the pooled session
+        
+        Calls are skipped while the circuit breaker is open or the latency budget of the current
+        request is spent; inside a budget the timeout is the remaining budget and there are no retries.
         
         Args:
             endpoint: API endpoint
             data: Request payload
-            retries: Number of retry attempts (uses config default if None)
+            retries: Ignored, connection retries are configured on the session
+            use_cache: Serve/store the response from the Django cache, keyed by model and payload hash
             
         Returns:
             Response data or None if failed
         """
-        if retries is None:
-            retries = self.retry_attempts
-            
         url = f"{self.base_url}/{endpoint}"
-        last_error = None
+        key = self._cache_key(endpoint, data) if use_cache else None
+        if key:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        
+        remaining = remaining_budget()
+        if remaining is not None and remaining < 0.1:
+            logger.info("Ollama request skipped: latency budget exhausted")
+            return None
+        if not self.breaker.allow():
+            logger.info("Ollama request skipped: circuit breaker open")
+            return None
+        timeout = self.timeout if remaining is None else min(self.timeout, remaining)
+        session = self.session if remaining is None else self.interactive_session
         
-        for attempt in range(retries + 1):
-            try:
-                if self.config.get('log_requests', False):
-                    logger.debug(f"Ollama request to {url}: {data}")
-                
-                response = requests.post(
-                    url,
-                    json=data,
-                    timeout=self.timeout,
-                    headers={'Content-Type': 'application/json'}
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if self.config.get('log_responses', False):
-                        logger.debug(f"Ollama response: {result}")
-                    return result
-                else:
-                    error_msg = f"Ollama API error: {response.status_code} - {response.text}"
-                    logger.error(error_msg)
-                    last_error = error_msg
-                    
-            except requests.exceptions.Timeout as e:
-                last_error = f"Ollama request timeout: {e}"
-                logger.warning(f"Attempt {attempt + 1}/{retries + 1} failed: {last_error}")
-            except requests.exceptions.ConnectionError as e:
-                last_error = f"Ollama connection error: {e}"
-                logger.warning(f"Attempt {attempt + 1}/{retries + 1} failed: {last_error}")
-            except requests.exceptions.RequestException as e:
-                last_error = f"Ollama request failed: {e}"
-                logger.warning(f"Attempt {attempt + 1}/{retries + 1} failed: {last_error}")
-            except Exception as e:
-                last_error = f"Unexpected error in Ollama request: {e}"
-                logger.error(f"Attempt {attempt + 1}/{retries + 1} failed: {last_error}")
+        started = time.monotonic()
+        try:
+            if self.config.get('log_requests', False):
+                logger.debug(f"Ollama request to {url}: {data}")
+            
+            response = session.post(url, json=data, timeout=timeout)
             
-            # Wait before retry (except on last attempt)
-            if attempt < retries:
-                time.sleep(self.retry_delay)
+            if response.status_code == 200:
+                result = response.json()
+                self.breaker.record_success(time.monotonic() - started)
+                if self.config.get('log_responses', False):
+                    logger.debug(f"Ollama response: {result}")
+                if key:
+                    cache.set(key, result, self.config.get('cache_ttl', 3600))
+                return result
+            logger.error(f"Ollama API error: {response.status_code} - {response.text}")
+            self.breaker.record_failure(time.monotonic() - started)
+            return None
+                
+        except requests.exceptions.Timeout as e:
+            logger.warning(f"Ollama request timeout: {e}")
+            if timeout < min(self.timeout, self.breaker.slow_call_seconds):
+                # Cut short by the caller's budget, says nothing about Ollama's health
+                self.breaker.release()
+                return None
+        except requests.exceptions.ConnectionError as e:
+            logger.warning(f"Ollama connection error: {e}")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Ollama request failed: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error in Ollama request: {e}")
         
-        logger.error(f"All Ollama request attempts failed. Last error: {last_error}")
+        self.breaker.record_failure(time.monotonic() - started)
         return None
     
     def get_embedding(self, text: str) -> Optional[List[float]]:
@@ -138,18 +196,40 @@ class OllamaService:
         Returns:
             Optional[List[float]]: Embedding vector or None if failed
         """
-        if not self.available:
-            return None
-            
-        data = {
-            "model": self.embedding_model,
-            "input": text
-        }
+        return self.get_embeddings([text])[0]
+    
+    def get_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> List[Optional[List[float]]]:
+        """
+        Embed many texts with one /api/embed request per batch
         
-        response = self._make_request("api/embeddings", data)
-        if response:
-            return response.get("embedding")
-        return None
+        Args:
+            texts: Texts to embed
+            batch_size: Texts per request (OLLAMA_EMBED_BATCH by default)
+            
+        Returns:
+            One embedding per text, None where embedding failed
+        """
+        if not self.is_available():
+            return [None] * len(texts)
+        
+        batch_size = batch_size or self.config.get('embed_batch', 32)
+        keys = [self._cache_key('api/embed', {'model': self.embedding_model, 'input': text}) for text in texts]
+        cached = cache.get_many(keys)
+        embeddings = [cached.get(key) for key in keys]
+        
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            data = {"model": self.embedding_model, "input": [texts[i] for i in batch]}
+            response = self._make_request("api/embed", data)
+            vectors = (response or {}).get("embeddings") or []
+            if len(vectors) != len(batch):
+                continue
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector
+            cache.set_many({keys[i]: vector for i, vector in zip(batch, vectors)},
+                           self.config.get('cache_ttl', 3600))
+        return embeddings
     
     def generate_text(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> Optional[str]:
         """
@@ -158,14 +238,16 @@ class OllamaService:
         Args:
             prompt (str): Input prompt
             system_prompt (Optional[str]): System prompt for context
-            **kwargs: Additional generation parameters (temperature, max_tokens, etc.)
+            **kwargs: Additional generation parameters (temperature, max_tokens, etc.),
+                format ('json' for structured output) and cache (reuse identical responses)
             
         Returns:
             Optional[str]: Generated text or None if failed
         """
-        if not self.available:
+        if not self.is_available():
             return None
-            
+        
+        use_cache = kwargs.get('cache', self.config.get('cache_responses', False))
         data = {
             "model": self.generation_model,
             "prompt": prompt,
@@ -180,8 +262,10 @@ class OllamaService:
         
         if system_prompt:
             data["system"] = system_prompt
+        if kwargs.get('format'):
+            data["format"] = kwargs['format']
             
-        response = self._make_request("api/generate", data)
+        response = self._make_request("api/generate", data, use_cache=use_cache)
         if response:
             return response.get("response")
         return None
@@ -206,7 +290,8 @@ class OllamaService:
             prompt, 
             system_prompt,
             temperature=0.3,  # Lower temperature for more consistent analysis
-            max_tokens=200
+            max_tokens=200,
+            cache=True
         )
         
         if response:
@@ -342,7 +427,8 @@ class OllamaService:
             prompt, 
             system_prompt,
             temperature=0.2,  # Lower temperature for more consistent classification
-            max_tokens=150
+            max_tokens=150,
+            cache=True
         )
         
         if response:
@@ -376,7 +462,8 @@ class OllamaService:
             prompt, 
             system_prompt,
             temperature=0.1,  # Very low temperature for consistent entity extraction
-            max_tokens=300
+            max_tokens=300,
+            cache=True
         )
         
         if response:
@@ -392,6 +479,83 @@ class OllamaService:
         
         return None
     
+    def analyze_text_with_ollama(self, text: str, possible_intents: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Sentiment, intent and entities in a single structured-JSON generation
+        
+        Replaces three separate calls (analyze_sentiment_with_ollama, classify_intent_with_ollama
+        and extract_entities_with_ollama) with one round trip.
+        
+        Args:
+            text: Text to analyze
+            possible_intents: Allowed intents (HR_INTENTS from the configuration by default)
+            
+        Returns:
+            Dictionary with 'sentiment', 'intent' and 'entities'; a part is None when its feature
+            is disabled or the model did not return it
+        """
+        if not self.is_available():
+            return None
+        
+        features = {
+            'sentiment': self.config.get('enable_sentiment', True),
+            'intent': self.config.get('enable_intent', True),
+            'entities': self.config.get('enable_entities', True),
+        }
+        if not any(features.values()):
+            return None
+        
+        possible_intents = possible_intents or self.config.get('hr_intents', [])
+        system_prompt = SYSTEM_PROMPTS['combined_analysis'] + f" Available intents: {', '.join(possible_intents)}"
+        prompt = f"Analyze this text: '{text}'"
+        
+        response = self.generate_text(
+            prompt,
+            system_prompt,
+            temperature=0.1,  # Very low temperature, the output is parsed
+            max_tokens=400,
+            format='json',
+            cache=True
+        )
+        if not response:
+            return None
+        
+        try:
+            parsed = json.loads(response)
+        except json.JSONDecodeError:
+            logger.warning(f"Failed to parse Ollama combined analysis as JSON: {response[:200]}...")
+            parsed = {}
+        if not isinstance(parsed, dict):
+            parsed = {}
+        
+        sentiment = parsed.get('sentiment')
+        if isinstance(sentiment, str):
+            sentiment = {'sentiment': sentiment, 'confidence': 0.7, 'explanation': ''}
+        if not isinstance(sentiment, dict):
+            sentiment = self._parse_sentiment_fallback(response)
+        
+        intent = parsed.get('intent')
+        if isinstance(intent, str):
+            intent = {'intent': intent, 'confidence': 0.6, 'explanation': ''}
+        if not isinstance(intent, dict):
+            intent = self._parse_intent_fallback(response)
+        if intent.get('intent') not in possible_intents:
+            logger.warning(f"Ollama returned invalid intent: {intent.get('intent')}. Using fallback.")
+            intent['intent'] = 'unknown'
+            intent['confidence'] = max(0.3, intent.get('confidence', 0.5) - 0.2)
+        
+        entities = parsed.get('entities')
+        if isinstance(entities, dict):
+            entities = [entities]
+        if not isinstance(entities, list):
+            entities = self._parse_entities_fallback(text)
+        
+        return {
+            'sentiment': sentiment if features['sentiment'] else None,
+            'intent': intent if features['intent'] else None,
+            'entities': entities if features['entities'] else None,
+        }
+    
     def enhance_response_with_ollama(self, response: str, context: Optional[str] = None) -> Optional[str]:
         """
         Enhance response using Ollama
@@ -467,6 +631,9 @@ class OllamaService:
                 'timeout': self.timeout,
                 'retry_attempts': self.retry_attempts,
                 'retry_delay': self.retry_delay,
+                'circuit_breaker': self.breaker.stats(),
+                'pool_size': self.config.get('pool_size', 10),
+                'cache_responses': self.config.get('cache_responses', False),
                 'features_enabled': {
                     'sentiment': self.config.get('enable_sentiment', True),
                     'entities': self.config.get('enable_entities', True),
@@ -527,6 +694,8 @@ def reset_ollama_service():
     Useful for testing or when configuration changes
     """
     global ollama_service
+    if ollama_service is not None:
+        ollama_service.session.close()
     ollama_service = None
 
 # Convenience functions for common operations
@@ -551,6 +720,13 @@ def extract_entities(text: str) -> Optional[List[Dict[str, Any]]]:
     service = get_ollama_service()
     return service.extract_entities_with_ollama(text) if service else None
 
+def analyze_text(text: str, possible_intents: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Convenience function for combined sentiment, intent and entity analysis (one LLM call)
+    """
+    service = get_ollama_service()
+    return service.analyze_text_with_ollama(text, possible_intents) if service else None
+
 def enhance_response(response: str, context: Optional[str] = None) -> str:
     """
     Convenience function for response enhancement
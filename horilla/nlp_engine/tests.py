@@ -1,6 +1,19 @@
-from django.test import TestCase
+import json
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
 from django.contrib.auth.models import User
 
+from .batch_engine import iter_analyzed_chunks
+from .circuit_breaker import CircuitBreaker, has_budget, latency_budget, remaining_budget
+from .intent_matcher import IntentMatcher
+from .knowledge_index import KnowledgeIndex
+from .ollama_service import OllamaService
+from .text_analyzer import TextPreprocessor
+from .write_behind import WRITERS, WriteBehindQueue
+
 
 class BasicNLPTestCase(TestCase):
     """Basic test cases for NLP functionality without model dependencies"""
@@ -77,3 +90,186 @@ class BasicNLPTestCase(TestCase):
         self.assertEqual(clean_text('  Hello World  '), 'hello world')
         self.assertEqual(clean_text(''), '')
         self.assertEqual(clean_text(None), '')
+
+
+class IntentMatcherTestCase(SimpleTestCase):
+    """Keyword intent matching on whole words with word-count weighting"""
+
+    def setUp(self):
+        self.matcher = IntentMatcher({
+            'leave_balance': ['cuti', 'sisa cuti', 'leave'],
+            'hiring_process': ['hiring', 'interview'],
+            'greeting': ['hi', 'halo'],
+        })
+
+    def test_whole_word_matching(self):
+        self.assertEqual(self.matcher.best('status hiring'), 'hiring_process')
+        self.assertEqual(self.matcher.best('hi there'), 'greeting')
+        self.assertIsNone(self.matcher.best('this is it'))
+
+    def test_overlapping_keywords_add_word_counts(self):
+        self.assertEqual(self.matcher.scores('berapa sisa cuti saya'), {'leave_balance': 3})
+        self.assertEqual(self.matcher.best('halo, berapa sisa cuti saya?'), 'leave_balance')
+
+    def test_suffix_forms(self):
+        self.assertEqual(self.matcher.best('cutinya tinggal berapa'), 'leave_balance')
+        self.assertEqual(self.matcher.best('interviews next week'), 'hiring_process')
+
+    def test_ties_go_to_first_intent(self):
+        self.assertEqual(self.matcher.best('halo cuti'), 'leave_balance')
+
+
+class KnowledgeIndexTestCase(SimpleTestCase):
+    """BM25 ranking, source boosts and incremental updates of the chatbot knowledge index"""
+
+    def setUp(self):
+        self.index = KnowledgeIndex()
+        self.index.built = True
+        self.index._next_sync = float('inf')  # no ai_knowledge sync in unit tests
+        self.index.add('basic:1', 'Cuti tahunan 12 hari per tahun', {'source': 'basic', 'answer': 'cuti'})
+        self.index.add('basic:2', 'Lembur dihitung per jam', {'source': 'basic', 'answer': 'lembur'})
+        self.index.add('ai_knowledge:1', 'Cuti melahirkan tiga bulan', {'source': 'ai_knowledge', 'answer': 'melahirkan'})
+
+    def test_ranking_and_boost(self):
+        results = self.index.search('cuti melahirkan')
+        self.assertEqual([r['answer'] for r in results], ['melahirkan', 'cuti'])
+        self.assertEqual(results[0]['relevance'], 1.0)  # contains every query term
+        self.assertTrue(0 < results[1]['relevance'] < 0.5)  # only 'cuti', the more common term
+        self.assertLess(self.index.search('cuti melahirkan kembar')[0]['relevance'], 1.0)
+
+    def test_incremental_update(self):
+        self.index.remove('basic:2')
+        self.assertEqual(self.index.search('lembur'), [])
+        self.index.add('basic:1', 'Lembur akhir pekan', {'source': 'basic', 'answer': 'weekend'})
+        self.assertEqual([r['answer'] for r in self.index.search('lembur')], ['weekend'])
+        self.assertEqual(self.index.stats()['documents'], 2)
+
+
+class BatchEngineTestCase(SimpleTestCase):
+    def test_chunks_keep_indexes_and_merge_ollama_analysis(self):
+        analyzer = mock.Mock()
+        analyzer.analyze_many.side_effect = lambda texts, config, n_process: [{'original_text': text} for text in texts]
+        service = mock.Mock()
+        service.is_available.return_value = True
+        service.analyze_text_with_ollama.side_effect = lambda text, intents: {
+            'intent': {'intent': 'help', 'confidence': 0.9}, 'sentiment': None
+        }
+        with mock.patch('nlp_engine.batch_engine.get_process_pool', return_value=None), \
+                mock.patch('nlp_engine.batch_engine.get_text_analyzer', return_value=analyzer), \
+                mock.patch('nlp_engine.ollama_service.get_ollama_service', return_value=service):
+            chunks = list(iter_analyzed_chunks(['a', 'b', 'c'], {}, use_ollama=True, chunk_size=2))
+
+        self.assertEqual([[index for index, _ in chunk] for chunk in chunks], [[0, 1], [2]])
+        self.assertEqual(chunks[1][0][1]['original_text'], 'c')
+        self.assertEqual(chunks[1][0][1]['ollama_intent']['intent'], 'help')
+        self.assertNotIn('ollama_sentiment', chunks[1][0][1])
+        self.assertEqual(service.analyze_text_with_ollama.call_count, 3)
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    def test_trips_rejects_and_recovers_after_probe(self):
+        breaker = CircuitBreaker('test', window=4, min_calls=2, failure_ratio=0.5,
+                                 slow_call_seconds=1.0, open_seconds=30.0)
+        breaker.record_success(0.1)
+        breaker.record_success(2.0)  # slow call counts as a failure
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+        breaker._opened_at -= 30.0
+        self.assertTrue(breaker.allow())  # half-open probe
+        self.assertFalse(breaker.allow())  # only one probe at a time
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_latency_budget_nests_without_extending(self):
+        self.assertIsNone(remaining_budget())
+        with latency_budget(5.0):
+            with latency_budget(60.0):
+                self.assertLessEqual(remaining_budget(), 5.0)
+            with latency_budget(0.0):
+                self.assertFalse(has_budget())
+        self.assertTrue(has_budget())
+
+
+class TextPreprocessorTestCase(SimpleTestCase):
+    def test_short_texts_are_preprocessed_once(self):
+        preprocessor = TextPreprocessor()
+        with mock.patch.object(preprocessor, 'tokenize', wraps=preprocessor.tokenize) as tokenize:
+            first = preprocessor.preprocess('Need help with my leave request')
+            self.assertEqual(preprocessor.preprocess('Need help with my leave request'), first)
+            preprocessor.preprocess('Need help with my leave request ' * 20)
+        self.assertEqual(tokenize.call_count, 2)
+
+
+class WriteBehindQueueTestCase(SimpleTestCase):
+    def setUp(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+        def writer(rows):
+            self.release.wait(5)
+            self.batches.append(list(rows))
+
+        patcher = mock.patch.dict(WRITERS, {'test': writer})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rows_are_written_in_batches(self):
+        write_behind = WriteBehindQueue(batch_size=10, interval=0.5)
+        for i in range(25):
+            self.assertTrue(write_behind.put('test', {'i': i}))
+        write_behind.flush()
+
+        self.assertEqual(sorted(row['i'] for batch in self.batches for row in batch), list(range(25)))
+        self.assertTrue(all(len(batch) <= 10 for batch in self.batches[:-1]))
+        self.assertEqual(write_behind.stats()['written'], 25)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        self.release.clear()  # flusher stuck on a slow database
+        write_behind = WriteBehindQueue(maxsize=2, batch_size=1, interval=0.0, put_timeout=0.01)
+        results = [write_behind.put('test', {'i': i}) for i in range(6)]
+        self.assertIn(False, results)
+        self.assertEqual(write_behind.stats()['dropped'], results.count(False))
+        self.release.set()
+        write_behind.flush()
+        self.assertEqual(write_behind.stats()['written'], results.count(True))
+
+
+class OllamaServiceTestCase(SimpleTestCase):
+    """Batched embeddings, response cache and the combined analysis call (HTTP mocked)"""
+
+    def setUp(self):
+        cache.clear()
+        with mock.patch.object(OllamaService, '_check_availability', return_value=True):
+            self.service = OllamaService()
+        self.post = mock.patch.object(self.service.session, 'post', side_effect=self._respond).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _respond(self, url, json=None, timeout=None):
+        response = mock.Mock(status_code=200)
+        if url.endswith('/api/embed'):
+            response.json.return_value = {'embeddings': [[float(len(text))] for text in json['input']]}
+        else:
+            response.json.return_value = {'response': self.generation}
+        return response
+
+    def test_embeddings_are_batched_and_cached(self):
+        self.assertEqual(self.service.get_embeddings(['a', 'bb', 'ccc'], batch_size=2), [[1.0], [2.0], [3.0]])
+        self.assertEqual(self.post.call_count, 2)
+        self.assertEqual(self.service.get_embedding('bb'), [2.0])
+        self.assertEqual(self.post.call_count, 2)
+
+    def test_combined_analysis_is_one_cached_call(self):
+        self.generation = json.dumps({
+            'sentiment': {'sentiment': 'negative', 'confidence': 0.8, 'explanation': ''},
+            'intent': {'intent': 'payroll_inquiry', 'confidence': 0.9, 'explanation': ''},
+            'entities': [{'text': 'Maret', 'label': 'DATE', 'start': 12, 'end': 17, 'confidence': 0.9}],
+        })
+        result = self.service.analyze_text_with_ollama('gaji bulan Maret belum masuk', ['leave_balance'])
+        self.assertEqual(result['sentiment']['sentiment'], 'negative')
+        self.assertEqual(result['intent']['intent'], 'unknown')  # not an allowed intent
+        self.assertEqual(result['entities'][0]['label'], 'DATE')
+        self.service.analyze_text_with_ollama('gaji bulan Maret belum masuk', ['leave_balance'])
+        self.assertEqual(self.post.call_count, 1)
+        self.assertEqual(self.post.call_args.kwargs['json']['format'], 'json')
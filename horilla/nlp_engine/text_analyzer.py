@@ -10,22 +10,16 @@ import time
 import logging
 from typing import Dict, List, Tuple, Optional, Any
 from collections import Counter
+from functools import lru_cache
 
 try:
     import nltk
     from nltk.tokenize import word_tokenize, sent_tokenize
-    from nltk.corpus import stopwords
-    from nltk.stem import WordNetLemmatizer
     from nltk.chunk import ne_chunk
     from nltk.tag import pos_tag
 except ImportError:
     nltk = None
 
-try:
-    import spacy
-except ImportError:
-    spacy = None
-
 try:
     from textblob import TextBlob
 except ImportError:
@@ -37,11 +31,6 @@ except ImportError:
     detect = None
     detect_langs = None
 
-try:
-    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-except ImportError:
-    SentimentIntensityAnalyzer = None
-
 # Ollama Integration
 try:
     from .ollama_service import get_ollama_service
@@ -50,12 +39,19 @@ except ImportError:
     OLLAMA_AVAILABLE = False
     logging.warning("Ollama service not available. Enhanced NLP features will be limited.")
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+from .model_pool import (
+    PREPROCESS_CACHE_MAX_CHARS, PREPROCESS_CACHE_SIZE, SPACY_BATCH_SIZE, SPACY_N_PROCESS, get_model_pool
+)
 
 logger = logging.getLogger(__name__)
 
+# Intents the combined Ollama analysis may return for chatbot-style text
+HR_INTENTS = [
+    'greeting', 'leave_balance', 'payroll_inquiry', 'attendance_check',
+    'hiring_process', 'applicant_count', 'performance_review',
+    'company_policy', 'training_schedule', 'employee_info', 'help'
+]
+
 
 class TextPreprocessor:
     """
@@ -63,26 +59,13 @@ class TextPreprocessor:
     """
     
     def __init__(self):
-        self.lemmatizer = None
-        self.stop_words = set()
-        self._initialize_nltk()
-    
-    def _initialize_nltk(self):
-        """Initialize NLTK components"""
-        if nltk:
-            try:
-                # Download required NLTK data
-                nltk.download('punkt', quiet=True)
-                nltk.download('stopwords', quiet=True)
-                nltk.download('wordnet', quiet=True)
-                nltk.download('averaged_perceptron_tagger', quiet=True)
-                nltk.download('maxent_ne_chunker', quiet=True)
-                nltk.download('words', quiet=True)
-                
-                self.lemmatizer = WordNetLemmatizer()
-                self.stop_words = set(stopwords.words('english'))
-            except Exception as e:
-                logger.warning(f"Failed to initialize NLTK: {e}")
+        # NLTK data, lemmatizer and stop words are shared by the process-wide model pool
+        pool = get_model_pool()
+        self.lemmatizer = pool.lemmatizer
+        self.stop_words = pool.stop_words
+        self._lemmatize = pool.lemmatize
+        # Repeated short texts (chatbot queries, one-line feedback) are preprocessed once
+        self._preprocess_cached = lru_cache(maxsize=PREPROCESS_CACHE_SIZE)(self._preprocess)
     
     def clean_text(self, text: str) -> str:
         """
@@ -164,11 +147,11 @@ class TextPreprocessor:
         Returns:
             Lemmatized tokens
         """
-        if not self.lemmatizer:
+        if not self._lemmatize:
             return tokens
         
         try:
-            return [self.lemmatizer.lemmatize(token) for token in tokens]
+            return [self._lemmatize(token) for token in tokens]
         except Exception as e:
             logger.warning(f"Lemmatization failed: {e}")
             return tokens
@@ -185,6 +168,11 @@ class TextPreprocessor:
         Returns:
             Preprocessed text
         """
+        if text and len(text) <= PREPROCESS_CACHE_MAX_CHARS:
+            return self._preprocess_cached(text, remove_stopwords, lemmatize)
+        return self._preprocess(text, remove_stopwords, lemmatize)
+    
+    def _preprocess(self, text: str, remove_stopwords: bool, lemmatize: bool) -> str:
         # Clean text
         cleaned = self.clean_text(text)
         
@@ -215,11 +203,7 @@ class SentimentAnalyzer:
     
     def _initialize_vader(self):
         """Initialize VADER sentiment analyzer"""
-        if SentimentIntensityAnalyzer:
-            try:
-                self.vader_analyzer = SentimentIntensityAnalyzer()
-            except Exception as e:
-                logger.warning(f"Failed to initialize VADER: {e}")
+        self.vader_analyzer = get_model_pool().vader
     
     def _initialize_ollama(self):
         """Initialize Ollama service"""
@@ -352,6 +336,10 @@ class LanguageDetector:
     Detect language of input text
     """
     
+    def __init__(self):
+        # langdetect is the slowest analysis step; repeated short texts are detected once
+        self._detect_cached = lru_cache(maxsize=PREPROCESS_CACHE_SIZE)(self._detect_language)
+    
     def detect_language(self, text: str) -> Tuple[str, float]:
         """
         Detect language of text
@@ -362,6 +350,11 @@ class LanguageDetector:
         Returns:
             Tuple of (language_code, confidence)
         """
+        if text and len(text) <= PREPROCESS_CACHE_MAX_CHARS:
+            return self._detect_cached(text)
+        return self._detect_language(text)
+    
+    def _detect_language(self, text: str) -> Tuple[str, float]:
         if not text or not detect:
             return ('unknown', 0.0)
         
@@ -393,15 +386,8 @@ class EntityExtractor:
         self._initialize_ollama()
     
     def _initialize_spacy(self):
-        """Initialize spaCy model"""
-        if spacy:
-            try:
-                # Try to load English model
-                self.nlp = spacy.load('en_core_web_sm')
-            except OSError:
-                logger.warning("spaCy English model not found. Install with: python -m spacy download en_core_web_sm")
-            except Exception as e:
-                logger.warning(f"Failed to initialize spaCy: {e}")
+        """Use the shared spaCy pipeline (loaded once per process, unused components disabled)"""
+        self.nlp = get_model_pool().nlp
     
     def _initialize_ollama(self):
         """Initialize Ollama service"""
@@ -494,6 +480,39 @@ Response:"""
             logger.error(f"spaCy entity extraction failed: {e}")
             return []
     
+    def extract_many_with_spacy(self, texts: List[str], batch_size: Optional[int] = None,
+                                n_process: Optional[int] = None) -> Optional[List[List[Dict[str, Any]]]]:
+        """
+        Extract entities for several texts in one spaCy ``nlp.pipe`` pass
+        
+        Args:
+            texts: Input texts
+            batch_size: Documents per spaCy batch (default NLP_SPACY_BATCH_SIZE)
+            n_process: spaCy worker processes (default NLP_SPACY_N_PROCESS)
+            
+        Returns:
+            One entity list per text, or None when spaCy is not available
+        """
+        if not self.nlp:
+            return None
+        
+        try:
+            return [
+                [{
+                    'text': ent.text,
+                    'label': ent.label_,
+                    'start': ent.start_char,
+                    'end': ent.end_char,
+                    'confidence': 0.9,
+                    'method': 'spacy'
+                } for ent in doc.ents]
+                for doc in self.nlp.pipe(texts, batch_size=batch_size or SPACY_BATCH_SIZE,
+                                         n_process=n_process or SPACY_N_PROCESS)
+            ]
+        except Exception as e:
+            logger.error(f"spaCy batch entity extraction failed: {e}")
+            return None
+    
     def extract_with_nltk(self, text: str) -> List[Dict[str, Any]]:
         """
         Extract entities using NLTK
@@ -645,20 +664,16 @@ class TextAnalyzer:
             entities = self._extract_entities(text)  # Use original text for entities
             results['entities'] = entities
             
-            # Ollama-enhanced intent classification if available
+            # Ollama-enhanced sentiment, intent and entities (one combined call) if available
             if use_ollama and self.ollama_service and hasattr(self.ollama_service, 'is_available') and self.ollama_service.is_available():
                 try:
-                    hr_intents = [
-                        'greeting', 'leave_balance', 'payroll_inquiry', 'attendance_check',
-                        'hiring_process', 'applicant_count', 'performance_review',
-                        'company_policy', 'training_schedule', 'employee_info', 'help'
-                    ]
-                    if hasattr(self.ollama_service, 'classify_intent_with_ollama'):
-                        intent_result = self.ollama_service.classify_intent_with_ollama(text, hr_intents)
-                        if intent_result:
-                            results['ollama_intent'] = intent_result
+                    ollama_result = self.ollama_service.analyze_text_with_ollama(text, HR_INTENTS)
+                    if ollama_result:
+                        for key in ('intent', 'sentiment', 'entities'):
+                            if ollama_result.get(key) is not None:
+                                results[f'ollama_{key}'] = ollama_result[key]
                 except Exception as e:
-                    logger.error(f"Ollama intent classification failed: {e}")
+                    logger.error(f"Ollama analysis failed: {e}")
             
             # Additional metadata
             results['text_stats'] = {
@@ -673,13 +688,45 @@ class TextAnalyzer:
         
         return results
     
-    def analyze(self, text: str, config: Optional[Dict] = None) -> Dict[str, Any]:
+    def analyze_many(self, texts: List[str], config: Optional[Dict] = None,
+                     batch_size: Optional[int] = None, n_process: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Analyze several texts like ``analyze``, with spaCy entity extraction for all of them
+        done in one ``nlp.pipe`` pass
+        
+        Args:
+            texts: Input texts
+            config: Configuration dictionary
+            batch_size: Documents per spaCy batch (default NLP_SPACY_BATCH_SIZE)
+            n_process: spaCy worker processes (default NLP_SPACY_N_PROCESS)
+            
+        Returns:
+            One analysis result per text, in input order
+        """
+        config = config or {}
+        max_length = config.get('max_text_length', 5000)
+        texts = [text[:max_length] if text else text for text in texts]
+        
+        entities = None
+        if config.get('enable_entity_extraction', True):
+            entities = self.entity_extractor.extract_many_with_spacy(
+                [text or '' for text in texts], batch_size=batch_size, n_process=n_process
+            )
+        
+        return [
+            self.analyze(text, config, entities=entities[i] if entities is not None else None)
+            for i, text in enumerate(texts)
+        ]
+    
+    def analyze(self, text: str, config: Optional[Dict] = None,
+                entities: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
         Perform comprehensive text analysis (legacy method for backward compatibility)
         
         Args:
             text: Input text
             config: Configuration dictionary
+            entities: spaCy entities already extracted for the text (see ``analyze_many``)
             
         Returns:
             Analysis results dictionary
@@ -729,7 +776,10 @@ class TextAnalyzer:
             
             # Entity extraction
             if enable_entity_extraction:
-                entities = self._extract_entities(text)
+                if entities is None:
+                    entities = self._extract_entities(text)
+                elif not entities:
+                    entities = self.entity_extractor.extract_with_nltk(text)
                 results['entities'] = entities
             else:
                 results['entities'] = []
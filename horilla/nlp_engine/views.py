@@ -1,5 +1,6 @@
 import json
 import logging
+import time
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 
@@ -24,10 +25,13 @@ from .models import (
     IntentClassification,
     NLPProcessingLog
 )
-from .text_analyzer import TextAnalyzer
+from .batch_engine import BATCH_WORKERS, BATCH_WRITE_SIZE, iter_analyzed_chunks
+from .corpora import get_text_analyzer
+from .circuit_breaker import circuit_breaker_stats, get_circuit_breaker
 from .hybrid_db_service import get_hybrid_service
 from .mongodb_config import MongoDBConfig
-from .chatbot import chatbot
+from .write_behind import get_write_behind_queue
+from .chatbot import LLM_BUDGET_SECONDS, chatbot
 from employee.models import Employee
 
 logger = logging.getLogger(__name__)
@@ -39,145 +43,133 @@ class NLPService:
     """
     
     def __init__(self):
-        self.analyzer = TextAnalyzer()
         self.hybrid_service = get_hybrid_service()
     
-    def batch_process_texts(self, texts: List[Dict[str, Any]], user=None) -> Dict[str, Any]:
+    @property
+    def analyzer(self):
+        return get_text_analyzer()
+    
+    def batch_process_texts(self, texts: List[Dict[str, Any]], user=None, use_ollama: bool = False) -> Dict[str, Any]:
         """
         Process multiple texts in batch using hybrid database service
         
+        Texts are analyzed in parallel chunks (see batch_engine) and written with
+        bulk_create_text_analyses in batches of NLP_BATCH_WRITE_SIZE as chunks complete.
+        
         Args:
             texts: List of text data dictionaries
             user: User performing the operation
+            use_ollama: Also run the combined Ollama analysis for every text
             
         Returns:
             dict: Batch processing results
         """
+        started = time.perf_counter()
         results = []
         errors = []
-        analysis_data_list = []
+        write_batches = 0
         
-        # First pass: analyze all texts and prepare data
-        for i, text_data in enumerate(texts):
-            try:
-                text = text_data.get('text', '')
-                if not text.strip():
-                    errors.append({
-                        'index': i,
-                        'error': 'Empty text provided',
-                        'text_preview': ''
-                    })
-                    continue
-                
-                # Get configuration
-                config = self.get_active_configuration()
-                config_dict = self._config_to_dict(config) if config else {}
-                
-                # Analyze text
-                analysis_result = self.analyzer.analyze(text, config_dict)
-                
-                # Prepare data for bulk creation
-                employee = text_data.get('employee')
-                analysis_data = {
-                    'text_content': text,
-                    'processed_text': analysis_result.get('processed_text', ''),
-                    'source_type': text_data.get('source_type', 'batch'),
-                    'source_id': text_data.get('source_id', f'batch_{i}'),
-                    'analyzed_by': user.id if user else None,
-                    'employee': employee.id if employee else None,
-                    'language_detected': analysis_result.get('language', ''),
-                    'language_confidence': analysis_result.get('language_confidence'),
-                    'sentiment': analysis_result.get('sentiment', ''),
-                    'sentiment_score': analysis_result.get('sentiment_score'),
-                    'sentiment_confidence': analysis_result.get('sentiment_confidence'),
-                    'word_count': analysis_result.get('word_count'),
-                    'sentence_count': analysis_result.get('sentence_count'),
-                    'processing_time': analysis_result.get('processing_time'),
-                    'configuration_used': config.id if config else None,
-                    'entities': analysis_result.get('entities', []),
-                    'intents': analysis_result.get('intents', []),
-                    'metadata': {
-                        'batch_index': i,
-                        'analyzer_version': '1.0.0',
-                        'use_mongodb': self.hybrid_service.use_mongodb
-                    }
-                }
-                
-                analysis_data_list.append(analysis_data)
-                
-            except Exception as e:
-                error_info = {
-                    'index': i,
-                    'error': str(e),
-                    'text_preview': text_data.get('text', '')[:100]
-                }
-                errors.append(error_info)
-                logger.error(f"Batch processing error at index {i}: {e}")
+        # Configuration is read once for the whole batch
+        config = self.get_active_configuration()
+        config_dict = self._config_to_dict(config) if config else {}
         
-        # Bulk create analyses using hybrid service
-        if analysis_data_list:
+        indexes = []
+        for i, text_data in enumerate(texts):
+            if not isinstance(text_data, dict):
+                errors.append({'index': i, 'error': 'Invalid text item format', 'text_preview': ''})
+            elif not str(text_data.get('text') or '').strip():
+                errors.append({'index': i, 'error': 'Empty text provided', 'text_preview': ''})
+            else:
+                indexes.append(i)
+        
+        def write(batch: List[Dict[str, Any]]):
+            nonlocal write_batches
+            write_batches += 1
             try:
-                created_ids = self.hybrid_service.bulk_create_text_analyses(analysis_data_list)
-                
-                # Prepare results
-                for i, analysis_id in enumerate(created_ids):
-                    if analysis_id:
-                        original_data = analysis_data_list[i]
-                        results.append({
-                            'success': True,
-                            'analysis_id': analysis_id,
-                            'sentiment': original_data.get('sentiment'),
-                            'sentiment_score': original_data.get('sentiment_score'),
-                            'language': original_data.get('language_detected'),
-                            'entities_count': len(original_data.get('entities', [])),
-                            'intents_count': len(original_data.get('intents', [])),
-                            'processing_time': original_data.get('processing_time'),
-                            'word_count': original_data.get('word_count'),
-                            'sentence_count': original_data.get('sentence_count')
-                        })
-                    else:
-                        errors.append({
-                            'index': i,
-                            'error': 'Failed to create analysis record',
-                            'text_preview': original_data.get('text_content', '')[:100]
-                        })
-                
-                # Log batch processing
-                self.hybrid_service.log_processing_activity(
-                    level='INFO',
-                    message=f'Batch processed {len(created_ids)} texts successfully',
-                    source_type='batch',
-                    metadata={
-                        'total_texts': len(texts),
-                        'successful_analyses': len([id for id in created_ids if id]),
-                        'failed_analyses': len(errors),
-                        'database_type': 'hybrid'
-                    }
-                )
-                
+                created_ids = self.hybrid_service.bulk_create_text_analyses(batch)
             except Exception as e:
                 logger.error(f"Bulk creation failed: {e}")
-                self.hybrid_service.log_processing_activity(
-                    level='ERROR',
-                    message=f'Batch processing failed: {str(e)}',
-                    source_type='batch',
-                    metadata={'error': str(e), 'texts_count': len(analysis_data_list)}
-                )
-                
-                # Add all as errors if bulk creation failed
-                for i, data in enumerate(analysis_data_list):
+                created_ids = [None] * len(batch)
+                failure = f'Bulk creation failed: {str(e)}'
+            else:
+                failure = 'Failed to create analysis record'
+            
+            for analysis_id, data in zip(created_ids, batch):
+                if analysis_id:
+                    results.append({
+                        'index': data['metadata']['batch_index'],
+                        'success': True,
+                        'analysis_id': analysis_id,
+                        'sentiment': data.get('sentiment'),
+                        'sentiment_score': data.get('sentiment_score'),
+                        'language': data.get('language_detected'),
+                        'entities_count': len(data.get('entities', [])),
+                        'intents_count': len(data.get('intents', [])),
+                        'processing_time': data.get('processing_time'),
+                        'word_count': data.get('word_count'),
+                        'sentence_count': data.get('sentence_count')
+                    })
+                else:
                     errors.append({
-                        'index': i,
-                        'error': f'Bulk creation failed: {str(e)}',
+                        'index': data['metadata']['batch_index'],
+                        'error': failure,
                         'text_preview': data.get('text_content', '')[:100]
                     })
         
+        pending = []
+        try:
+            for chunk in iter_analyzed_chunks([str(texts[i]['text']) for i in indexes], config_dict,
+                                              use_ollama=use_ollama):
+                for position, analysis_result in chunk:
+                    i = indexes[position]
+                    pending.append(self._batch_analysis_data(
+                        texts[i], i, analysis_result, user, config
+                    ))
+                while len(pending) >= BATCH_WRITE_SIZE:
+                    write(pending[:BATCH_WRITE_SIZE])
+                    pending = pending[BATCH_WRITE_SIZE:]
+            if pending:
+                write(pending)
+        except Exception as e:
+            logger.error(f"Batch analysis failed: {e}")
+            done = {item['index'] for item in results + errors}
+            errors.extend({
+                'index': i,
+                'error': str(e),
+                'text_preview': str(texts[i]['text'])[:100]
+            } for i in indexes if i not in done)
+        
+        results.sort(key=lambda item: item['index'])
+        errors.sort(key=lambda item: item['index'])
+        elapsed = time.perf_counter() - started
+        throughput = {
+            'texts': len(texts),
+            'elapsed_seconds': round(elapsed, 3),
+            'texts_per_second': round(len(indexes) / elapsed, 1) if elapsed > 0 else None,
+            'workers': BATCH_WORKERS,
+            'write_batches': write_batches
+        }
+        
+        self.hybrid_service.log_processing_activity(
+            level='INFO' if results else 'ERROR',
+            message=f'Batch processed {len(results)} of {len(texts)} texts',
+            source_type='batch',
+            metadata={
+                'total_texts': len(texts),
+                'successful_analyses': len(results),
+                'failed_analyses': len(errors),
+                'database_type': 'hybrid',
+                'throughput': throughput
+            }
+        )
+        
         return {
             'success': len(errors) == 0,
             'processed_count': len(results),
             'error_count': len(errors),
             'results': results,
             'errors': errors,
+            'throughput': throughput,
             'database_info': {
                 'mongodb_enabled': self.hybrid_service.use_mongodb,
                 'sync_enabled': self.hybrid_service.sync_enabled,
@@ -185,6 +177,48 @@ class NLPService:
             }
         }
     
+    def _batch_analysis_data(self, text_data: Dict[str, Any], index: int, analysis_result: Dict[str, Any],
+                             user=None, config: Optional[NLPConfiguration] = None) -> Dict[str, Any]:
+        """Analysis data for bulk_create_text_analyses from one batch item and its analysis"""
+        employee = text_data.get('employee')
+        intents = list(analysis_result.get('intents', []))
+        ollama_intent = analysis_result.get('ollama_intent') or {}
+        if ollama_intent.get('intent') in dict(IntentClassification.INTENT_TYPES) and \
+                ollama_intent['intent'] not in {intent.get('intent') for intent in intents}:
+            intents.append({'intent': ollama_intent['intent'], 'confidence': ollama_intent.get('confidence', 0.0)})
+        
+        return {
+            'text_content': str(text_data['text']),
+            'processed_text': analysis_result.get('processed_text', ''),
+            'source_type': text_data.get('source_type', 'batch'),
+            'source_id': text_data.get('source_id', f'batch_{index}'),
+            'analyzed_by': user.id if user else None,
+            'employee': employee.id if employee else None,
+            'language_detected': analysis_result.get('language', ''),
+            'language_confidence': analysis_result.get('language_confidence'),
+            'sentiment': analysis_result.get('sentiment', ''),
+            'sentiment_score': analysis_result.get('sentiment_score'),
+            'sentiment_confidence': analysis_result.get('sentiment_confidence'),
+            'word_count': analysis_result.get('word_count'),
+            'sentence_count': analysis_result.get('sentence_count'),
+            'processing_time': analysis_result.get('processing_time'),
+            'configuration_used': config.id if config else None,
+            'entities': [{
+                'text': entity.get('text', ''),
+                'type': self._map_entity_type(entity.get('label', '')),
+                'start': entity.get('start', 0),
+                'end': entity.get('end', 0),
+                'confidence': entity.get('confidence')
+            } for entity in analysis_result.get('entities', [])],
+            'intents': intents,
+            'metadata': {
+                'batch_index': index,
+                'analyzer_version': '1.0.0',
+                'use_mongodb': self.hybrid_service.use_mongodb,
+                'ollama_sentiment': analysis_result.get('ollama_sentiment')
+            }
+        }
+    
     def get_active_configuration(self) -> Optional[NLPConfiguration]:
         """Get the active NLP configuration"""
         return NLPConfiguration.objects.filter(is_active=True).first()
@@ -444,7 +478,8 @@ def batch_analyze_api(request):
         "texts": [
             {"text": "Text 1", "source_type": "feedback", "source_id": "1"},
             {"text": "Text 2", "source_type": "helpdesk", "source_id": "2"}
-        ]
+        ],
+        "use_ollama": false
     }
     """
     try:
@@ -463,36 +498,27 @@ def batch_analyze_api(request):
                 'error': 'Maximum 50 texts per batch'
             }, status=400)
         
-        results = []
-        for item in texts:
-            if not isinstance(item, dict) or 'text' not in item:
-                results.append({
-                    'success': False,
-                    'error': 'Invalid text item format'
-                })
-                continue
-            
-            text = item['text'].strip()
-            if not text:
-                results.append({
-                    'success': False,
-                    'error': 'Empty text'
-                })
-                continue
-            
-            # Process individual text
-            result = nlp_service.process_text(
-                text=text,
-                source_type=item.get('source_type', 'general'),
-                source_id=item.get('source_id', ''),
-                user=request.user if request.user.is_authenticated else None
-            )
-            results.append(result)
+        batch = nlp_service.batch_process_texts(
+            [{
+                'text': item['text'],
+                'source_type': item.get('source_type', 'general'),
+                'source_id': item.get('source_id', '')
+            } if isinstance(item, dict) and 'text' in item else None for item in texts],
+            user=request.user if request.user.is_authenticated else None,
+            use_ollama=bool(data.get('use_ollama', False))
+        )
+        
+        # One result per input item, in input order; failed items are reported inline too
+        by_index = {item['index']: item for item in batch['results']}
+        by_index.update((error['index'], {'success': False, 'error': error['error']}) for error in batch['errors'])
+        results = [by_index[i] for i in range(len(texts))]
         
         return JsonResponse({
             'success': True,
             'results': results,
-            'total_processed': len(results)
+            'errors': batch['errors'],
+            'total_processed': len(results),
+            'throughput': batch['throughput']
         })
         
     except json.JSONDecodeError:
@@ -741,7 +767,7 @@ def health_check_api(request):
     """
     try:
         # Test basic functionality
-        analyzer = TextAnalyzer()
+        analyzer = get_text_analyzer()
         test_result = analyzer.analyze("This is a test message.")
         
         # Check database connectivity
@@ -754,6 +780,11 @@ def health_check_api(request):
             'database_connected': True,
             'configurations': config_count,
             'total_analyses': analysis_count,
+            'llm': {
+                'chatbot_budget_seconds': LLM_BUDGET_SECONDS,
+                'circuit_breakers': {'ollama': get_circuit_breaker('ollama').stats(), **circuit_breaker_stats()},
+            },
+            'write_behind': get_write_behind_queue().stats(),
             'timestamp': timezone.now().isoformat()
         })
         
@@ -794,7 +825,7 @@ def chatbot_api(request):
             }, status=400)
         
         # Process message with chatbot
-        chatbot_response = chatbot.process_message(message, request.user)
+        chatbot_response = chatbot.process_message(message, request.user, session=request.session)
         
         # Format response for frontend compatibility
         if chatbot_response.get('success', False):
@@ -0,0 +1,181 @@
+"""
+Write-behind queue for chatbot interaction records and NLP processing logs.
+
+Request threads only enqueue rows. A daemon flusher thread bulk-inserts them once
+NLP_WRITE_BEHIND_BATCH rows are waiting or NLP_WRITE_BEHIND_INTERVAL seconds after the first one
+arrived; text analyses go through HybridDatabaseService.bulk_create_text_analyses, so they reach
+MongoDB too when it is enabled. The queue is bounded: when the flusher falls behind, producers
+wait at most NLP_WRITE_BEHIND_PUT_TIMEOUT seconds and the row is then dropped (and counted)
+instead of adding latency to the request. Rows still queued are written at interpreter exit.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = getattr(settings, 'NLP_WRITE_BEHIND_ENABLED', True)
+WRITE_BEHIND_QUEUE_SIZE = getattr(settings, 'NLP_WRITE_BEHIND_QUEUE_SIZE', 10000)
+WRITE_BEHIND_BATCH = getattr(settings, 'NLP_WRITE_BEHIND_BATCH', 200)
+WRITE_BEHIND_INTERVAL = getattr(settings, 'NLP_WRITE_BEHIND_INTERVAL', 1.0)
+WRITE_BEHIND_PUT_TIMEOUT = getattr(settings, 'NLP_WRITE_BEHIND_PUT_TIMEOUT', 0.05)
+
+TEXT_ANALYSIS = 'text_analysis'
+PROCESSING_LOG = 'processing_log'
+
+
+def _write_text_analyses(rows: List[Dict[str, Any]]):
+    from .hybrid_db_service import get_hybrid_service
+
+    get_hybrid_service().bulk_create_text_analyses(rows)
+
+
+def _write_processing_logs(rows: List[Dict[str, Any]]):
+    from .models import NLPProcessingLog
+
+    NLPProcessingLog.objects.bulk_create([NLPProcessingLog(**row) for row in rows])
+
+
+# Row kind -> bulk writer
+WRITERS: Dict[str, Callable[[List[Dict[str, Any]]], None]] = {
+    TEXT_ANALYSIS: _write_text_analyses,
+    PROCESSING_LOG: _write_processing_logs,
+}
+
+
+class WriteBehindQueue:
+    """Bounded in-process queue drained in batches by one flusher thread"""
+
+    def __init__(self, maxsize: int = WRITE_BEHIND_QUEUE_SIZE, batch_size: int = WRITE_BEHIND_BATCH,
+                 interval: float = WRITE_BEHIND_INTERVAL, put_timeout: float = WRITE_BEHIND_PUT_TIMEOUT,
+                 enabled: bool = WRITE_BEHIND_ENABLED):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.put_timeout = put_timeout
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_seconds = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Rows queued in the parent are the parent's to write; the child starts empty
+        self._queue = queue.Queue(self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def put(self, kind: str, row: Dict[str, Any]) -> bool:
+        """
+        Queue a row for the bulk writer of ``kind``; False when it was dropped (queue full)
+        """
+        if not self.enabled:
+            self._write([(kind, row)])
+            return True
+        self._ensure_flusher()
+        try:
+            self._queue.put((kind, row), timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning(f"Write-behind queue full, {self.dropped} rows dropped so far")
+            return False
+        self.enqueued += 1
+        return True
+
+    def flush(self):
+        """Write everything queued so far and wait for the flusher's batch in progress"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+        self._queue.join()
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='nlp-write-behind', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            close_old_connections()
+
+    def _write(self, batch: List[tuple]):
+        started = time.monotonic()
+        rows_by_kind = defaultdict(list)
+        for kind, row in batch:
+            rows_by_kind[kind].append(row)
+        try:
+            for kind, rows in rows_by_kind.items():
+                try:
+                    WRITERS[kind](rows)
+                    self.written += len(rows)
+                except Exception as e:
+                    self.failed += len(rows)
+                    logger.error(f"Write-behind flush of {len(rows)} {kind} rows failed: {e}")
+        finally:
+            self.flushes += 1
+            self.last_flush_seconds = round(time.monotonic() - started, 4)
+            if self.enabled:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'queued': self._queue.qsize(),
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'flushes': self.flushes,
+            'last_flush_seconds': self.last_flush_seconds,
+        }
+
+
+_write_behind_queue: Optional[WriteBehindQueue] = None
+_write_behind_lock = threading.Lock()
+
+
+def get_write_behind_queue() -> WriteBehindQueue:
+    """Get the process-wide write-behind queue"""
+    global _write_behind_queue
+    if _write_behind_queue is None:
+        with _write_behind_lock:
+            if _write_behind_queue is None:
+                _write_behind_queue = WriteBehindQueue()
+                atexit.register(_write_behind_queue.flush)
+    return _write_behind_queue
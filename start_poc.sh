@@ -73,7 +73,7 @@ echo "==> Nyalakan Backend AI (FastAPI) di :$BACKEND_PORT"
 cd "$AI_DIR"
 python3 -m venv .venv >/dev/null 2>&1 || true
 source .venv/bin/activate
-pip -q install fastapi uvicorn qdrant-client requests pypdf python-multipart
+pip -q install fastapi uvicorn qdrant-client requests httpx pypdf python-multipart
 
 export QDRANT_URL="http://127.0.0.1:${QDRANT_PORT}"
 export PRESIDIO_URL="http://127.0.0.1:${PRESIDIO_PORT}"